@@ -0,0 +1,30 @@
+"""Composite indexes for keyset pagination on documents
+
+Revision ID: 0002_keyset_indexes
+Revises: 0001_use_json
+Create Date: 2024-07-xx
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0002_keyset_indexes"
+down_revision = "0001_use_json"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Indexes (date_ref, id) and (created_at, id) for cursor pagination."""
+    # create_all puede haberlos creado antes: en Postgres un error abortaría la transacción
+    existing = {ix["name"] for ix in sa.inspect(op.get_bind()).get_indexes("documents")}
+    if "ix_documents_date_ref_id" not in existing:
+        op.create_index("ix_documents_date_ref_id", "documents", ["date_ref", "id"])
+    if "ix_documents_created_at_id" not in existing:
+        op.create_index("ix_documents_created_at_id", "documents", ["created_at", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_documents_created_at_id", table_name="documents")
+    op.drop_index("ix_documents_date_ref_id", table_name="documents")
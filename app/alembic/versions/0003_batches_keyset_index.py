@@ -0,0 +1,26 @@
+"""Composite index for keyset pagination on batches
+
+Revision ID: 0003_batches_keyset_index
+Revises: 0002_keyset_indexes
+Create Date: 2024-07-xx
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0003_batches_keyset_index"
+down_revision = "0002_keyset_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Index (production_date, id) for cursor pagination of batches."""
+    existing = {ix["name"] for ix in sa.inspect(op.get_bind()).get_indexes("batches")}
+    if "ix_batches_prod_date_id" not in existing:
+        op.create_index("ix_batches_prod_date_id", "batches", ["production_date", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_batches_prod_date_id", table_name="batches")
@@ -0,0 +1,54 @@
+"""document_versions table and dedup indexes
+
+Revision ID: 0004_document_versions_dedup
+Revises: 0003_batches_keyset_index
+Create Date: 2024-07-xx
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "0004_document_versions_dedup"
+down_revision = "0003_batches_keyset_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Create document_versions if missing and index checksum/storage_path."""
+    inspector = sa.inspect(op.get_bind())
+    # En Supabase la tabla ya existe: solo se agregan los índices
+    if not inspector.has_table("document_versions"):
+        op.create_table(
+            "document_versions",
+            sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+            sa.Column(
+                "document_id",
+                postgresql.UUID(as_uuid=True),
+                sa.ForeignKey("documents.id", ondelete="CASCADE"),
+                nullable=False,
+            ),
+            sa.Column("version", sa.Integer(), nullable=False),
+            sa.Column("storage_path", sa.Text(), nullable=False),
+            sa.Column("checksum", sa.String(64), nullable=False),
+            sa.Column("size_bytes", sa.BigInteger(), nullable=False),
+            sa.Column("mime_type", sa.String(255), nullable=True),
+            sa.Column("note", sa.Text(), nullable=True),
+            sa.Column("created_by", postgresql.UUID(as_uuid=True), nullable=True),
+            sa.Column("created_at", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+            sa.UniqueConstraint("document_id", "version", name="uq_document_versions_doc_version"),
+        )
+    existing = {ix["name"] for ix in sa.inspect(op.get_bind()).get_indexes("document_versions")}
+    if "ix_document_versions_checksum_size" not in existing:
+        op.create_index(
+            "ix_document_versions_checksum_size", "document_versions", ["checksum", "size_bytes"]
+        )
+    if "ix_document_versions_storage_path" not in existing:
+        op.create_index("ix_document_versions_storage_path", "document_versions", ["storage_path"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_document_versions_storage_path", table_name="document_versions")
+    op.drop_index("ix_document_versions_checksum_size", table_name="document_versions")
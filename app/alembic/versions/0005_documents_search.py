@@ -0,0 +1,114 @@
+"""Full-text search index for documents
+
+Revision ID: 0005_documents_search
+Revises: 0004_document_versions_dedup
+Create Date: 2024-07-xx
+"""
+
+import os
+import re
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0005_documents_search"
+down_revision = "0004_document_versions_dedup"
+branch_labels = None
+depends_on = None
+
+# DDL congelado de esta revisión (las migraciones no importan código de la app)
+_FTS_VALUES = (
+    "{row}.id, {row}.title, "
+    "(SELECT group_concat(value, ' ') FROM json_each("
+    "CASE WHEN json_valid({row}.tags) THEN {row}.tags END) WHERE type = 'text'), "
+    "{row}.note, "
+    "(SELECT group_concat(value, ' ') FROM json_tree("
+    "CASE WHEN json_valid({row}.extra) THEN {row}.extra END) WHERE type = 'text')"
+)
+_FTS_INSERT = "INSERT INTO documents_fts (doc_id, title, tags, note, extra) "
+_FTS_DELETE = "DELETE FROM documents_fts WHERE documents_fts MATCH 'doc_id:\"' || OLD.id || '\"';"
+_FTS_NEW = _FTS_INSERT + "VALUES (" + _FTS_VALUES.format(row="NEW") + ");"
+
+SQLITE_TRIGGERS = {
+    "documents_fts_ai": f"AFTER INSERT ON documents BEGIN {_FTS_NEW} END",
+    "documents_fts_ad": f"AFTER DELETE ON documents BEGIN {_FTS_DELETE} END",
+    "documents_fts_au": (
+        f"AFTER UPDATE OF id, title, tags, note, extra ON documents BEGIN {_FTS_DELETE} {_FTS_NEW} END"
+    ),
+}
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5("
+    "doc_id, title, tags, note, extra, tokenize = 'unicode61 remove_diacritics 2')",
+    *(f"DROP TRIGGER IF EXISTS {name}" for name in SQLITE_TRIGGERS),
+    *(f"CREATE TRIGGER {name} {body}" for name, body in SQLITE_TRIGGERS.items()),
+    "DELETE FROM documents_fts",
+    _FTS_INSERT + "SELECT " + _FTS_VALUES.format(row="s") + " FROM documents AS s",
+]
+
+POSTGRES_DDL = [
+    """
+    CREATE OR REPLACE FUNCTION documents_search_vector(title text, tags jsonb, note text, extra jsonb)
+    RETURNS tsvector LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+        SELECT setweight(to_tsvector('{cfg}'::regconfig, coalesce(title, '')), 'A')
+            || setweight(jsonb_to_tsvector('{cfg}'::regconfig, coalesce(tags, '[]'::jsonb), '["string"]'), 'B')
+            || setweight(to_tsvector('{cfg}'::regconfig, coalesce(note, '')), 'C')
+            || setweight(jsonb_to_tsvector('{cfg}'::regconfig, coalesce(extra, '{{}}'::jsonb), '["string"]'), 'D')
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION documents_tsquery(query text)
+    RETURNS tsquery LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+        SELECT to_tsquery('{cfg}'::regconfig, query)
+    $$
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_documents_search ON documents USING gin (
+        documents_search_vector(title, CAST(tags AS jsonb), note, CAST(extra AS jsonb))
+    )
+    """,
+    """
+    CREATE OR REPLACE FUNCTION search_documents(query text)
+    RETURNS SETOF documents LANGUAGE sql STABLE AS $$
+        SELECT d.*
+        FROM documents AS d, documents_tsquery(query) AS q
+        WHERE documents_search_vector(d.title, CAST(d.tags AS jsonb), d.note, CAST(d.extra AS jsonb)) @@ q
+        ORDER BY ts_rank_cd(
+            documents_search_vector(d.title, CAST(d.tags AS jsonb), d.note, CAST(d.extra AS jsonb)), q
+        ) DESC, d.id DESC
+    $$
+    """,
+]
+
+
+def _ts_config() -> str:
+    # mismo default y validación que SEARCH_TS_CONFIG en app/config.py
+    cfg = os.getenv("SEARCH_TS_CONFIG", "spanish").lower()
+    if not re.match(r"^[a-z_][a-z0-9_]*$", cfg):
+        raise RuntimeError(f"SEARCH_TS_CONFIG inválido: {cfg!r}")
+    return cfg
+
+
+def upgrade() -> None:
+    """FTS5 + triggers (SQLite) or GIN index + search_documents() (Postgres)."""
+    bind = op.get_bind()
+    if bind.dialect.name == "sqlite":
+        for stmt in SQLITE_DDL:
+            bind.exec_driver_sql(stmt)
+    elif bind.dialect.name == "postgresql":
+        cfg = _ts_config()
+        for stmt in POSTGRES_DDL:
+            bind.exec_driver_sql(stmt.format(cfg=cfg))
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "sqlite":
+        for name in SQLITE_TRIGGERS:
+            op.execute(f"DROP TRIGGER IF EXISTS {name}")
+        op.execute("DROP TABLE IF EXISTS documents_fts")
+    elif bind.dialect.name == "postgresql":
+        op.execute("DROP FUNCTION IF EXISTS search_documents(text)")
+        op.execute("DROP INDEX IF EXISTS ix_documents_search")
+        op.execute("DROP FUNCTION IF EXISTS documents_tsquery(text)")
+        op.execute("DROP FUNCTION IF EXISTS documents_search_vector(text, jsonb, text, jsonb)")
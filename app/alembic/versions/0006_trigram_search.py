@@ -0,0 +1,96 @@
+"""Substring search indexes for material names and batch codes
+
+Revision ID: 0006_trigram_search
+Revises: 0005_documents_search
+Create Date: 2024-07-xx
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0006_trigram_search"
+down_revision = "0005_documents_search"
+branch_labels = None
+depends_on = None
+
+# DDL congelado de esta revisión (las migraciones no importan código de la app):
+# tabla FTS5 trigram espejo de cada fuente, (clave, columnas indexadas)
+TRIGRAM_TABLES = {
+    "materials": ("material_id", ["name", "description"]),
+    "batches": ("batch_id", ["batch_code"]),
+}
+PREFIX_INDEXES = {
+    "materials": ("ix_materials_name_lower", "name"),
+    "batches": ("ix_batches_code_lower", "batch_code"),
+}
+
+
+def _sqlite_triggers(source: str) -> dict:
+    key, columns = TRIGRAM_TABLES[source]
+    table = f"{source}_trgm"
+    delete = f"DELETE FROM {table} WHERE {table} MATCH '{key}:\"' || OLD.id || '\"';"
+    values = ", ".join(["NEW.id"] + [f"NEW.{col}" for col in columns])
+    insert = f"INSERT INTO {table} ({key}, {', '.join(columns)}) VALUES ({values});"
+    return {
+        f"{table}_ai": f"AFTER INSERT ON {source} BEGIN {insert} END",
+        f"{table}_ad": f"AFTER DELETE ON {source} BEGIN {delete} END",
+        f"{table}_au": f"AFTER UPDATE OF {', '.join(['id'] + columns)} ON {source} BEGIN {delete} {insert} END",
+    }
+
+
+def _sqlite_ddl(source: str) -> list:
+    key, columns = TRIGRAM_TABLES[source]
+    table = f"{source}_trgm"
+    triggers = _sqlite_triggers(source)
+    name, col = PREFIX_INDEXES[source]
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+        f"{key}, {', '.join(columns)}, tokenize = 'trigram')",
+        *(f"DROP TRIGGER IF EXISTS {trigger}" for trigger in triggers),
+        *(f"CREATE TRIGGER {trigger} {body}" for trigger, body in triggers.items()),
+        f"DELETE FROM {table}",
+        f"INSERT INTO {table} ({key}, {', '.join(columns)}) "
+        f"SELECT {', '.join(['s.id'] + [f's.{c}' for c in columns])} FROM {source} AS s",
+        f"CREATE INDEX IF NOT EXISTS {name} ON {source} (lower({col}))",
+    ]
+
+
+def _postgres_ddl(source: str) -> list:
+    _, columns = TRIGRAM_TABLES[source]
+    name, col = PREFIX_INDEXES[source]
+    return [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        *(
+            f"CREATE INDEX IF NOT EXISTS ix_{source}_{c}_trgm ON {source} USING gin (lower({c}) gin_trgm_ops)"
+            for c in columns
+        ),
+        f"CREATE INDEX IF NOT EXISTS {name} ON {source} (lower({col}) text_pattern_ops)",
+    ]
+
+
+def upgrade() -> None:
+    """FTS5 trigram tables (SQLite) or pg_trgm GIN indexes (Postgres), plus prefix indexes."""
+    bind = op.get_bind()
+    for source in TRIGRAM_TABLES:
+        if bind.dialect.name == "sqlite":
+            ddl = _sqlite_ddl(source)
+        elif bind.dialect.name == "postgresql":
+            ddl = _postgres_ddl(source)
+        else:
+            continue
+        for stmt in ddl:
+            bind.exec_driver_sql(stmt)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    for source, (_, columns) in TRIGRAM_TABLES.items():
+        if bind.dialect.name == "sqlite":
+            for name in _sqlite_triggers(source):
+                op.execute(f"DROP TRIGGER IF EXISTS {name}")
+            op.execute(f"DROP TABLE IF EXISTS {source}_trgm")
+        else:
+            for col in columns:
+                op.execute(f"DROP INDEX IF EXISTS ix_{source}_{col}_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_materials_name_lower")
+    op.execute("DROP INDEX IF EXISTS ix_batches_code_lower")
@@ -0,0 +1,166 @@
+"""Inverted tag index for documents
+
+Revision ID: 0007_document_tags
+Revises: 0006_trigram_search
+Create Date: 2024-07-xx
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "0007_document_tags"
+down_revision = "0006_trigram_search"
+branch_labels = None
+depends_on = None
+
+# DDL congelado de esta revisión (las migraciones no importan código de la app)
+_SQLITE_TAG_ROWS = (
+    "SELECT DISTINCT {row}.id, substr(lower(trim(value)), 1, 255) "
+    "FROM json_each(CASE WHEN json_valid({row}.tags) THEN {row}.tags END) "
+    "WHERE type = 'text' AND trim(value) <> ''"
+)
+_SQLITE_INSERT = (
+    "INSERT OR IGNORE INTO document_tags (document_id, tag) " + _SQLITE_TAG_ROWS.format(row="NEW") + ";"
+)
+_SQLITE_DELETE = "DELETE FROM document_tags WHERE document_id = OLD.id;"
+
+SQLITE_TRIGGERS = {
+    "document_tags_ai": f"AFTER INSERT ON documents BEGIN {_SQLITE_INSERT} END",
+    "document_tags_au": f"AFTER UPDATE OF id, tags ON documents BEGIN {_SQLITE_DELETE} {_SQLITE_INSERT} END",
+    "document_tags_ad": f"AFTER DELETE ON documents BEGIN {_SQLITE_DELETE} END",
+    "document_tag_counts_ai": (
+        "AFTER INSERT ON document_tags BEGIN "
+        "INSERT INTO document_tag_counts (tag, documents) VALUES (NEW.tag, 1) "
+        "ON CONFLICT (tag) DO UPDATE SET documents = documents + 1; END"
+    ),
+    "document_tag_counts_ad": (
+        "AFTER DELETE ON document_tags BEGIN "
+        "UPDATE document_tag_counts SET documents = documents - 1 WHERE tag = OLD.tag; END"
+    ),
+}
+
+_REBUILD_COUNTS = (
+    "INSERT INTO document_tag_counts (tag, documents) "
+    "SELECT tag, count(*) FROM document_tags GROUP BY tag"
+)
+
+# índice y conteos se reconstruyen sin triggers; los conteos salen de un GROUP BY
+SQLITE_DDL = [
+    *(f"DROP TRIGGER IF EXISTS {name}" for name in SQLITE_TRIGGERS),
+    "DELETE FROM document_tags",
+    "DELETE FROM document_tag_counts",
+    "INSERT OR IGNORE INTO document_tags (document_id, tag) "
+    + _SQLITE_TAG_ROWS.format(row="d").replace("FROM json_each", "FROM documents AS d, json_each"),
+    _REBUILD_COUNTS,
+    *(f"CREATE TRIGGER {name} {body}" for name, body in SQLITE_TRIGGERS.items()),
+]
+
+_PG_TAG_ROWS = """
+    SELECT DISTINCT {row}.id, left(lower(btrim(t)), 255)
+    FROM json_array_elements_text(
+        CASE WHEN json_typeof({row}.tags::json) = 'array' THEN {row}.tags::json ELSE '[]'::json END
+    ) AS t
+    WHERE btrim(t) <> ''
+"""
+
+POSTGRES_TRIGGERS = {
+    "document_tags_ai": "AFTER INSERT ON documents FOR EACH ROW EXECUTE FUNCTION document_tags_sync()",
+    "document_tags_au": (
+        "AFTER UPDATE OF id, tags ON documents FOR EACH ROW "
+        "WHEN (OLD.id IS DISTINCT FROM NEW.id OR OLD.tags::jsonb IS DISTINCT FROM NEW.tags::jsonb) "
+        "EXECUTE FUNCTION document_tags_sync()"
+    ),
+    "document_tags_ad": "AFTER DELETE ON documents FOR EACH ROW EXECUTE FUNCTION document_tags_sync()",
+}
+POSTGRES_COUNT_TRIGGER = (
+    "CREATE TRIGGER document_tag_counts_aid AFTER INSERT OR DELETE ON document_tags "
+    "FOR EACH ROW EXECUTE FUNCTION document_tag_counts_sync()"
+)
+
+POSTGRES_DDL = [
+    f"""
+    CREATE OR REPLACE FUNCTION document_tags_sync() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP <> 'INSERT' THEN
+            DELETE FROM document_tags WHERE document_id = OLD.id;
+        END IF;
+        IF TG_OP <> 'DELETE' THEN
+            INSERT INTO document_tags (document_id, tag)
+            {_PG_TAG_ROWS.format(row="NEW")}
+            ON CONFLICT DO NOTHING;
+        END IF;
+        RETURN NULL;
+    END
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION document_tag_counts_sync() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO document_tag_counts (tag, documents) VALUES (NEW.tag, 1)
+            ON CONFLICT (tag) DO UPDATE SET documents = document_tag_counts.documents + 1;
+        ELSE
+            UPDATE document_tag_counts SET documents = documents - 1 WHERE tag = OLD.tag;
+        END IF;
+        RETURN NULL;
+    END
+    $$
+    """,
+    *(f"DROP TRIGGER IF EXISTS {name} ON documents" for name in POSTGRES_TRIGGERS),
+    "DROP TRIGGER IF EXISTS document_tag_counts_aid ON document_tags",
+    "DELETE FROM document_tags",
+    "DELETE FROM document_tag_counts",
+    "INSERT INTO document_tags (document_id, tag) "
+    + _PG_TAG_ROWS.format(row="d").replace("FROM json_array", "FROM documents AS d, json_array"),
+    _REBUILD_COUNTS,
+    *(f"CREATE TRIGGER {name} {body}" for name, body in POSTGRES_TRIGGERS.items()),
+    POSTGRES_COUNT_TRIGGER,
+    # PostgREST necesita ver las tablas nuevas para los embeds de Supabase
+    "NOTIFY pgrst, 'reload schema'",
+]
+
+
+def upgrade() -> None:
+    """Create document_tags/document_tag_counts and the triggers that fill them."""
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("document_tags"):
+        op.create_table(
+            "document_tags",
+            sa.Column(
+                "document_id",
+                postgresql.UUID(as_uuid=True),
+                sa.ForeignKey("documents.id", ondelete="CASCADE"),
+                primary_key=True,
+            ),
+            sa.Column("tag", sa.String(255), primary_key=True),
+        )
+        op.create_index("ix_document_tags_tag_doc", "document_tags", ["tag", "document_id"])
+    if not inspector.has_table("document_tag_counts"):
+        op.create_table(
+            "document_tag_counts",
+            sa.Column("tag", sa.String(255), primary_key=True),
+            sa.Column("documents", sa.Integer(), nullable=False, server_default="0"),
+        )
+    # triggers + backfill desde documents.tags
+    bind = op.get_bind()
+    ddl = {"sqlite": SQLITE_DDL, "postgresql": POSTGRES_DDL}.get(bind.dialect.name, [])
+    for stmt in ddl:
+        bind.exec_driver_sql(stmt)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "sqlite":
+        for name in SQLITE_TRIGGERS:
+            op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    elif bind.dialect.name == "postgresql":
+        op.execute("DROP TRIGGER IF EXISTS document_tags_ai ON documents")
+        op.execute("DROP TRIGGER IF EXISTS document_tags_au ON documents")
+        op.execute("DROP TRIGGER IF EXISTS document_tags_ad ON documents")
+        op.execute("DROP FUNCTION IF EXISTS document_tags_sync()")
+    op.drop_table("document_tag_counts")
+    op.drop_table("document_tags")
+    if bind.dialect.name == "postgresql":
+        op.execute("DROP FUNCTION IF EXISTS document_tag_counts_sync()")
@@ -0,0 +1,165 @@
+"""Promoted Document.extra keys in an indexed side table
+
+Revision ID: 0008_document_extra_values
+Revises: 0007_document_tags
+Create Date: 2024-07-xx
+"""
+
+import os
+import re
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "0008_document_extra_values"
+down_revision = "0007_document_tags"
+branch_labels = None
+depends_on = None
+
+# DDL congelado de esta revisión (las migraciones no importan código de la app)
+_VALUES = "document_extra_values (document_id, key, value_text, value_num) "
+
+_SQLITE_ROWS = (
+    "SELECT {row}.id, j.key, "
+    "CASE j.type WHEN 'true' THEN 'true' WHEN 'false' THEN 'false' ELSE CAST(j.value AS TEXT) END, "
+    "CASE WHEN j.type IN ('integer', 'real') THEN j.value "
+    "WHEN j.type = 'text' AND ltrim(j.value, '-') GLOB '[0-9]*' "
+    "AND ltrim(j.value, '-') NOT GLOB '*[^0-9.]*' THEN CAST(j.value AS REAL) END "
+    "FROM json_each(CASE WHEN json_valid({row}.extra) THEN {row}.extra END) AS j "
+    "WHERE j.type NOT IN ('object', 'array', 'null') "
+    "AND j.key IN (SELECT key FROM document_extra_keys)"
+)
+_SQLITE_INSERT = "INSERT OR IGNORE INTO " + _VALUES
+_SQLITE_DELETE = "DELETE FROM document_extra_values WHERE document_id = OLD.id;"
+
+SQLITE_TRIGGERS = {
+    "document_extra_ai": f"AFTER INSERT ON documents BEGIN {_SQLITE_INSERT}{_SQLITE_ROWS.format(row='NEW')}; END",
+    "document_extra_au": (
+        "AFTER UPDATE OF id, extra ON documents "
+        f"BEGIN {_SQLITE_DELETE} {_SQLITE_INSERT}{_SQLITE_ROWS.format(row='NEW')}; END"
+    ),
+    "document_extra_ad": f"AFTER DELETE ON documents BEGIN {_SQLITE_DELETE} END",
+}
+
+_PG_ROWS = """
+    SELECT {row}.id, j.key,
+        CASE jsonb_typeof(j.value) WHEN 'string' THEN j.value #>> '{{}}' ELSE j.value::text END,
+        CASE
+            WHEN jsonb_typeof(j.value) = 'number' THEN (j.value #>> '{{}}')::double precision
+            WHEN jsonb_typeof(j.value) = 'string' AND j.value #>> '{{}}' ~ '^-?[0-9]+(\\.[0-9]+)?$'
+                THEN (j.value #>> '{{}}')::double precision
+        END
+    FROM jsonb_each(
+        CASE WHEN jsonb_typeof({row}.extra::jsonb) = 'object' THEN {row}.extra::jsonb ELSE '{{}}'::jsonb END
+    ) AS j
+    WHERE jsonb_typeof(j.value) NOT IN ('object', 'array', 'null')
+      AND j.key IN (SELECT key FROM document_extra_keys)
+"""
+
+# La versión original de esta revisión usaba INSERT OR IGNORE (sintaxis de
+# SQLite) también acá: congelada ya corregida para que reproducir la
+# historia en Postgres no deje un trigger que falla en cada INSERT.
+POSTGRES_FUNCTION = f"""
+    CREATE OR REPLACE FUNCTION document_extra_sync() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP <> 'INSERT' THEN
+            DELETE FROM document_extra_values WHERE document_id = OLD.id;
+        END IF;
+        IF TG_OP <> 'DELETE' THEN
+            INSERT INTO {_VALUES}
+            {_PG_ROWS.format(row="NEW")}
+            ON CONFLICT DO NOTHING;
+        END IF;
+        RETURN NULL;
+    END
+    $$
+"""
+
+POSTGRES_TRIGGERS = {
+    "document_extra_ai": "AFTER INSERT ON documents FOR EACH ROW EXECUTE FUNCTION document_extra_sync()",
+    "document_extra_au": (
+        "AFTER UPDATE OF id, extra ON documents FOR EACH ROW "
+        "WHEN (OLD.id IS DISTINCT FROM NEW.id OR OLD.extra::jsonb IS DISTINCT FROM NEW.extra::jsonb) "
+        "EXECUTE FUNCTION document_extra_sync()"
+    ),
+    "document_extra_ad": "AFTER DELETE ON documents FOR EACH ROW EXECUTE FUNCTION document_extra_sync()",
+}
+
+
+def _promoted_keys() -> list:
+    # mismo default y validación que PROMOTED_EXTRA_KEYS en app/config.py
+    keys = [k.strip() for k in os.getenv("PROMOTED_EXTRA_KEYS", "linea,turno,maquina").split(",") if k.strip()]
+    bad = [k for k in keys if not re.match(r"^[A-Za-z0-9_]{1,64}$", k)]
+    if bad:
+        raise RuntimeError(f"PROMOTED_EXTRA_KEYS inválidas: {bad}")
+    return list(dict.fromkeys(keys))
+
+
+def _install(bind) -> None:
+    if bind.dialect.name == "sqlite":
+        for name, body in SQLITE_TRIGGERS.items():
+            bind.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+            bind.exec_driver_sql(f"CREATE TRIGGER {name} {body}")
+        insert, rows, marker = _SQLITE_INSERT, _SQLITE_ROWS.format(row="d"), "FROM json_each"
+    elif bind.dialect.name == "postgresql":
+        bind.exec_driver_sql(POSTGRES_FUNCTION)
+        for name, body in POSTGRES_TRIGGERS.items():
+            bind.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name} ON documents")
+            bind.exec_driver_sql(f"CREATE TRIGGER {name} {body}")
+        # PostgREST necesita ver la relación nueva para los embeds de Supabase
+        bind.exec_driver_sql("NOTIFY pgrst, 'reload schema'")
+        insert, rows, marker = "INSERT INTO " + _VALUES, _PG_ROWS.format(row="d"), "FROM jsonb_each"
+    else:
+        return
+    bind.exec_driver_sql("DELETE FROM document_extra_keys")
+    keys = _promoted_keys()
+    if keys:
+        bind.execute(sa.text("INSERT INTO document_extra_keys (key) VALUES (:key)"), [{"key": k} for k in keys])
+    bind.exec_driver_sql("DELETE FROM document_extra_values")
+    bind.exec_driver_sql(insert + rows.replace(marker, "FROM documents AS d, " + marker[5:], 1))
+
+
+def upgrade() -> None:
+    """Create document_extra_keys/values and the triggers that fill them."""
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("document_extra_keys"):
+        op.create_table(
+            "document_extra_keys",
+            sa.Column("key", sa.String(64), primary_key=True),
+        )
+    if not inspector.has_table("document_extra_values"):
+        op.create_table(
+            "document_extra_values",
+            sa.Column(
+                "document_id",
+                postgresql.UUID(as_uuid=True),
+                sa.ForeignKey("documents.id", ondelete="CASCADE"),
+                primary_key=True,
+            ),
+            sa.Column("key", sa.String(64), primary_key=True),
+            sa.Column("value_text", sa.Text(), nullable=True),
+            sa.Column("value_num", sa.Float(), nullable=True),
+        )
+        op.create_index(
+            "ix_document_extra_values_num", "document_extra_values", ["key", "value_num", "document_id"]
+        )
+        op.create_index(
+            "ix_document_extra_values_text", "document_extra_values", ["key", "value_text", "document_id"]
+        )
+    # triggers + backfill de PROMOTED_EXTRA_KEYS
+    _install(op.get_bind())
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "sqlite":
+        for name in SQLITE_TRIGGERS:
+            op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    elif bind.dialect.name == "postgresql":
+        for name in POSTGRES_TRIGGERS:
+            op.execute(f"DROP TRIGGER IF EXISTS {name} ON documents")
+        op.execute("DROP FUNCTION IF EXISTS document_extra_sync()")
+    op.drop_table("document_extra_values")
+    op.drop_table("document_extra_keys")
@@ -0,0 +1,30 @@
+"""schema_state table for the startup schema fingerprint
+
+Revision ID: 0009_schema_state
+Revises: 0008_document_extra_values
+Create Date: 2024-07-xx
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0009_schema_state"
+down_revision = "0008_document_extra_values"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Create schema_state; the app fills it after syncing the schema."""
+    if not sa.inspect(op.get_bind()).has_table("schema_state"):
+        op.create_table(
+            "schema_state",
+            sa.Column("key", sa.String(32), primary_key=True),
+            sa.Column("fingerprint", sa.String(64), nullable=False),
+            sa.Column("applied_at", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("schema_state")
@@ -0,0 +1,85 @@
+"""add_document_version()/discard_document_version() for atomic version allocation
+
+Revision ID: 0010_document_version_functions
+Revises: 0009_schema_state
+Create Date: 2024-07-xx
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0010_document_version_functions"
+down_revision = "0009_schema_state"
+branch_labels = None
+depends_on = None
+
+# DDL congelado de esta revisión (las migraciones no importan código de la app)
+POSTGRES_FUNCTIONS = [
+    """
+    CREATE OR REPLACE FUNCTION add_document_version(
+        p_document_id uuid,
+        p_storage_path text,
+        p_checksum text,
+        p_size_bytes bigint,
+        p_mime_type text DEFAULT NULL,
+        p_note text DEFAULT NULL,
+        p_dedup boolean DEFAULT false
+    ) RETURNS TABLE (version integer, storage_path text, reused boolean)
+    LANGUAGE plpgsql AS $$
+    #variable_conflict use_column
+    DECLARE
+        v integer;
+        existing text;
+    BEGIN
+        UPDATE documents SET current_version = current_version + 1, updated_at = now()
+        WHERE id = p_document_id
+        RETURNING current_version INTO v;
+        IF NOT FOUND THEN
+            RETURN;
+        END IF;
+        IF p_dedup THEN
+            SELECT dv.storage_path INTO existing
+            FROM document_versions AS dv
+            WHERE dv.checksum = p_checksum AND dv.size_bytes = p_size_bytes
+            LIMIT 1;
+        END IF;
+        INSERT INTO document_versions
+            (id, document_id, version, storage_path, checksum, size_bytes, mime_type, note)
+        VALUES (
+            gen_random_uuid(), p_document_id, v, coalesce(existing, p_storage_path),
+            p_checksum, p_size_bytes, p_mime_type, p_note
+        );
+        RETURN QUERY SELECT v, coalesce(existing, p_storage_path), existing IS NOT NULL;
+    END
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION discard_document_version(p_document_id uuid, p_version integer)
+    RETURNS void LANGUAGE sql AS $$
+        DELETE FROM document_versions WHERE document_id = p_document_id AND version = p_version;
+        UPDATE documents AS d SET current_version = coalesce(
+            (SELECT max(dv.version) FROM document_versions AS dv WHERE dv.document_id = p_document_id), 1
+        )
+        WHERE d.id = p_document_id AND d.current_version = p_version;
+    $$
+    """,
+]
+
+
+def upgrade() -> None:
+    """Postgres functions called over RPC by POST /documents/{id}/versions."""
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+    for ddl in POSTGRES_FUNCTIONS:
+        bind.exec_driver_sql(ddl)
+    # PostgREST necesita recargar el esquema para exponer las funciones por RPC
+    bind.exec_driver_sql("NOTIFY pgrst, 'reload schema'")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(
+            "DROP FUNCTION IF EXISTS add_document_version(uuid, text, text, bigint, text, text, boolean)"
+        )
+        op.execute("DROP FUNCTION IF EXISTS discard_document_version(uuid, integer)")
@@ -0,0 +1,38 @@
+"""upload_sessions table for resumable uploads
+
+Revision ID: 0011_upload_sessions
+Revises: 0010_document_version_functions
+Create Date: 2024-07-xx
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "0011_upload_sessions"
+down_revision = "0010_document_version_functions"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Create upload_sessions (resumable uploads of the SQL documents router)."""
+    if not sa.inspect(op.get_bind()).has_table("upload_sessions"):
+        op.create_table(
+            "upload_sessions",
+            sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+            sa.Column("filename", sa.String(255), nullable=False),
+            sa.Column("mime_type", sa.String(255), nullable=True),
+            sa.Column("size_bytes", sa.BigInteger(), nullable=False),
+            sa.Column("received_bytes", sa.BigInteger(), nullable=False, server_default="0"),
+            sa.Column("checksum", sa.String(64), nullable=True),
+            sa.Column("created_at", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+            sa.Column("expires_at", sa.DateTime(), nullable=False),
+        )
+        op.create_index("ix_upload_sessions_expires_at", "upload_sessions", ["expires_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_upload_sessions_expires_at", table_name="upload_sessions")
+    op.drop_table("upload_sessions")
@@ -0,0 +1,70 @@
+"""add_document_version() without in-function dedup; drop discard_document_version()
+
+Revision ID: 0012_publish_versions_after_upload
+Revises: 0011_upload_sessions
+Create Date: 2024-07-xx
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0012_publish_versions_after_upload"
+down_revision = "0011_upload_sessions"
+branch_labels = None
+depends_on = None
+
+# DDL congelado de esta revisión (las migraciones no importan código de la app)
+# Firmas de 0010 (dedup dentro de la función, alta antes del upload)
+DROPPED_FUNCTIONS = [
+    "DROP FUNCTION IF EXISTS add_document_version(uuid, text, text, bigint, text, text, boolean)",
+    "DROP FUNCTION IF EXISTS discard_document_version(uuid, integer)",
+]
+
+POSTGRES_FUNCTIONS = [
+    """
+    CREATE OR REPLACE FUNCTION add_document_version(
+        p_document_id uuid,
+        p_storage_path text,
+        p_checksum text,
+        p_size_bytes bigint,
+        p_mime_type text DEFAULT NULL,
+        p_note text DEFAULT NULL
+    ) RETURNS TABLE (version integer)
+    LANGUAGE plpgsql AS $$
+    #variable_conflict use_column
+    DECLARE
+        v integer;
+    BEGIN
+        UPDATE documents SET current_version = current_version + 1, updated_at = now()
+        WHERE id = p_document_id
+        RETURNING current_version INTO v;
+        IF NOT FOUND THEN
+            RETURN;
+        END IF;
+        INSERT INTO document_versions
+            (id, document_id, version, storage_path, checksum, size_bytes, mime_type, note)
+        VALUES (
+            gen_random_uuid(), p_document_id, v, p_storage_path,
+            p_checksum, p_size_bytes, p_mime_type, p_note
+        );
+        RETURN QUERY SELECT v;
+    END
+    $$
+    """,
+]
+
+
+def upgrade() -> None:
+    """The version row is now inserted only after its Storage object exists."""
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+    for ddl in DROPPED_FUNCTIONS + POSTGRES_FUNCTIONS:
+        bind.exec_driver_sql(ddl)
+    # PostgREST necesita recargar el esquema para exponer las funciones por RPC
+    bind.exec_driver_sql("NOTIFY pgrst, 'reload schema'")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("DROP FUNCTION IF EXISTS add_document_version(uuid, text, text, bigint, text, text)")
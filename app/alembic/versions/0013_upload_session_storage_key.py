@@ -0,0 +1,26 @@
+"""upload_sessions.storage_key: finalize can be retried without re-uploading
+
+Revision ID: 0013_upload_session_storage_key
+Revises: 0012_publish_versions_after_upload
+Create Date: 2024-07-xx
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0013_upload_session_storage_key"
+down_revision = "0012_publish_versions_after_upload"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Storage key of a completed upload, kept until its document/version is committed."""
+    columns = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("upload_sessions")}
+    if "storage_key" not in columns:
+        op.add_column("upload_sessions", sa.Column("storage_key", sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("upload_sessions", "storage_key")
@@ -0,0 +1,95 @@
+"""Extra values: one numeric rule in the SQLite triggers, Postgres and the filters
+
+Revision ID: 0014_extra_values_numeric_rule
+Revises: 0013_upload_session_storage_key
+Create Date: 2024-07-xx
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0014_extra_values_numeric_rule"
+down_revision = "0013_upload_session_storage_key"
+branch_labels = None
+depends_on = None
+
+# DDL congelado de esta revisión (las migraciones no importan código de la app).
+# Un texto es numérico si cumple ^-?[0-9]+(\.[0-9]+)?$; en SQLite, con GLOB.
+_VALUES = "document_extra_values (document_id, key, value_text, value_num) "
+_UNSIGNED = "CASE WHEN substr(j.value, 1, 1) = '-' THEN substr(j.value, 2) ELSE j.value END"
+
+_SQLITE_ROWS = (
+    "SELECT {row}.id, j.key, "
+    "CASE j.type WHEN 'true' THEN 'true' WHEN 'false' THEN 'false' ELSE CAST(j.value AS TEXT) END, "
+    "CASE WHEN j.type IN ('integer', 'real') THEN j.value "
+    f"WHEN j.type = 'text' AND {_UNSIGNED} <> '' AND {_UNSIGNED} NOT GLOB '*[^0-9.]*' "
+    f"AND {_UNSIGNED} NOT GLOB '*.*.*' AND {_UNSIGNED} NOT GLOB '.*' AND {_UNSIGNED} NOT GLOB '*.' "
+    "THEN CAST(j.value AS REAL) END "
+    "FROM json_each(CASE WHEN json_valid({row}.extra) THEN {row}.extra END) AS j "
+    "WHERE j.type NOT IN ('object', 'array', 'null') "
+    "AND j.key IN (SELECT key FROM document_extra_keys)"
+)
+_SQLITE_INSERT = "INSERT OR IGNORE INTO " + _VALUES
+_SQLITE_DELETE = "DELETE FROM document_extra_values WHERE document_id = OLD.id;"
+
+SQLITE_TRIGGERS = {
+    "document_extra_ai": f"AFTER INSERT ON documents BEGIN {_SQLITE_INSERT}{_SQLITE_ROWS.format(row='NEW')}; END",
+    "document_extra_au": (
+        "AFTER UPDATE OF id, extra ON documents "
+        f"BEGIN {_SQLITE_DELETE} {_SQLITE_INSERT}{_SQLITE_ROWS.format(row='NEW')}; END"
+    ),
+    "document_extra_ad": f"AFTER DELETE ON documents BEGIN {_SQLITE_DELETE} END",
+}
+
+_PG_ROWS = """
+    SELECT {row}.id, j.key,
+        CASE jsonb_typeof(j.value) WHEN 'string' THEN j.value #>> '{{}}' ELSE j.value::text END,
+        CASE
+            WHEN jsonb_typeof(j.value) = 'number' THEN (j.value #>> '{{}}')::double precision
+            WHEN jsonb_typeof(j.value) = 'string' AND j.value #>> '{{}}' ~ '^-?[0-9]+(\\.[0-9]+)?$'
+                THEN (j.value #>> '{{}}')::double precision
+        END
+    FROM jsonb_each(
+        CASE WHEN jsonb_typeof({row}.extra::jsonb) = 'object' THEN {row}.extra::jsonb ELSE '{{}}'::jsonb END
+    ) AS j
+    WHERE jsonb_typeof(j.value) NOT IN ('object', 'array', 'null')
+      AND j.key IN (SELECT key FROM document_extra_keys)
+"""
+
+POSTGRES_FUNCTION = f"""
+    CREATE OR REPLACE FUNCTION document_extra_sync() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP <> 'INSERT' THEN
+            DELETE FROM document_extra_values WHERE document_id = OLD.id;
+        END IF;
+        IF TG_OP <> 'DELETE' THEN
+            INSERT INTO {_VALUES}
+            {_PG_ROWS.format(row="NEW")}
+            ON CONFLICT DO NOTHING;
+        END IF;
+        RETURN NULL;
+    END
+    $$
+"""
+
+def upgrade() -> None:
+    """Replace the SQLite triggers and the Postgres function, then recompute document_extra_values."""
+    bind = op.get_bind()
+    if bind.dialect.name == "sqlite":
+        for name, body in SQLITE_TRIGGERS.items():
+            bind.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+            bind.exec_driver_sql(f"CREATE TRIGGER {name} {body}")
+        insert, rows, marker = _SQLITE_INSERT, _SQLITE_ROWS.format(row="d"), "FROM json_each"
+    elif bind.dialect.name == "postgresql":
+        # los triggers ya apuntan a document_extra_sync(); alcanza con reemplazarla
+        bind.exec_driver_sql(POSTGRES_FUNCTION)
+        insert, rows, marker = "INSERT INTO " + _VALUES, _PG_ROWS.format(row="d"), "FROM jsonb_each"
+    else:
+        return
+    bind.exec_driver_sql("DELETE FROM document_extra_values")
+    bind.exec_driver_sql(insert + rows.replace(marker, "FROM documents AS d, " + marker[5:], 1))
+
+
+def downgrade() -> None:
+    # la regla anterior indexaba como número textos como "1.2.3"; no se restaura
+    pass
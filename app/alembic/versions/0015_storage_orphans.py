@@ -0,0 +1,31 @@
+"""storage_orphans: Storage objects left without a version, deleted by a delayed sweep
+
+Revision ID: 0015_storage_orphans
+Revises: 0014_extra_values_numeric_rule
+Create Date: 2024-07-xx
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0015_storage_orphans"
+down_revision = "0014_extra_values_numeric_rule"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Create storage_orphans (path + when it was marked)."""
+    if not sa.inspect(op.get_bind()).has_table("storage_orphans"):
+        op.create_table(
+            "storage_orphans",
+            sa.Column("storage_path", sa.Text(), primary_key=True),
+            sa.Column("marked_at", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        )
+        op.create_index("ix_storage_orphans_marked_at", "storage_orphans", ["marked_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_storage_orphans_marked_at", table_name="storage_orphans")
+    op.drop_table("storage_orphans")
@@ -0,0 +1,97 @@
+# app/bulk.py
+"""
+Utilidades para cargas masivas: lectura en streaming de CSV/NDJSON desde
+el body del request e INSERT multi-fila con ON CONFLICT según el dialecto.
+"""
+from __future__ import annotations
+
+import codecs
+import csv
+import json
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+from sqlalchemy import Table
+from sqlalchemy.orm import Session
+
+# Filas por INSERT multi-fila (y por transacción, salvo política "fail")
+BULK_CHUNK_SIZE = 1000
+
+Record = Tuple[int, Optional[Dict[str, Any]], Optional[str]]
+
+
+def detect_format(content_type: Optional[str]) -> str:
+    ct = (content_type or "").lower()
+    if "csv" in ct:
+        return "csv"
+    if "ndjson" in ct or "jsonl" in ct or "json" in ct:
+        return "ndjson"
+    raise HTTPException(
+        status_code=415, detail="Content-Type debe ser text/csv o application/x-ndjson"
+    )
+
+
+async def _iter_lines(request: Request) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buf = ""
+    async for chunk in request.stream():
+        buf += decoder.decode(chunk)
+        *lines, buf = buf.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buf += decoder.decode(b"", final=True)
+    if buf:
+        yield buf.rstrip("\r")
+
+
+async def iter_records(request: Request, fmt: str) -> AsyncIterator[Record]:
+    """
+    Genera ``(nro_fila, registro, error)`` leyendo el body de a bloques.
+    Las filas se numeran desde 1 sin contar el encabezado CSV; las líneas
+    vacías se ignoran. Los campos CSV multilínea no están soportados.
+    """
+    header = None
+    row_no = 0
+    async for line in _iter_lines(request):
+        if not line.strip():
+            continue
+        if fmt == "csv" and header is None:
+            header = [h.strip() for h in next(csv.reader([line]))]
+            continue
+        row_no += 1
+        if fmt == "csv":
+            values = next(csv.reader([line]))
+            if len(values) != len(header):
+                yield row_no, None, "Cantidad de columnas inválida"
+                continue
+            # celdas vacías = campo omitido (aplican defaults del esquema)
+            yield row_no, {k: v for k, v in zip(header, values) if v != ""}, None
+        else:
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield row_no, None, f"JSON inválido: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield row_no, None, "Cada línea debe ser un objeto JSON"
+                continue
+            yield row_no, record, None
+
+
+def validation_message(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in exc.errors()
+    )
+
+
+def dialect_insert(db: Session, table: Table) -> Any:
+    """``INSERT`` del dialecto activo (soporta ``on_conflict_do_*``)."""
+    name = db.get_bind().dialect.name
+    if name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise HTTPException(status_code=501, detail=f"Carga masiva no soportada en {name}")
+    return insert(table)
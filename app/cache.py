@@ -0,0 +1,278 @@
+# app/cache.py
+"""
+Cachés con expiración (TTL) para resultados consultados muy seguido.
+
+- ``TTLCache``: en memoria de proceso, con desalojo LRU; segura entre hilos.
+- ``RedisCache``: backend compartido opcional (``CACHE_URL``), para que
+  varios workers reutilicen las mismas entradas. Requiere ``redis``.
+- ``make_cache`` arma la combinación según la configuración: memoria local
+  como primer nivel y, si hay ``CACHE_URL``, Redis como segundo.
+- ``EntityCache``: read-through por id con invalidación explícita y
+  contador de versión compartido entre workers.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, Union
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING or item[0] <= now:
+                if item is not _MISSING:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class RedisCache:
+    """
+    Caché compartida en Redis con la misma interfaz que ``TTLCache``.
+    Las claves deben ser ``str`` y los valores serializables a JSON.
+    Ante errores de Redis se comporta como un miss (nunca rompe el request).
+    """
+
+    def __init__(self, client: Any, namespace: str, ttl: float = 60.0):
+        self.client = client
+        self.prefix = f"dfapi:{namespace}:"
+        self.ttl = ttl
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            raw = self.client.get(self.prefix + key)
+        except Exception as e:
+            logger.warning("Cache compartida no disponible: %s", e)
+            return default
+        return default if raw is None else json.loads(raw)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl_ms = max(1, int((self.ttl if ttl is None else ttl) * 1000))
+        try:
+            self.client.set(self.prefix + key, json.dumps(value), px=ttl_ms)
+        except Exception as e:
+            logger.warning("Cache compartida no disponible: %s", e)
+
+    def delete(self, key: str) -> None:
+        try:
+            self.client.delete(self.prefix + key)
+        except Exception as e:
+            logger.warning("Cache compartida no disponible: %s", e)
+
+    def clear(self) -> None:
+        try:
+            keys = list(self.client.scan_iter(match=self.prefix + "*"))
+            if keys:
+                self.client.delete(*keys)
+        except Exception as e:
+            logger.warning("Cache compartida no disponible: %s", e)
+
+    def counter(self, key: str) -> Optional[int]:
+        """Valor de un contador compartido (0 si no existe, None si Redis falla)."""
+        try:
+            raw = self.client.get(self.prefix + "v:" + key)
+        except Exception as e:
+            logger.warning("Cache compartida no disponible: %s", e)
+            return None
+        return int(raw or 0)
+
+    def bump(self, key: str) -> None:
+        try:
+            self.client.incr(self.prefix + "v:" + key)
+        except Exception as e:
+            logger.warning("Cache compartida no disponible: %s", e)
+
+
+class TieredCache:
+    """
+    Memoria local (L1) delante de una caché compartida (L2).
+
+    En L2 cada valor va con su vencimiento (epoch): al traerlo a L1 se usa
+    lo que le queda de vida, no el TTL por defecto, así una entrada no dura
+    más en un worker que en Redis.
+    """
+
+    def __init__(self, local: TTLCache, shared: RedisCache):
+        self.local = local
+        self.shared = shared
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self.local.get(key, _MISSING)
+        if value is _MISSING:
+            entry = self.shared.get(key)
+            # entradas vencidas o del formato anterior (sin vencimiento): miss
+            if isinstance(entry, dict) and entry.get("expires_at", 0) > time.time():
+                value = entry["value"]
+                self.local.set(key, value, entry["expires_at"] - time.time())
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.local.ttl if ttl is None else ttl
+        self.local.set(key, value, ttl)
+        self.shared.set(key, {"value": value, "expires_at": time.time() + ttl}, ttl)
+
+    def delete(self, key: str) -> None:
+        self.local.delete(key)
+        self.shared.delete(key)
+
+    def clear(self) -> None:
+        self.local.clear()
+        self.shared.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self.local), "hits": self.hits, "misses": self.misses}
+
+
+_redis_client: Any = None
+
+
+def _get_redis_client() -> Any:
+    global _redis_client
+    if _redis_client is None:
+        import redis  # dependencia opcional: solo si hay CACHE_URL
+
+        _redis_client = redis.Redis.from_url(
+            settings.CACHE_URL, socket_timeout=0.2, socket_connect_timeout=0.2
+        )
+    return _redis_client
+
+
+def make_cache(namespace: str, maxsize: int = 1024, ttl: float = 60.0) -> Union[TTLCache, TieredCache]:
+    local = TTLCache(maxsize=maxsize, ttl=ttl)
+    if not settings.CACHE_URL:
+        return local
+    return TieredCache(local, RedisCache(_get_redis_client(), namespace, ttl=ttl))
+
+
+class EntityCache:
+    """
+    Caché read-through de entidades por id (valores ya serializados).
+
+    Con ``CACHE_URL`` cada id tiene un contador de versión en Redis:
+    ``invalidate`` lo incrementa y una entrada (local o compartida) solo se
+    usa si fue guardada con la versión vigente, así ningún worker sirve datos
+    que otro ya invalidó. Sin Redis la invalidación es local al proceso y el
+    TTL acota cuánto puede durar un dato viejo en otros workers.
+    """
+
+    def __init__(self, namespace: str, maxsize: int = 10000, ttl: float = 60.0):
+        self.namespace = namespace
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.shared = (
+            RedisCache(_get_redis_client(), f"entity:{namespace}", ttl=ttl)
+            if settings.CACHE_URL
+            else None
+        )
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, key: str) -> Tuple[Optional[int], Any]:
+        version = self.shared.counter(key) if self.shared else 0
+        if version is not None:
+            entry = self.local.get(key)
+            if entry is None and self.shared:
+                entry = self.shared.get(key)
+                if entry is not None:
+                    self.local.set(key, entry)
+            if entry is not None and entry[0] == version:
+                self.hits += 1
+                return version, entry[1]
+        self.misses += 1
+        return version, _MISSING
+
+    def _store(self, key: str, version: Optional[int], value: Optional[Any]) -> None:
+        # no se cachean ausencias ni lecturas sin versión confiable
+        if value is not None and version is not None:
+            entry = [version, value]
+            self.local.set(key, entry)
+            if self.shared:
+                self.shared.set(key, entry)
+
+    def get_or_load(self, key: str, loader: Callable[[], Optional[Any]]) -> Optional[Any]:
+        version, value = self._lookup(key)
+        if value is _MISSING:
+            value = loader()
+            self._store(key, version, value)
+        return value
+
+    async def aget_or_load(
+        self, key: str, loader: Callable[[], Awaitable[Optional[Any]]]
+    ) -> Optional[Any]:
+        """Como ``get_or_load`` con un loader async (routers con AsyncSession)."""
+        version, value = self._lookup(key)
+        if value is _MISSING:
+            value = await loader()
+            self._store(key, version, value)
+        return value
+
+    def lookup(self, key: str) -> Tuple[Optional[int], Optional[Any]]:
+        """
+        ``(versión, valor o None)`` para lecturas por lote: lo que falte se
+        carga aparte y se guarda con ``store`` y la versión leída acá.
+        """
+        version, value = self._lookup(key)
+        return version, None if value is _MISSING else value
+
+    def store(self, key: str, version: Optional[int], value: Optional[Any]) -> None:
+        self._store(key, version, value)
+
+    def invalidate(self, key: str) -> None:
+        self.local.delete(key)
+        if self.shared:
+            self.shared.bump(key)
+            self.shared.delete(key)
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self.local), "hits": self.hits, "misses": self.misses}
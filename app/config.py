@@ -5,6 +5,65 @@ class Settings:
     SUPABASE_SERVICE_ROLE: str = os.getenv("SUPABASE_SERVICE_ROLE", "")
     SUPABASE_BUCKET: str = os.getenv("SUPABASE_BUCKET", "traza-docs")
     ALLOW_ORIGINS: str = os.getenv("ALLOW_ORIGINS", "*")
+    # Routers de materials/batches con AsyncSession (aiosqlite/asyncpg) en vez de sync
+    DB_ASYNC: bool = os.getenv("DB_ASYNC", "false").lower() == "true"
     SUPABASE_ENABLED: bool = os.getenv("SUPABASE_ENABLED", "true").lower() == "true"
+    # Hilos para llamadas a Supabase (<= keep-alive por defecto de httpx: 20)
+    SUPABASE_MAX_WORKERS: int = int(os.getenv("SUPABASE_MAX_WORKERS", "16"))
+    # Uploads: tamaño de bloque (bytes) al leer/hashear y carpeta de spool
+    UPLOAD_CHUNK_SIZE: int = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+    UPLOAD_SPOOL_DIR: str = os.getenv("UPLOAD_SPOOL_DIR", "")
+    # Reutilizar objetos de Storage con mismo SHA-256 y tamaño
+    DEDUP_UPLOADS: bool = os.getenv("DEDUP_UPLOADS", "true").lower() == "true"
+    # Objetos de Storage que quedaron sin versión: se anotan en storage_orphans
+    # y un barrido los borra pasado el margen si siguen sin referencias
+    STORAGE_ORPHAN_GRACE: float = float(os.getenv("STORAGE_ORPHAN_GRACE", "3600"))
+    STORAGE_ORPHAN_SWEEP_INTERVAL: float = float(os.getenv("STORAGE_ORPHAN_SWEEP_INTERVAL", "600"))
+    # Archivos del router SQL de documentos (el que se monta sin Supabase):
+    # backend y carpeta raíz del almacenamiento en disco
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "local")
+    STORAGE_LOCAL_DIR: str = os.getenv("STORAGE_LOCAL_DIR", "./storage")
+    # Uploads reanudables: tamaño máximo, vida de una sesión sin actividad
+    # (después el GC borra sesión y bytes) y cada cuánto corre el GC
+    RESUMABLE_MAX_BYTES: int = int(os.getenv("RESUMABLE_MAX_BYTES", str(4 * 1024 ** 3)))
+    RESUMABLE_TTL: float = float(os.getenv("RESUMABLE_TTL", str(24 * 3600)))
+    RESUMABLE_GC_INTERVAL: float = float(os.getenv("RESUMABLE_GC_INTERVAL", "300"))
+
+    # Conteos exactos de /documents cacheados por combinación de filtros
+    DOCUMENT_COUNT_TTL: float = float(os.getenv("DOCUMENT_COUNT_TTL", "30"))
+    # Caché compartida opcional entre workers (p. ej. redis://localhost:6379/0)
+    CACHE_URL: str = os.getenv("CACHE_URL", "")
+    # URLs firmadas: se reutilizan durante esta fracción de expire_seconds
+    SIGNED_URL_CACHE_SIZE: int = int(os.getenv("SIGNED_URL_CACHE_SIZE", "4096"))
+    SIGNED_URL_CACHE_FRACTION: float = float(os.getenv("SIGNED_URL_CACHE_FRACTION", "0.5"))
+    # Ruta de la última versión por documento (se invalida en add_version)
+    VERSION_PATH_CACHE_TTL: float = float(os.getenv("VERSION_PATH_CACHE_TTL", "300"))
+    # Caché read-through de material/batch/documento por id
+    ENTITY_CACHE_SIZE: int = int(os.getenv("ENTITY_CACHE_SIZE", "10000"))
+    ENTITY_CACHE_TTL: float = float(os.getenv("ENTITY_CACHE_TTL", "60"))
+    # Configuración de text search de Postgres para la búsqueda de documentos
+    SEARCH_TS_CONFIG: str = os.getenv("SEARCH_TS_CONFIG", "spanish")
+    # Claves de Document.extra filtrables con ?extra.<clave>=... (separadas por coma)
+    PROMOTED_EXTRA_KEYS: str = os.getenv("PROMOTED_EXTRA_KEYS", "linea,turno,maquina")
+
+    # Pool de conexiones SQLAlchemy (size/overflow/timeout solo aplican a QueuePool)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # segundos, -1 = nunca
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    # Perfil SQLite aplicado al abrir cada conexión (SQLITE_PRAGMAS=false lo desactiva)
+    SQLITE_PRAGMAS: bool = os.getenv("SQLITE_PRAGMAS", "true").lower() == "true"
+    SQLITE_JOURNAL_MODE: str = os.getenv("SQLITE_JOURNAL_MODE", "wal")
+    SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "normal")
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    SQLITE_CACHE_SIZE: int = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))  # negativo = KiB
+    SQLITE_BUSY_TIMEOUT: int = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))  # ms
+
+    # Correr create_all/índices/migraciones aunque la huella del esquema coincida
+    SCHEMA_FORCE_SYNC: bool = os.getenv("SCHEMA_FORCE_SYNC", "false").lower() == "true"
+
+    # Middleware de latencias, hooks de SQLAlchemy y timers de Supabase (GET /metrics)
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
 
 settings = Settings()
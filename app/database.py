@@ -1,14 +1,99 @@
 import os
-from sqlalchemy import create_engine
+from typing import Any, Dict
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from app import metrics
+from app.config import settings
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
 
-connect_args = {}
-if DATABASE_URL.startswith("sqlite"):
-    connect_args["check_same_thread"] = False
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
+# --------------------
+# Pool y perfil SQLite
+# --------------------
+def pool_options(url: str) -> Dict[str, Any]:
+    """
+    Parámetros de pool según ``settings``. Tamaño, overflow y timeout solo
+    se pasan si el dialecto usa un QueuePool (SQLite en memoria y aiosqlite
+    con archivo usan pools que no los aceptan).
+    """
+    u = make_url(url)
+    opts: Dict[str, Any] = {
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+    if issubclass(u.get_dialect().get_pool_class(u), QueuePool):
+        opts.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+        )
+    return opts
+
+
+def sqlite_pragmas() -> Dict[str, Any]:
+    """Perfil de SQLite: WAL, fsync solo en checkpoints, mmap y caché de páginas."""
+    if not settings.SQLITE_PRAGMAS:
+        return {}
+    return {
+        "journal_mode": settings.SQLITE_JOURNAL_MODE,
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        "mmap_size": settings.SQLITE_MMAP_SIZE,
+        "cache_size": settings.SQLITE_CACHE_SIZE,
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT,
+        "temp_store": "memory",
+    }
+
+
+def _apply_sqlite_pragmas(engine: Engine) -> None:
+    pragmas = sqlite_pragmas()
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def make_engine(url: str) -> Engine:
+    connect_args = {}
+    if url.startswith("sqlite"):
+        connect_args["check_same_thread"] = False
+    eng = create_engine(url, connect_args=connect_args, **pool_options(url))
+    if eng.dialect.name == "sqlite":
+        _apply_sqlite_pragmas(eng)
+    metrics.instrument_engine(eng)
+    return eng
+
+
+def describe_engine(eng: Engine) -> Dict[str, Any]:
+    """Configuración efectiva del pool y, en SQLite, de los pragmas (para el log de arranque)."""
+    pool = eng.pool
+    info: Dict[str, Any] = {
+        "dialect": eng.dialect.name,
+        "pool": type(pool).__name__,
+        "pre_ping": pool._pre_ping,
+        "recycle": pool._recycle,
+    }
+    if isinstance(pool, QueuePool):
+        info.update(size=pool.size(), max_overflow=pool._max_overflow, timeout=pool.timeout())
+    if eng.dialect.name == "sqlite":
+        with eng.connect() as conn:
+            for name in ("journal_mode", "synchronous", "mmap_size", "cache_size", "busy_timeout"):
+                info[name] = conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+    return info
+
+
+engine = make_engine(DATABASE_URL)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
 Base = declarative_base()
@@ -19,3 +104,53 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# --------------------
+# Async (DB_ASYNC=true): aiosqlite en dev, asyncpg en Postgres
+# --------------------
+def async_url(url: str) -> str:
+    """Misma base que ``url`` con el driver async correspondiente."""
+    scheme, sep, rest = url.partition("://")
+    driver = {
+        "sqlite": "sqlite+aiosqlite",
+        "postgres": "postgresql+asyncpg",
+        "postgresql": "postgresql+asyncpg",
+        "postgresql+psycopg2": "postgresql+asyncpg",
+    }.get(scheme, scheme)
+    return f"{driver}{sep}{rest}"
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_url(DATABASE_URL)
+
+_async_engine = None
+_async_sessionmaker = None
+
+
+def get_async_engine():
+    """Engine async creado a demanda: el driver solo hace falta con DB_ASYNC."""
+    global _async_engine, _async_sessionmaker
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        _async_engine = create_async_engine(ASYNC_DATABASE_URL, **pool_options(ASYNC_DATABASE_URL))
+        if _async_engine.dialect.name == "sqlite":
+            _apply_sqlite_pragmas(_async_engine.sync_engine)
+        metrics.instrument_engine(_async_engine.sync_engine)
+        _async_sessionmaker = async_sessionmaker(
+            bind=_async_engine, autoflush=False, expire_on_commit=False
+        )
+    return _async_engine
+
+
+async def get_async_db():
+    get_async_engine()
+    async with _async_sessionmaker() as db:
+        yield db
+
+
+async def dispose_async_engine() -> None:
+    global _async_engine, _async_sessionmaker
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = _async_sessionmaker = None
@@ -0,0 +1,24 @@
+# app/entity_cache.py
+"""
+Cachés read-through por id para los endpoints de lectura puntual
+(``get_material``, ``get_batch``, ``get_document``). Los endpoints que
+modifican estas entidades deben llamar a ``invalidate`` luego del commit.
+"""
+from __future__ import annotations
+
+from typing import Dict
+
+from app.cache import EntityCache
+from app.config import settings
+
+materials = EntityCache("materials", settings.ENTITY_CACHE_SIZE, settings.ENTITY_CACHE_TTL)
+batches = EntityCache("batches", settings.ENTITY_CACHE_SIZE, settings.ENTITY_CACHE_TTL)
+documents = EntityCache("documents", settings.ENTITY_CACHE_SIZE, settings.ENTITY_CACHE_TTL)
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    return {
+        "materials": materials.stats(),
+        "batches": batches.stats(),
+        "documents": documents.stats(),
+    }
@@ -0,0 +1,263 @@
+# app/extra_index.py
+"""
+Claves "promovidas" de ``Document.extra`` (PROMOTED_EXTRA_KEYS).
+
+Cada clave promovida se copia a ``document_extra_values`` como texto y,
+si es numérica, como número, indexada por (clave, valor). Triggers de la
+base sobre ``documents`` la mantienen en cada INSERT/UPDATE/DELETE; las
+claves vigentes viven en ``document_extra_keys`` y cambiar la lista
+reconstruye los valores en el próximo ``install``.
+
+Filtros en el listado: ``?extra.linea=3``, ``?extra.linea=gte.2&extra.linea=lt.5``,
+``?extra.turno=noche``. Con operando numérico se compara como número; si
+no, como texto (sirve para fechas ISO).
+
+Un texto es numérico si cumple ``NUMERIC_TEXT`` (``-3``, ``2.5``; no
+``1.2.3``, ``3.``, ``1_0`` ni ``1e3``), igual en el trigger de Postgres
+(la misma regex), en el de SQLite (la misma regla con GLOB) y al parsear
+los filtros: un valor indexado como número se filtra como número.
+"""
+from __future__ import annotations
+
+import operator
+import re
+from typing import Any, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import event, select
+from sqlalchemy.engine import Connection, Engine
+
+from app import models
+from app.config import settings
+from app.database import Base
+
+PREFIX = "extra."
+OPS = {
+    "eq": operator.eq,
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "lt": operator.lt,
+    "lte": operator.le,
+}
+
+_KEY = re.compile(r"^[A-Za-z0-9_]{1,64}$")
+NUMERIC_TEXT = r"^-?[0-9]+(\.[0-9]+)?$"
+_NUMERIC = re.compile(NUMERIC_TEXT)
+
+ExtraFilter = Tuple[str, str, str]
+
+
+def promoted_keys() -> List[str]:
+    keys = [k.strip() for k in settings.PROMOTED_EXTRA_KEYS.split(",") if k.strip()]
+    bad = [k for k in keys if not _KEY.match(k)]
+    if bad:
+        raise RuntimeError(f"PROMOTED_EXTRA_KEYS inválidas: {bad}")
+    return list(dict.fromkeys(keys))
+
+
+def number(value: str) -> Optional[float]:
+    return float(value) if _NUMERIC.match(value) else None
+
+
+def parse_filters(params: Iterable[Tuple[str, str]]) -> List[ExtraFilter]:
+    """``[("extra.linea", "gte.2")]`` -> ``[("linea", "gte", "2")]``; ignora el resto."""
+    keys = set(promoted_keys())
+    filters = []
+    for name, raw in params:
+        if not name.startswith(PREFIX):
+            continue
+        key = name[len(PREFIX):]
+        if key not in keys:
+            raise HTTPException(status_code=400, detail=f"La clave de extra '{key}' no está indexada")
+        op, sep, value = raw.partition(".")
+        if not sep or op not in OPS:
+            op, value = "eq", raw
+        filters.append((key, op, value))
+    return filters
+
+
+# --------------------
+# SQLite
+# --------------------
+def _sqlite_numeric(value: str) -> str:
+    """``NUMERIC_TEXT`` con GLOB: dígitos y a lo sumo un punto, sin punto en los extremos."""
+    unsigned = f"CASE WHEN substr({value}, 1, 1) = '-' THEN substr({value}, 2) ELSE {value} END"
+    return (
+        f"{unsigned} <> '' AND {unsigned} NOT GLOB '*[^0-9.]*' AND {unsigned} NOT GLOB '*.*.*' "
+        f"AND {unsigned} NOT GLOB '.*' AND {unsigned} NOT GLOB '*.'"
+    )
+
+
+def _sqlite_rows(row: str) -> str:
+    return (
+        f"SELECT {row}.id, j.key, "
+        "CASE j.type WHEN 'true' THEN 'true' WHEN 'false' THEN 'false' ELSE CAST(j.value AS TEXT) END, "
+        "CASE WHEN j.type IN ('integer', 'real') THEN j.value "
+        f"WHEN j.type = 'text' AND {_sqlite_numeric('j.value')} THEN CAST(j.value AS REAL) END "
+        f"FROM json_each(CASE WHEN json_valid({row}.extra) THEN {row}.extra END) AS j "
+        "WHERE j.type NOT IN ('object', 'array', 'null') "
+        "AND j.key IN (SELECT key FROM document_extra_keys)"
+    )
+
+
+_VALUES = "document_extra_values (document_id, key, value_text, value_num) "
+_INSERT = "INSERT OR IGNORE INTO " + _VALUES
+_SQLITE_DELETE = "DELETE FROM document_extra_values WHERE document_id = OLD.id;"
+
+SQLITE_TRIGGERS = {
+    "document_extra_ai": f"AFTER INSERT ON documents BEGIN {_INSERT}{_sqlite_rows('NEW')}; END",
+    "document_extra_au": (
+        "AFTER UPDATE OF id, extra ON documents "
+        f"BEGIN {_SQLITE_DELETE} {_INSERT}{_sqlite_rows('NEW')}; END"
+    ),
+    "document_extra_ad": f"AFTER DELETE ON documents BEGIN {_SQLITE_DELETE} END",
+}
+
+
+def _install_sqlite(conn: Connection) -> bool:
+    existing = dict(conn.exec_driver_sql("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'").all())
+    # se comparan los cuerpos: un trigger de una versión anterior se reemplaza
+    if all(existing.get(name) == f"CREATE TRIGGER {name} {body}" for name, body in SQLITE_TRIGGERS.items()):
+        return False
+    for name, body in SQLITE_TRIGGERS.items():
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+        conn.exec_driver_sql(f"CREATE TRIGGER {name} {body}")
+    return True
+
+
+# --------------------
+# Postgres
+# --------------------
+_PG_ROWS = """
+    SELECT {row}.id, j.key,
+        CASE jsonb_typeof(j.value) WHEN 'string' THEN j.value #>> '{{}}' ELSE j.value::text END,
+        CASE
+            WHEN jsonb_typeof(j.value) = 'number' THEN (j.value #>> '{{}}')::double precision
+            WHEN jsonb_typeof(j.value) = 'string' AND j.value #>> '{{}}' ~ '{numeric}'
+                THEN (j.value #>> '{{}}')::double precision
+        END
+    FROM jsonb_each(
+        CASE WHEN jsonb_typeof({row}.extra::jsonb) = 'object' THEN {row}.extra::jsonb ELSE '{{}}'::jsonb END
+    ) AS j
+    WHERE jsonb_typeof(j.value) NOT IN ('object', 'array', 'null')
+      AND j.key IN (SELECT key FROM document_extra_keys)
+"""
+
+POSTGRES_FUNCTION = f"""
+    CREATE OR REPLACE FUNCTION document_extra_sync() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP <> 'INSERT' THEN
+            DELETE FROM document_extra_values WHERE document_id = OLD.id;
+        END IF;
+        IF TG_OP <> 'DELETE' THEN
+            INSERT INTO {_VALUES}
+            {_PG_ROWS.format(row="NEW", numeric=NUMERIC_TEXT)}
+            ON CONFLICT DO NOTHING;
+        END IF;
+        RETURN NULL;
+    END
+    $$
+"""
+
+POSTGRES_TRIGGERS = {
+    "document_extra_ai": "AFTER INSERT ON documents FOR EACH ROW EXECUTE FUNCTION document_extra_sync()",
+    "document_extra_au": (
+        "AFTER UPDATE OF id, extra ON documents FOR EACH ROW "
+        "WHEN (OLD.id IS DISTINCT FROM NEW.id OR OLD.extra::jsonb IS DISTINCT FROM NEW.extra::jsonb) "
+        "EXECUTE FUNCTION document_extra_sync()"
+    ),
+    "document_extra_ad": "AFTER DELETE ON documents FOR EACH ROW EXECUTE FUNCTION document_extra_sync()",
+}
+
+
+def _install_postgres(conn: Connection) -> bool:
+    # si la función cambió (otra regla), los valores ya indexados se recalculan
+    current = conn.exec_driver_sql(
+        "SELECT prosrc FROM pg_proc WHERE proname = 'document_extra_sync'"
+    ).scalar()
+    changed = current != POSTGRES_FUNCTION.split("$$")[1]
+    conn.exec_driver_sql(POSTGRES_FUNCTION)
+    existing = {
+        name
+        for (name,) in conn.exec_driver_sql(
+            "SELECT tgname FROM pg_trigger WHERE NOT tgisinternal AND tgrelid = 'documents'::regclass"
+        )
+    }
+    if set(POSTGRES_TRIGGERS) <= existing:
+        return changed
+    for name, body in POSTGRES_TRIGGERS.items():
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name} ON documents")
+        conn.exec_driver_sql(f"CREATE TRIGGER {name} {body}")
+    # PostgREST necesita ver la relación nueva para los embeds de Supabase
+    conn.exec_driver_sql("NOTIFY pgrst, 'reload schema'")
+    return True
+
+
+def _rebuild(conn: Connection, keys: List[str]) -> None:
+    conn.exec_driver_sql("DELETE FROM document_extra_keys")
+    if keys:
+        conn.execute(models.DocumentExtraKey.__table__.insert(), [{"key": k} for k in keys])
+    conn.exec_driver_sql("DELETE FROM document_extra_values")
+    if conn.dialect.name == "sqlite":
+        insert, rows, marker = _INSERT, _sqlite_rows("d"), "FROM json_each"
+    else:
+        rows = _PG_ROWS.format(row="d", numeric=NUMERIC_TEXT)
+        insert, marker = "INSERT INTO " + _VALUES, "FROM jsonb_each"
+    conn.exec_driver_sql(insert + rows.replace(marker, "FROM documents AS d, " + marker[5:], 1))
+
+
+def install(bind: Any) -> None:
+    """
+    Crea (idempotente) los triggers y sincroniza ``document_extra_keys`` con
+    PROMOTED_EXTRA_KEYS; si faltaban triggers o cambiaron las claves,
+    reconstruye ``document_extra_values`` desde ``documents``.
+    """
+    if isinstance(bind, Engine):
+        with bind.begin() as conn:
+            install(conn)
+        return
+    if bind.dialect.name == "sqlite":
+        created = _install_sqlite(bind)
+    elif bind.dialect.name == "postgresql":
+        created = _install_postgres(bind)
+    else:
+        return
+    keys = promoted_keys()
+    current = [k for (k,) in bind.exec_driver_sql("SELECT key FROM document_extra_keys")]
+    if created or sorted(current) != sorted(keys):
+        _rebuild(bind, keys)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _on_metadata_created(target: Any, connection: Connection, **kw: Any) -> None:
+    install(connection)
+
+
+# --------------------
+# Consulta
+# --------------------
+def _operand(value: str) -> Tuple[str, Any]:
+    num = number(value)
+    return ("value_num", num) if num is not None else ("value_text", value)
+
+
+def filter_documents(query: Any, filters: List[ExtraFilter]) -> Any:
+    """Aplica los filtros ``extra.*`` a una query ORM sobre ``models.Document``."""
+    V = models.DocumentExtraValue
+    for key, op, value in filters:
+        col, operand = _operand(value)
+        ids = select(V.document_id).where(V.key == key, OPS[op](getattr(V, col), operand))
+        query = query.filter(models.Document.id.in_(ids))
+    return query
+
+
+def postgrest_embeds(filters: List[ExtraFilter]) -> str:
+    return "".join(f", e{i}:document_extra_values!inner(key)" for i in range(len(filters)))
+
+
+def postgrest_filter(query: Any, filters: List[ExtraFilter]) -> Any:
+    """Mismos filtros sobre un builder de Supabase con los embeds de ``postgrest_embeds``."""
+    for i, (key, op, value) in enumerate(filters):
+        col, operand = _operand(value)
+        query = getattr(query.eq(f"e{i}.key", key), op)(f"e{i}.{col}", operand)
+    return query
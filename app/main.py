@@ -1,15 +1,30 @@
 # app/main.py
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
+from fastapi import APIRouter, Depends, FastAPI, UploadFile, File, Form, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
-from datetime import date
-from typing import Optional, List, Dict, Any, TYPE_CHECKING
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional, List, Dict, Any, Literal, Tuple, TYPE_CHECKING
 from uuid import UUID
-import hashlib, json, re, uuid, os, logging
+import asyncio, json, uuid, os, logging
+
+from sqlalchemy.orm import Session
 
 from app.config import settings
+from app.database import dispose_async_engine, get_db
 from app import models  # registra modelos en Base.metadata
-from app.routers import materials, batches
+from app import entity_cache, extra_index, metrics, resumable, schema_state, schemas, search, supabase_io, versions
+from app import tags as tag_index
+from app.cache import EntityCache, TTLCache, make_cache
+from app.pagination import decode_cursor, encode_cursor
+from app.serialization import JSON, envelope_adapter
+from app.storage import Storage, get_storage
+from app.timing import ServerTiming
+from app.uploads import SpooledUpload, safe_filename, spool_upload
+from app.routers import materials, batches, documents
 
 if TYPE_CHECKING:
     from supabase import Client
@@ -26,18 +41,39 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if settings.METRICS_ENABLED:
+    # último en agregarse = más externo: mide también CORS y errores
+    app.add_middleware(metrics.MetricsMiddleware)
 
 # --------------------
-# Supabase client
+# Supabase client (se crea en el arranque: el SDK tarda en importarse)
 # --------------------
 sb: Optional["Client"] = None
 BUCKET = settings.SUPABASE_BUCKET or "traza-docs"
-if settings.SUPABASE_ENABLED:
-    from supabase import create_client
 
+
+def init_supabase() -> None:
+    global sb
+    if not settings.SUPABASE_ENABLED or sb is not None:
+        return
     if not settings.SUPABASE_URL or not settings.SUPABASE_SERVICE_ROLE:
         raise RuntimeError("Faltan SUPABASE_URL o SUPABASE_SERVICE_ROLE")
+    from supabase import create_client
+
     sb = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_ROLE)
+    supabase_io.warm_up(sb)
+
+
+# Conteos exactos por combinación de filtros (ver list_documents);
+# los endpoints que crean/borran documentos la invalidan.
+document_counts = TTLCache(maxsize=512, ttl=settings.DOCUMENT_COUNT_TTL)
+# Descargas: URLs firmadas por (expire_seconds, storage_path), storage_path
+# por (doc_id, versión) y de la última versión por doc_id. La última cambia
+# con cada add_version: va con contador de versión para que la invalidación
+# llegue a todos los workers.
+signed_urls = make_cache("signed_urls", maxsize=settings.SIGNED_URL_CACHE_SIZE)
+version_paths = make_cache("version_paths", maxsize=4096, ttl=settings.VERSION_PATH_CACHE_TTL)
+latest_paths = EntityCache("latest_paths", maxsize=4096, ttl=settings.VERSION_PATH_CACHE_TTL)
 
 
 def ensure_supabase() -> "Client":
@@ -51,49 +87,108 @@ def ensure_supabase() -> "Client":
 # --------------------
 
 
+def _sync_schema() -> bool:
+    """
+    Opcionalmente corre migraciones con Alembic y asegura que existan las
+    tablas (``create_all``) e índices. Devuelve False si algo falló.
+    """
+    from app.database import Base, engine
+
+    ok = True
+    if os.getenv("RUN_MIGRATIONS", "false").lower() == "true":
+        try:
+            from alembic import command
+            from alembic.config import Config
+
+            alembic_cfg = Config(
+                os.path.join(os.path.dirname(__file__), "..", "alembic.ini")
+            )
+            command.upgrade(alembic_cfg, "head")
+        except Exception as e:  # pragma: no cover - logueado
+            ok = False
+            logging.getLogger(__name__).warning(
+                "Alembic upgrade falló: %s", e
+            )
+    Base.metadata.create_all(bind=engine)
+    # índices de búsqueda y de tags, funciones de versiones (también para tablas preexistentes)
+    for index in (search, tag_index, extra_index, versions):
+        try:
+            index.install(engine)
+        except Exception as e:  # pragma: no cover - logueado
+            ok = False
+            logging.getLogger(__name__).warning("Índice %s no instalado: %s", index.__name__, e)
+    logging.getLogger(__name__).info("DB_FALLBACK_RAN")
+    return ok
+
+
 @app.on_event("startup")
 def startup_event() -> None:
     """
-    Opcionalmente corre migraciones con Alembic y siempre asegura
-    que existan las tablas necesarias mediante ``create_all``.
-    Nunca propaga excepciones.
+    Sincroniza el esquema solo si su huella cambió (ver ``app/schema_state``;
+    ``SCHEMA_FORCE_SYNC=true`` lo fuerza) e inicializa el cliente de Supabase.
+    Loguea cuánto tomó cada parte. Los errores de DB nunca se propagan.
     """
+    from app.database import describe_engine, engine
+
+    log = logging.getLogger(__name__)
+    report: Dict[str, Any] = {"imports_ms": round(IMPORT_SECONDS * 1000, 1)}
     try:
-        if os.getenv("RUN_MIGRATIONS", "false").lower() == "true":
-            try:
-                from alembic import command
-                from alembic.config import Config
-
-                alembic_cfg = Config(
-                    os.path.join(os.path.dirname(__file__), "..", "alembic.ini")
-                )
-                command.upgrade(alembic_cfg, "head")
-            except Exception as e:  # pragma: no cover - logueado
-                logging.getLogger(__name__).warning(
-                    "Alembic upgrade falló: %s", e
-                )
-    finally:
-        from app.database import Base, engine
-        from app import models  # noqa: F401 - asegure que modelos estén registrados
+        result = schema_state.ensure(engine, _sync_schema, force=settings.SCHEMA_FORCE_SYNC)
+        report.update(
+            schema_check_ms=round(result["check_s"] * 1000, 1),
+            schema_ddl_ms=round(result["ddl_s"] * 1000, 1),
+            schema_applied=result["applied"],
+            fingerprint=result["fingerprint"],
+        )
+    except Exception as e:  # pragma: no cover - logueado
+        log.warning("Sincronización de esquema falló: %s", e)
+    try:
+        log.info("DB engine: %s", describe_engine(engine))
+    except Exception as e:  # pragma: no cover - logueado
+        log.warning("No se pudo leer la config del engine: %s", e)
 
-        Base.metadata.create_all(bind=engine)
-        logging.getLogger(__name__).info("DB_FALLBACK_RAN")
+    start = time.perf_counter()
+    init_supabase()
+    report["client_init_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    app.state.startup_report = report
+    log.info("Startup: %s", report)
 
 
-app.include_router(materials.router, prefix="/materials", tags=["materials"])
-app.include_router(batches.router, prefix="/batches", tags=["batches"])
+@app.on_event("startup")
+async def start_upload_gc() -> None:
+    """Los uploads reanudables se montan con y sin Supabase: su GC corre en segundo plano."""
+    app.state.upload_gc = asyncio.create_task(resumable.collect_forever())
 
-# --------------------
-# Utils
-# --------------------
-SAFE_CHARS = re.compile(r"[^a-zA-Z0-9._-]+")
 
-def safe_filename(name: str) -> str:
-    name = (name or "").strip().replace(" ", "_")
-    return SAFE_CHARS.sub("_", name) or "archivo"
+@app.on_event("startup")
+async def start_orphan_sweep() -> None:
+    """Con Supabase, los objetos de Storage que quedaron sin versión se borran en segundo plano."""
+    if settings.SUPABASE_ENABLED:
+        app.state.orphan_sweep = asyncio.create_task(sweep_orphans_forever())
+
+
+@app.on_event("shutdown")
+async def shutdown_event() -> None:
+    for name in ("upload_gc", "orphan_sweep"):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+    supabase_io.shutdown()
+    await dispose_async_engine()
+
 
-def sha256_bytes(b: bytes) -> str:
-    return hashlib.sha256(b).hexdigest()
+if settings.DB_ASYNC:
+    # mismas rutas con AsyncSession (aiosqlite/asyncpg) para comparar throughput
+    from app.routers import batches_async as batch_routes, materials_async as material_routes
+else:
+    material_routes, batch_routes = materials, batches
+
+app.include_router(material_routes.router, prefix="/materials", tags=["materials"])
+app.include_router(batch_routes.router, prefix="/batches", tags=["batches"])
+
+# Endpoints de documentos sobre Supabase; sin Supabase se monta en su lugar
+# el router SQL con el storage de app/storage.py (ver el final del módulo)
+supabase_documents = APIRouter()
 
 # --------------------
 # Schemas
@@ -111,9 +206,32 @@ class DocumentOut(DocumentIn):
     status: str = "vigente"
     current_version: int = 1
 
+class DownloadRef(BaseModel):
+    doc_id: UUID
+    version: Optional[int] = None
+
+class DownloadUrlsIn(BaseModel):
+    items: List[DownloadRef] = Field(..., min_length=1, max_length=500)
+    expire_seconds: int = 3600
+
+class DownloadUrlOut(DownloadRef):
+    url: Optional[str] = None
+    expires_in: Optional[int] = None
+    error: Optional[str] = None
+
+class DownloadUrlsOut(BaseModel):
+    items: List[DownloadUrlOut]
+
 class DocumentListOut(BaseModel):
     items: List[DocumentOut]
-    total: int
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+
+# Listado: solo las columnas de DocumentOut (+ created_at para el cursor),
+# codificadas sin validar fila por fila contra DocumentOut
+DOCUMENT_LIST_COLUMNS = ",".join([*DocumentOut.model_fields, "created_at"])
+DOCUMENT_LIST_JSON = envelope_adapter(DocumentListOut)
 
 # --------------------
 # Endpoints
@@ -122,8 +240,220 @@ class DocumentListOut(BaseModel):
 def health():
     return {"ok": True}
 
-@app.post("/documents", response_model=DocumentOut)
+@app.get("/cache/stats")
+def cache_stats():
+    """Aciertos/fallos de las cachés en memoria de este worker."""
+    return {
+        "entities": entity_cache.stats(),
+        "document_counts": document_counts.stats(),
+        "signed_urls": signed_urls.stats(),
+        "version_paths": version_paths.stats(),
+        "latest_paths": latest_paths.stats(),
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint():
+    """Métricas de este worker en formato de texto de Prometheus."""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+def _upload_error(res: Any) -> Optional[str]:
+    """Normaliza el resultado de un upload: devuelve el error o None."""
+    # Algunos SDK devuelven dict con 'error'
+    if isinstance(res, dict) and res.get("error"):
+        return str(res["error"])
+    return None
+
+
+async def _upload_spool(spool: SpooledUpload, storage_path: str) -> Any:
+    """Sube el archivo spooleado a Storage en streaming (fuera del event loop)."""
+    with spool.open() as fh:
+        return await supabase_io.run(
+            sb.storage.from_(BUCKET).upload,
+            path=storage_path,
+            file=fh,
+            file_options={"content-type": spool.mime_type, "x-upsert": "false"},
+        )
+
+
+async def _try_upload(spool: SpooledUpload, storage_path: str) -> Optional[str]:
+    """Sube el archivo y devuelve el error (o None) en vez de propagarlo."""
+    try:
+        return _upload_error(await _upload_spool(spool, storage_path))
+    except Exception as e:
+        return str(e)
+
+
+async def _find_stored_copy(spool: SpooledUpload) -> Optional[str]:
+    """Ruta de un objeto ya subido con el mismo SHA-256 y tamaño, si existe."""
+    res = await supabase_io.execute(
+        sb.table("document_versions")
+        .select("storage_path")
+        .eq("checksum", spool.checksum)
+        .eq("size_bytes", spool.size_bytes)
+        .limit(1)
+    )
+    rows = getattr(res, "data", []) or []
+    return rows[0]["storage_path"] if rows else None
+
+
+async def _store_spool(spool: SpooledUpload, storage_path: str) -> Tuple[str, Optional[str], bool]:
+    """
+    Guarda el archivo y devuelve ``(ruta, error, subido)``. Con DEDUP_UPLOADS,
+    si ya hay un objeto idéntico se reutiliza su ruta en vez de subirlo de nuevo.
+    """
+    try:
+        if settings.DEDUP_UPLOADS:
+            existing = await _find_stored_copy(spool)
+            if existing:
+                return existing, None, False
+    except Exception as e:
+        return storage_path, str(e), False
+    error = await _try_upload(spool, storage_path)
+    return storage_path, error, error is None
+
+
+def _utcnow() -> datetime:
+    # storage_orphans.marked_at es DateTime sin zona: UTC naive
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+async def _release_storage_object(storage_path: str) -> None:
+    """
+    Anota el objeto en ``storage_orphans`` en vez de borrarlo. Contar
+    referencias y borrar en el momento deja una ventana en la que un alta
+    con dedup (o una RPC que respondió con error pero se confirmó) publica
+    una versión sobre la ruta; ``sweep_storage_orphans`` lo borra recién
+    pasado ``STORAGE_ORPHAN_GRACE`` y si sigue sin versiones.
+    """
+    await supabase_io.execute(
+        sb.table("storage_orphans").upsert({"storage_path": storage_path, "marked_at": _utcnow().isoformat()})
+    )
+
+
+async def sweep_storage_orphans(limit: int = 500) -> int:
+    """
+    Borra de Storage hasta ``limit`` huérfanos marcados hace más de
+    ``STORAGE_ORPHAN_GRACE`` que ninguna versión referencia. Devuelve cuántos.
+    """
+    cutoff = (_utcnow() - timedelta(seconds=settings.STORAGE_ORPHAN_GRACE)).isoformat()
+    res = await supabase_io.execute(
+        sb.table("storage_orphans").select("storage_path").lt("marked_at", cutoff).limit(limit)
+    )
+    paths = [row["storage_path"] for row in getattr(res, "data", []) or []]
+    if not paths:
+        return 0
+    # con dedup, varias versiones (incluso de distintos documentos) comparten archivo
+    refs = await supabase_io.execute(
+        sb.table("document_versions").select("storage_path").in_("storage_path", paths)
+    )
+    used = {row["storage_path"] for row in getattr(refs, "data", []) or []}
+    unused = [p for p in paths if p not in used]
+    if unused:
+        await supabase_io.run(sb.storage.from_(BUCKET).remove, unused)
+    # solo las marcas viejas: una ruta marcada de nuevo mientras tanto espera otro margen
+    await supabase_io.execute(
+        sb.table("storage_orphans").delete().in_("storage_path", paths).lt("marked_at", cutoff)
+    )
+    return len(unused)
+
+
+async def sweep_orphans_forever() -> None:
+    """Corre ``sweep_storage_orphans`` cada ``STORAGE_ORPHAN_SWEEP_INTERVAL`` (se lanza al arrancar)."""
+    log = logging.getLogger(__name__)
+    while True:
+        await asyncio.sleep(settings.STORAGE_ORPHAN_SWEEP_INTERVAL)
+        try:
+            swept = await sweep_storage_orphans()
+            if swept:
+                log.info("Objetos huérfanos borrados de Storage: %s", swept)
+        except Exception as e:  # pragma: no cover - logueado
+            log.warning("Barrido de objetos huérfanos falló: %s", e)
+
+
+def _parse_document_fields(tags: Optional[str], extra: Optional[str]) -> Tuple[List[str], Dict[str, Any]]:
+    tags_list = [t.strip() for t in tags.split(",")] if tags else []
+    try:
+        extra_dict = json.loads(extra) if extra else {}
+        if not isinstance(extra_dict, dict):
+            raise ValueError("extra debe ser un objeto JSON")
+    except Exception as je:
+        raise HTTPException(status_code=422, detail=f"Campo 'extra' debe ser JSON válido: {je}")
+    return tags_list, extra_dict
+
+
+async def _publish_document(
+    spool: SpooledUpload,
+    filename: str,
+    fields: Dict[str, Any],
+    note: Optional[str],
+    timing: ServerTiming,
+    log_fields: Dict[str, Any],
+) -> Dict[str, Any]:
+    """
+    Sube ``spool`` e inserta el documento (en paralelo) y después su v1.
+    Devuelve la fila del documento; si algo falla compensa lo que sí se hizo.
+    """
+    # IDs y ruta de almacenamiento
+    doc_id = str(uuid.uuid4())
+    version = 1
+    log_fields["doc_id"] = doc_id
+    log_fields["size_bytes"] = spool.size_bytes
+    storage_path = f"{doc_id}/v{version}/{filename}"
+
+    doc_payload = {
+        "id": doc_id,
+        **fields,
+        "status": "vigente",
+        "current_version": version,
+        "created_by": None,  # opcional: enlazar con auth.uid()
+    }
+
+    # Upload e insert en documents son independientes: van en paralelo
+    (storage_path, upload_error, uploaded), ins_doc = await asyncio.gather(
+        timing.measure("upload", _store_spool(spool, storage_path)),
+        timing.measure("documents", supabase_io.execute(sb.table("documents").insert(doc_payload))),
+        return_exceptions=True,
+    )
+
+    doc_ok = not isinstance(ins_doc, BaseException) and getattr(ins_doc, "data", None)
+    if upload_error or not doc_ok:
+        # compensar lo que sí se hizo antes de fallar
+        if doc_ok:
+            await supabase_io.execute(sb.table("documents").delete().eq("id", doc_id))
+            document_counts.clear()
+        if uploaded:
+            await _release_storage_object(storage_path)
+        if upload_error:
+            raise HTTPException(status_code=500, detail=f"Error subiendo a Storage: {upload_error}")
+        if isinstance(ins_doc, BaseException):
+            raise ins_doc
+        raise HTTPException(status_code=500, detail="DB no devolvió datos al insertar documento")
+
+    # Insertar en document_versions
+    ver_payload = {
+        "document_id": doc_id,
+        "version": version,
+        "storage_path": storage_path,
+        "checksum": spool.checksum,
+        "size_bytes": spool.size_bytes,
+        "mime_type": spool.mime_type,
+        "note": note,
+        "created_by": None,
+    }
+    document_counts.clear()
+    ins_ver = await timing.measure(
+        "versions", supabase_io.execute(sb.table("document_versions").insert(ver_payload))
+    )
+    if not getattr(ins_ver, "data", None):
+        raise HTTPException(status_code=500, detail="DB no devolvió datos al insertar versión")
+    return doc_payload
+
+
+@supabase_documents.post("/documents", response_model=DocumentOut)
 async def create_document(
+    response: Response,
     title: str = Form(...),
     category_id: Optional[int] = Form(None),
     date_ref: Optional[date] = Form(None),
@@ -134,197 +464,601 @@ async def create_document(
 ):
     """
     Crea un documento (v1) + sube archivo a Supabase Storage (privado).
+    Los tiempos por etapa vuelven en el header ``Server-Timing``.
     """
     ensure_supabase()
+    timing = ServerTiming()
+    log_fields: Dict[str, Any] = {}
     try:
-        # Parse de campos
-        tags_list = [t.strip() for t in tags.split(",")] if tags else []
-        try:
-            extra_dict = json.loads(extra) if extra else {}
-            if not isinstance(extra_dict, dict):
-                raise ValueError("extra debe ser un objeto JSON")
-        except Exception as je:
-            raise HTTPException(status_code=422, detail=f"Campo 'extra' debe ser JSON válido: {je}")
-
-        # IDs y ruta de almacenamiento
-        doc_id = str(uuid.uuid4())
-        version = 1
-        filename = safe_filename(file.filename or "archivo")
-        storage_path = f"{doc_id}/v{version}/{filename}"
-
-        # Subir a Storage
-        content = await file.read()
-        if not content:
-            raise HTTPException(status_code=400, detail="Archivo vacío")
-        checksum = sha256_bytes(content)
-        mime_type = file.content_type or "application/octet-stream"
-
-        up_res = sb.storage.from_(BUCKET).upload(
-            path=storage_path,
-            file=content,
-            file_options={"content-type": mime_type, "x-upsert": "false"},
-        )
-        # Algunos SDK devuelven dict con 'error'
-        if isinstance(up_res, dict) and up_res.get("error"):
-            raise HTTPException(status_code=500, detail=f"Error subiendo a Storage: {up_res['error']}")
-
-        # Insertar en documents
-        doc_payload = {
-            "id": doc_id,
+        tags_list, extra_dict = _parse_document_fields(tags, extra)
+        fields = {
             "title": title,
             "category_id": category_id,
-            "status": "vigente",
-            "current_version": version,
             "date_ref": str(date_ref) if date_ref else None,
             "tags": tags_list,
             "extra": extra_dict,
-            "created_by": None,  # opcional: enlazar con auth.uid()
-        }
-        ins_doc = sb.table("documents").insert(doc_payload).execute()
-        if not getattr(ins_doc, "data", None):
-            # rollback del archivo si la DB no insertó
-            sb.storage.from_(BUCKET).remove([storage_path])
-            raise HTTPException(status_code=500, detail="DB no devolvió datos al insertar documento")
-
-        # Insertar en document_versions
-        ver_payload = {
-            "document_id": doc_id,
-            "version": version,
-            "storage_path": storage_path,
-            "checksum": checksum,
-            "size_bytes": len(content),
-            "mime_type": mime_type,
-            "note": note,
-            "created_by": None,
         }
-        ins_ver = sb.table("document_versions").insert(ver_payload).execute()
-        if not getattr(ins_ver, "data", None):
-            raise HTTPException(status_code=500, detail="DB no devolvió datos al insertar versión")
+
+        # Subir a Storage (lectura por bloques: memoria acotada por UPLOAD_CHUNK_SIZE)
+        with await spool_upload(file) as spool:
+            for stage, seconds in spool.timings.items():
+                timing.add(stage, seconds)
+            if not spool.size_bytes:
+                raise HTTPException(status_code=400, detail="Archivo vacío")
+            filename = safe_filename(file.filename or "archivo")
+            doc_payload = await _publish_document(spool, filename, fields, note, timing, log_fields)
 
         # Respuesta
+        response.headers["Server-Timing"] = timing.header()
         return {**doc_payload, "date_ref": date_ref}
 
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Fallo creando documento: {e}")
+    finally:
+        timing.log("create_document", **log_fields)
 
-@app.get("/documents", response_model=DocumentListOut)
-def list_documents(
-    q: Optional[str] = Query(None, description="Búsqueda por título (ilike)"),
-    category_id: Optional[int] = Query(None),
-    date_from: Optional[date] = Query(None),
-    date_to: Optional[date] = Query(None),
-    limit: int = Query(50, ge=1, le=200),
-    offset: int = Query(0, ge=0),
-):
-    ensure_supabase()
+def _documents_source(filters: tuple, columns: str, count: Optional[str] = None) -> Any:
     """
-    Lista documentos con filtros simples.
+    ``documents`` o, si hay ``search``, la función ``search_documents``
+    (índice GIN, resultados por relevancia) vía RPC.
     """
-    query = sb.table("documents").select("*", count="exact").order("created_at", desc=True)
+    tag_list, tag_match = filters[4], filters[5]
+    # filtro por tags: join interno con document_tags, uno por tag si son "todos"
+    embeds = len(tag_list) if tag_match == "all" else min(len(tag_list), 1)
+    columns += "".join(f", t{i}:document_tags!inner(tag)" for i in range(embeds))
+    columns += extra_index.postgrest_embeds(filters[6])
+    tsq = search.tsquery(filters[-1])
+    if tsq:
+        query = sb.postgrest.rpc("search_documents", {"query": tsq}).select(columns)
+        if count:
+            # el select() del builder de RPC pisa el Prefer (y con él el count)
+            query.headers["Prefer"] = f"return=representation,count={count}"
+        return query
+    return sb.table("documents").select(columns, count=count)
 
+
+def _filter_documents(query: Any, filters: tuple) -> Any:
+    q, category_id, date_from, date_to, tag_list, tag_match, extra_filters, _search = filters
     if q:
         query = query.ilike("title", f"%{q}%")
+    if tag_list and tag_match == "all":
+        for i, tag in enumerate(tag_list):
+            query = query.eq(f"t{i}.tag", tag)
+    elif tag_list:
+        query = query.in_("t0.tag", list(tag_list))
+    query = extra_index.postgrest_filter(query, extra_filters)
     if category_id is not None:
         query = query.eq("category_id", category_id)
     if date_from:
         query = query.gte("date_ref", str(date_from))
     if date_to:
         query = query.lte("date_ref", str(date_to))
+    return query
 
-    res = query.range(offset, offset + limit - 1).execute()
-    rows = getattr(res, "data", []) or []
+
+async def _count_documents(mode: str, filters: tuple) -> Optional[int]:
+    """
+    Total de documentos para los filtros dados, según ``mode``:
+    ``exact`` (cacheado DOCUMENT_COUNT_TTL segundos por filtros),
+    ``estimated`` (estadísticas del planner de Postgres) o ``none``.
+    """
+    if mode == "none":
+        return None
+    if mode == "exact":
+        cached = document_counts.get(filters)
+        if cached is not None:
+            return cached
+    method = "exact" if mode == "exact" else "planned"
+    query = _filter_documents(_documents_source(filters, "id", count=method), filters)
+    res = await supabase_io.execute(query.limit(1))
     total = getattr(res, "count", None)
-    if total is None:
-        total = len(rows)
-    return {"items": rows, "total": total}
+    if mode == "exact" and total is not None:
+        document_counts.set(filters, total)
+    return total
+
 
-@app.get("/documents/{doc_id}", response_model=DocumentOut)
-def get_document(doc_id: str):
+@supabase_documents.get("/documents", response_model=DocumentListOut)
+async def list_documents(
+    request: Request,
+    q: Optional[str] = Query(None, description="Búsqueda por título (ilike)"),
+    search_text: Optional[str] = Query(
+        None, alias="search", description="Texto completo en título, tags, nota y extra (ordena por relevancia)"
+    ),
+    category_id: Optional[int] = Query(None),
+    tags: Optional[str] = Query(None, description="Tags separados por coma, ej: 'poes,qa'"),
+    tag_match: Literal["any", "all"] = Query("any", description="Alguno o todos los tags"),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    after: Optional[str] = Query(None, description="Cursor de next_cursor (reemplaza a offset)"),
+    count: Literal["exact", "estimated", "none"] = Query(
+        "exact", description="Cómo calcular total: exacto (cacheado), estimado o sin total"
+    ),
+):
     ensure_supabase()
-    res = sb.table("documents").select("*").eq("id", doc_id).single().execute()
+    """
+    Lista documentos con filtros simples y ``extra.<clave>=[op.]valor``
+    sobre las claves promovidas (op: eq, gt, gte, lt, lte).
+    Paginado por keyset sobre (created_at, id) cuando se pasa ``after``;
+    con ``search`` el orden es por relevancia y se pagina con ``offset``.
+    """
+    filters = (
+        q, category_id, date_from, date_to,
+        tuple(tag_index.parse(tags)), tag_match,
+        tuple(extra_index.parse_filters(request.query_params.multi_items())),
+        search_text,
+    )
+    ranked = search.tsquery(search_text) is not None
+    if ranked and after:
+        raise HTTPException(status_code=400, detail="'after' no se combina con 'search': usá offset")
+    query = _filter_documents(_documents_source(filters, DOCUMENT_LIST_COLUMNS), filters)
+    if not ranked:
+        query = query.order("created_at", desc=True).order("id", desc=True)
+
+    if after:
+        # se parsean antes de armar el filtro: el cursor viene del cliente
+        raw_created, raw_id = decode_cursor(after, 2)
+        try:
+            created_at, last_id = datetime.fromisoformat(raw_created).isoformat(), UUID(raw_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+        query = query.or_(
+            f'created_at.lt."{created_at}",'
+            f'and(created_at.eq."{created_at}",id.lt."{last_id}")'
+        )
+        offset = 0
+
+    # Página y total van en paralelo; se pide una fila extra para saber
+    # si hay página siguiente
+    res, total = await asyncio.gather(
+        supabase_io.execute(query.range(offset, offset + limit)),
+        _count_documents(count, filters),
+    )
+    rows = getattr(res, "data", []) or []
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        if not ranked:
+            next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    body = DOCUMENT_LIST_JSON.dump_json(
+        {"items": rows, "total": total, "next_cursor": next_cursor}, warnings=False
+    )
+    return Response(body, media_type=JSON)
+
+@supabase_documents.get("/documents/tags", response_model=List[schemas.TagCount])
+async def document_tag_facets(
+    prefix: Optional[str] = Query(None, description="Solo tags que empiezan con este texto"),
+    limit: int = Query(50, ge=1, le=500),
+):
+    """Tags con su cantidad de documentos, leídos de ``document_tag_counts``."""
+    ensure_supabase()
+    query = sb.table("document_tag_counts").select("tag, documents").gt("documents", 0)
+    if prefix:
+        query = query.like("tag", f"{tag_index.normalize(prefix)}*")
+    res = await supabase_io.execute(query.order("documents", desc=True).order("tag").limit(limit))
+    return getattr(res, "data", []) or []
+
+@supabase_documents.get("/documents/{doc_id}", response_model=DocumentOut)
+async def get_document(doc_id: str):
+    ensure_supabase()
+    res = await supabase_io.execute(sb.table("documents").select("*").eq("id", doc_id).single())
     data = getattr(res, "data", None)
     if not data:
         raise HTTPException(status_code=404, detail="Documento no encontrado")
     return data
 
-@app.get("/documents/{doc_id}/versions")
-def list_versions(doc_id: str):
+@supabase_documents.get("/documents/{doc_id}/versions")
+async def list_versions(doc_id: str):
     ensure_supabase()
-    res = sb.table("document_versions").select("*").eq("document_id", doc_id).order("version", desc=True).execute()
+    res = await supabase_io.execute(
+        sb.table("document_versions").select("*").eq("document_id", doc_id).order("version", desc=True)
+    )
     return getattr(res, "data", []) or []
 
-@app.post("/documents/{doc_id}/versions")
+@supabase_documents.post("/documents/{doc_id}/versions")
 async def add_version(
     doc_id: str,
+    response: Response,
     note: Optional[str] = Form(None),
     file: UploadFile = File(...),
 ):
     ensure_supabase()
-    # Traer doc
-    doc_res = sb.table("documents").select("*").eq("id", doc_id).single().execute()
-    doc = getattr(doc_res, "data", None)
-    if not doc:
-        raise HTTPException(status_code=404, detail="Documento no encontrado")
+    timing = ServerTiming()
+    try:
+        return await _add_version(doc_id, note, file, response, timing)
+    finally:
+        timing.log("add_version", doc_id=doc_id)
+
+
+async def _publish_version(
+    doc_id: str, storage_path: str, spool: SpooledUpload, note: Optional[str]
+) -> Optional[int]:
+    """
+    Reserva el próximo número de versión e inserta la fila en una sola
+    llamada (``add_document_version``, ver ``app/versions.py``). Devuelve el
+    número o None si el documento no existe.
+    """
+    res = await supabase_io.execute(sb.postgrest.rpc("add_document_version", {
+        "p_document_id": doc_id,
+        "p_storage_path": storage_path,
+        "p_checksum": spool.checksum,
+        "p_size_bytes": spool.size_bytes,
+        "p_mime_type": spool.mime_type,
+        "p_note": note,
+    }))
+    rows = getattr(res, "data", None) or []
+    return int(rows[0]["version"]) if rows else None
+
 
-    curr = int(doc["current_version"])
-    new_v = curr + 1
-
-    filename = safe_filename(file.filename or f"v{new_v}")
-    storage_path = f"{doc_id}/v{new_v}/{filename}"
-    content = await file.read()
-    if not content:
-        raise HTTPException(status_code=400, detail="Archivo vacío")
-    checksum = sha256_bytes(content)
-    mime_type = file.content_type or "application/octet-stream"
-
-    up_res = sb.storage.from_(BUCKET).upload(
-        path=storage_path,
-        file=content,
-        file_options={"content-type": mime_type, "x-upsert": "false"},
+async def _ensure_document(doc_id: str, timing: ServerTiming) -> None:
+    """
+    404 si el documento no existe. Una ida más a la base, a propósito: sin
+    esto un id inexistente se descubre recién al publicar, con el archivo ya
+    leído y subido.
+    """
+    try:
+        UUID(doc_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Documento no encontrado")
+    exists = await timing.measure(
+        "documents", supabase_io.execute(sb.table("documents").select("id").eq("id", doc_id).limit(1))
     )
-    if isinstance(up_res, dict) and up_res.get("error"):
-        raise HTTPException(status_code=500, detail=f"Error subiendo a Storage: {up_res['error']}")
+    if not (getattr(exists, "data", None) or []):
+        raise HTTPException(status_code=404, detail="Documento no encontrado")
 
-    ins_ver = sb.table("document_versions").insert({
-        "document_id": doc_id,
-        "version": new_v,
-        "storage_path": storage_path,
-        "checksum": checksum,
-        "size_bytes": len(content),
-        "mime_type": mime_type,
-        "note": note,
-    }).execute()
-    if not getattr(ins_ver, "data", None):
-        raise HTTPException(status_code=500, detail="DB no devolvió datos al insertar versión")
 
-    up_doc = sb.table("documents").update({"current_version": new_v}).eq("id", doc_id).execute()
-    if not getattr(up_doc, "data", None):
-        raise HTTPException(status_code=500, detail="DB no devolvió datos al actualizar documento")
+async def _store_version(
+    doc_id: str, spool: SpooledUpload, filename: str, note: Optional[str], timing: ServerTiming
+) -> int:
+    """Sube ``spool`` y publica la versión; 404 si el documento ya no existe."""
+    # El número se conoce recién al publicar la versión: la ruta no lo lleva
+    storage_path = f"{doc_id}/{uuid.uuid4().hex}/{filename}"
+    # Primero el objeto (o uno idéntico ya publicado, con DEDUP_UPLOADS) y
+    # después la fila: una versión visible siempre tiene su archivo
+    storage_path, upload_error, uploaded = await timing.measure("upload", _store_spool(spool, storage_path))
+    if upload_error:
+        raise HTTPException(status_code=500, detail=f"Error subiendo a Storage: {upload_error}")
 
+    new_v: Optional[int] = None
+    try:
+        new_v = await timing.measure("versions", _publish_version(doc_id, storage_path, spool, note))
+    finally:
+        # compensar (documento borrado durante el upload, RPC fallida): el
+        # objeto recién subido queda para el barrido de huérfanos
+        if new_v is None and uploaded:
+            await _release_storage_object(storage_path)
+    if new_v is None:
+        raise HTTPException(status_code=404, detail="Documento no encontrado")
+
+    latest_paths.invalidate(str(UUID(doc_id)))
+    entity_cache.documents.invalidate(str(UUID(doc_id)))
+    return new_v
+
+
+async def _add_version(
+    doc_id: str, note: Optional[str], file: UploadFile, response: Response, timing: ServerTiming
+) -> Dict[str, Any]:
+    await _ensure_document(doc_id, timing)
+    spool = await spool_upload(file)
+    for stage, seconds in spool.timings.items():
+        timing.add(stage, seconds)
+
+    with spool:
+        if not spool.size_bytes:
+            raise HTTPException(status_code=400, detail="Archivo vacío")
+        new_v = await _store_version(doc_id, spool, safe_filename(file.filename or "archivo"), note, timing)
+
+    response.headers["Server-Timing"] = timing.header()
     return {"ok": True, "version": new_v}
 
-@app.get("/documents/{doc_id}/download")
-def download_signed_url(doc_id: str, version: Optional[int] = None, expire_seconds: int = 3600):
+
+# --------------------
+# Uploads reanudables: las partes se guardan en el disco del servidor
+# (app/resumable.py, sesiones de documents.uploads) y al finalizar el
+# archivo se sube a Storage desde acá, donde la conexión es estable.
+# --------------------
+@supabase_documents.post(
+    "/documents/uploads/{upload_id}/document",
+    response_model=DocumentOut,
+    summary="Finalizar un upload reanudable como documento nuevo",
+)
+async def finish_upload_as_document(
+    upload_id: UUID,
+    response: Response,
+    title: str = Form(...),
+    category_id: Optional[int] = Form(None),
+    date_ref: Optional[date] = Form(None),
+    tags: Optional[str] = Form(None),   # CSV "a,b,c"
+    extra: Optional[str] = Form(None),  # JSON string
+    note: Optional[str] = Form(None),
+    db: Session = Depends(get_db),
+    store: Storage = Depends(get_storage),
+):
+    ensure_supabase()
+    timing = ServerTiming()
+    log_fields: Dict[str, Any] = {"upload_id": str(upload_id)}
+    try:
+        tags_list, extra_dict = _parse_document_fields(tags, extra)
+        fields = {
+            "title": title,
+            "category_id": category_id,
+            "date_ref": str(date_ref) if date_ref else None,
+            "tags": tags_list,
+            "extra": extra_dict,
+        }
+        # si algo falla la sesión queda con sus partes para reintentar
+        async with resumable.assembled(db, store, upload_id) as (session, spool):
+            doc_payload = await _publish_document(spool, session.filename, fields, note, timing, log_fields)
+        response.headers["Server-Timing"] = timing.header()
+        return {**doc_payload, "date_ref": date_ref}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Fallo creando documento: {e}")
+    finally:
+        timing.log("finish_upload_as_document", **log_fields)
+
+
+@supabase_documents.post(
+    "/documents/uploads/{upload_id}/version",
+    summary="Finalizar un upload reanudable como nueva versión de un documento",
+)
+async def finish_upload_as_version(
+    upload_id: UUID,
+    response: Response,
+    document_id: UUID = Form(...),
+    note: Optional[str] = Form(None),
+    db: Session = Depends(get_db),
+    store: Storage = Depends(get_storage),
+):
+    ensure_supabase()
+    timing = ServerTiming()
+    doc_id = str(document_id)
+    try:
+        # antes de tocar la sesión: con un documento inexistente sigue intacta
+        await _ensure_document(doc_id, timing)
+        async with resumable.assembled(db, store, upload_id) as (session, spool):
+            new_v = await _store_version(doc_id, spool, session.filename, note, timing)
+        response.headers["Server-Timing"] = timing.header()
+        return {"ok": True, "version": new_v}
+    finally:
+        timing.log("finish_upload_as_version", doc_id=doc_id, upload_id=str(upload_id))
+
+async def _version_path(doc_id: str, version: Optional[int]) -> Optional[str]:
+    """
+    storage_path de una versión (o de la última si ``version`` es None).
+    Las versiones puntuales no cambian; la última se invalida en add_version.
+    """
+
+    async def load() -> Optional[str]:
+        q = sb.table("document_versions").select("storage_path,version").eq("document_id", doc_id)
+        if version is not None:
+            q = q.eq("version", version)
+        res = await supabase_io.execute(q.order("version", desc=True).limit(1))
+        rows = getattr(res, "data", []) or []
+        return rows[0]["storage_path"] if rows else None
+
+    if version is None:
+        return await latest_paths.aget_or_load(doc_id, load)
+    key = f"{doc_id}:{version}"
+    storage_path = version_paths.get(key)
+    if not storage_path:
+        storage_path = await load()
+        if storage_path:
+            version_paths.set(key, storage_path)
+    return storage_path
+
+
+async def _signed_url(storage_path: str, expire_seconds: int) -> Tuple[str, int]:
+    """
+    Firma ``storage_path`` reutilizando URLs recientes: una URL cacheada se
+    sirve mientras le quede al menos ``1 - SIGNED_URL_CACHE_FRACTION`` de su
+    vida. Devuelve ``(url, segundos_restantes)``.
+    """
+    hit = _cached_signed_url(storage_path, expire_seconds)
+    if hit:
+        return hit
+
+    signed = await supabase_io.run(
+        sb.storage.from_(BUCKET).create_signed_url, storage_path, expire_seconds
+    )
+    url = _signed_url_of(signed)
+    if not url:
+        raise HTTPException(status_code=500, detail=f"No se pudo firmar URL: {signed}")
+    _remember_signed_url(storage_path, expire_seconds, url)
+    return url, expire_seconds
+
+
+def _signed_url_of(signed: Any) -> Optional[str]:
+    # según la versión del SDK la clave es 'signed_url' o 'signedURL'
+    if not isinstance(signed, dict):
+        return None
+    return signed.get("signed_url") or signed.get("signedURL")
+
+
+def _cached_signed_url(storage_path: str, expire_seconds: int) -> Optional[Tuple[str, int]]:
+    """
+    ``(url, segundos_restantes)`` de la caché, o None si no hay o si ya le
+    queda menos de ``1 - SIGNED_URL_CACHE_FRACTION`` de su vida (se vuelve a
+    firmar). El TTL de la caché ya lo asegura; esto cubre relojes y entradas
+    que vienen de otro worker.
+    """
+    hit = signed_urls.get(f"{expire_seconds}:{storage_path}")
+    if not hit:
+        return None
+    remaining = max(0, expire_seconds - int(time.time() - hit["signed_at"]))
+    if remaining < expire_seconds * (1 - settings.SIGNED_URL_CACHE_FRACTION):
+        return None
+    return hit["url"], remaining
+
+
+def _remember_signed_url(storage_path: str, expire_seconds: int, url: str) -> None:
+    signed_urls.set(
+        f"{expire_seconds}:{storage_path}",
+        {"url": url, "signed_at": time.time()},
+        ttl=expire_seconds * settings.SIGNED_URL_CACHE_FRACTION,
+    )
+
+
+VERSION_ROWS_PAGE = 1000
+
+
+async def _version_rows(doc_ids: List[str]) -> List[Dict[str, Any]]:
+    """
+    (document_id, version, storage_path) de todas las versiones de
+    ``doc_ids``, por documento y de la más nueva a la más vieja. Se pagina
+    hasta cubrir el total: PostgREST corta cada respuesta en ``max-rows``.
+    """
+    rows: List[Dict[str, Any]] = []
+    total: Optional[int] = None
+    while total is None or len(rows) < total:
+        res = await supabase_io.execute(
+            sb.table("document_versions")
+            .select("document_id,version,storage_path", count="exact" if total is None else None)
+            .in_("document_id", doc_ids)
+            .order("document_id")
+            .order("version", desc=True)
+            .range(len(rows), len(rows) + VERSION_ROWS_PAGE - 1)
+        )
+        page = getattr(res, "data", []) or []
+        if total is None:
+            total = getattr(res, "count", None) or 0
+        if not page:
+            break
+        rows.extend(page)
+    return rows
+
+
+async def _sign_one(path: str, expire_seconds: int) -> Tuple[Optional[str], Optional[str]]:
+    try:
+        signed = await supabase_io.run(sb.storage.from_(BUCKET).create_signed_url, path, expire_seconds)
+    except Exception as e:
+        return None, f"No se pudo firmar URL: {e}"
+    url = _signed_url_of(signed)
+    return (url, None) if url else (None, "No se pudo firmar URL")
+
+
+async def _sign_paths(paths: List[str], expire_seconds: int) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+    """
+    ``{ruta: (url, error)}`` con una llamada de firmado masivo. Si una ruta no
+    existe el SDK falla con todo el lote (no arma el error por ítem), así
+    que en ese caso se firma de a una, en paralelo, para aislar las fallidas.
+    """
+    try:
+        signed = await supabase_io.run(sb.storage.from_(BUCKET).create_signed_urls, paths, expire_seconds)
+    except Exception:
+        results = await asyncio.gather(*(_sign_one(path, expire_seconds) for path in paths))
+        signed_paths = dict(zip(paths, results))
+    else:
+        wanted = set(paths)
+        signed_paths = {}
+        for entry in signed or []:
+            if entry.get("path") not in wanted:
+                continue
+            url = _signed_url_of(entry)
+            error = None if url else entry.get("error") or "No se pudo firmar URL"
+            signed_paths[entry["path"]] = (url, error)
+    for path in paths:
+        url, _ = signed_paths.setdefault(path, (None, "No se pudo firmar URL"))
+        if url:
+            _remember_signed_url(path, expire_seconds, url)
+    return signed_paths
+
+
+@supabase_documents.post("/documents/download-urls", response_model=DownloadUrlsOut)
+async def download_signed_urls(payload: DownloadUrlsIn):
+    """
+    Firma muchas descargas en un request: resuelve las rutas que no están en
+    caché con una consulta (paginada) a document_versions y firma las URLs
+    que faltan con una llamada de firmado masivo de Storage. Los ítems que
+    no se pueden resolver o firmar vuelven con ``error``.
+    """
+    ensure_supabase()
+    expire_seconds = payload.expire_seconds
+    items = [DownloadUrlOut(**ref.model_dump()) for ref in payload.items]
+
+    # 1) rutas: caché primero, el resto con una consulta (paginada)
+    paths: Dict[int, str] = {}
+    missing: List[int] = []
+    latest_versions: Dict[int, Optional[int]] = {}
+    for i, item in enumerate(items):
+        if item.version is None:
+            latest_versions[i], cached = latest_paths.lookup(str(item.doc_id))
+        else:
+            cached = version_paths.get(f"{item.doc_id}:{item.version}")
+        if cached:
+            paths[i] = cached
+        else:
+            missing.append(i)
+    if missing:
+        by_version: Dict[Tuple[str, int], str] = {}
+        latest: Dict[str, str] = {}
+        for row in await _version_rows(sorted({str(items[i].doc_id) for i in missing})):
+            doc_key = str(row["document_id"])
+            by_version[(doc_key, int(row["version"]))] = row["storage_path"]
+            latest.setdefault(doc_key, row["storage_path"])  # viene ordenado desc
+        for i in missing:
+            item = items[i]
+            doc_key = str(item.doc_id)
+            if item.version is None:
+                path = latest.get(doc_key)
+                latest_paths.store(doc_key, latest_versions[i], path)
+            else:
+                path = by_version.get((doc_key, item.version))
+                if path:
+                    version_paths.set(f"{doc_key}:{item.version}", path)
+            if path:
+                paths[i] = path
+            else:
+                item.error = "Versión no encontrada"
+
+    # 2) firmas: caché primero, el resto con create_signed_urls
+    to_sign: Dict[str, List[int]] = {}
+    for i, path in paths.items():
+        hit = _cached_signed_url(path, expire_seconds)
+        if hit:
+            items[i].url, items[i].expires_in = hit
+        else:
+            to_sign.setdefault(path, []).append(i)
+    if to_sign:
+        for path, (url, error) in (await _sign_paths(list(to_sign), expire_seconds)).items():
+            for i in to_sign[path]:
+                if url:
+                    items[i].url, items[i].expires_in = url, expire_seconds
+                else:
+                    items[i].error = error
+
+    return {"items": items}
+
+
+
+@supabase_documents.get("/documents/{doc_id}/download")
+async def download_signed_url(doc_id: str, version: Optional[int] = None, expire_seconds: int = 3600):
     """
     Devuelve un link firmado temporal para descargar (no público).
     """
     ensure_supabase()
-    q = sb.table("document_versions").select("storage_path,version").eq("document_id", doc_id)
-    if version is not None:
-        q = q.eq("version", version)
-    res = q.order("version", desc=True).limit(1).execute()
-    rows = getattr(res, "data", []) or []
-    if not rows:
+    storage_path = await _version_path(doc_id, version)
+    if not storage_path:
         raise HTTPException(status_code=404, detail="Versión no encontrada")
 
-    storage_path = rows[0]["storage_path"]
-    signed = sb.storage.from_(BUCKET).create_signed_url(storage_path, expire_seconds)
-    if not signed or "signed_url" not in signed:
-        raise HTTPException(status_code=500, detail=f"No se pudo firmar URL: {signed}")
+    url, expires_in = await _signed_url(storage_path, expire_seconds)
+    return {"url": url, "expires_in": expires_in}
 
-    return {"url": signed["signed_url"], "expires_in": expire_seconds}
 @app.get("/")
 def root():
     return {"ok": True, "service": "Digitalizacion Fabrica API"}
+
+
+if settings.SUPABASE_ENABLED:
+    # sesiones de uploads reanudables (disco del servidor) + endpoints de Supabase
+    app.include_router(documents.uploads, prefix="/documents", tags=["documents"])
+    app.include_router(supabase_documents)
+else:
+    app.include_router(documents.router)
+
+# tiempo de importar este módulo (y sus dependencias) para el reporte de arranque
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
@@ -0,0 +1,268 @@
+# app/metrics.py
+"""
+Métricas de proceso en formato de texto de Prometheus (``GET /metrics``).
+
+- ``MetricsMiddleware``: middleware ASGI con latencia por ruta (plantilla,
+  no path concreto), requests en curso y conteo por status.
+- ``instrument_engine``: hooks ``before/after_cursor_execute`` de SQLAlchemy
+  que suman consultas y tiempo de DB al request en curso (vía contextvar).
+- ``time_call``: tiempos de las llamadas a Supabase (ver ``supabase_io``).
+
+Sin dependencias externas: cada métrica es un dict protegido por un lock,
+así que el costo por request es de unos pocos microsegundos.
+"""
+from __future__ import annotations
+
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+from app.config import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        return lines + self._samples()
+
+    def _samples(self) -> List[str]:  # pragma: no cover - abstracto
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, labels: Tuple[str, ...] = ()) -> float:
+        return self._values.get(labels, 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, labels: Tuple[str, ...] = (), amount: float = 1.0) -> None:
+        self.inc(labels, -amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        # por combinación de labels: [conteos por bucket (+Inf al final), suma]
+        self._values: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][i] += 1
+            entry[1] += value
+
+    def count(self, labels: Tuple[str, ...] = ()) -> int:
+        entry = self._values.get(labels)
+        return sum(entry[0]) if entry else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1])) for k, v in self._values.items())
+        lines = []
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = f'le="{_fmt_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, labels, le)} {cumulative}")
+            lbl = _fmt_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{lbl} {_fmt_value(total)}")
+            lines.append(f"{self.name}_count{lbl} {cumulative}")
+        return lines
+
+
+def render() -> str:
+    """Todas las métricas registradas, en formato de exposición 0.0.4."""
+    return "\n".join(line for metric in _registry for line in metric.render()) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# --------------------
+# Métricas
+# --------------------
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "Requests HTTP por método, ruta y status", ("method", "route", "status")
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Latencia de requests HTTP por ruta", ("method", "route")
+)
+HTTP_IN_PROGRESS = Gauge("http_requests_in_progress", "Requests HTTP en curso")
+DB_QUERIES = Counter("db_queries_total", "Consultas SQL ejecutadas, por ruta", ("route",))
+DB_QUERY_LATENCY = Histogram("db_query_duration_seconds", "Duración de cada consulta SQL")
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "Consultas SQL por request", ("route",), buckets=QUERY_COUNT_BUCKETS
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "db_time_per_request_seconds", "Tiempo total de DB por request", ("route",)
+)
+SUPABASE_LATENCY = Histogram(
+    "supabase_call_duration_seconds", "Duración de llamadas a Supabase (tablas y Storage)", ("op",)
+)
+SUPABASE_ERRORS = Counter("supabase_call_errors_total", "Llamadas a Supabase que fallaron", ("op",))
+
+
+# --------------------
+# Consultas SQL por request
+# --------------------
+class _RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+_current: contextvars.ContextVar[Optional[_RequestStats]] = contextvars.ContextVar(
+    "metrics_request", default=None
+)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("metrics_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    DB_QUERY_LATENCY.observe((), elapsed)
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+
+def instrument_engine(engine: Any) -> None:
+    """Registra los hooks de tiempo de consultas en ``engine`` (sync; para async usar ``.sync_engine``)."""
+    if not settings.METRICS_ENABLED:
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# --------------------
+# Llamadas externas
+# --------------------
+@contextmanager
+def time_call(op: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        SUPABASE_ERRORS.inc((op,))
+        raise
+    finally:
+        SUPABASE_LATENCY.observe((op,), time.perf_counter() - start)
+
+
+# --------------------
+# Middleware ASGI
+# --------------------
+def _route_of(scope: Dict[str, Any]) -> str:
+    # FastAPI deja la ruta resuelta en el scope: se usa la plantilla
+    # (/documents/{doc_id}) para no crear una serie por id
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_wrapper(message) -> None:
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        stats = _RequestStats()
+        token = _current.set(stats)
+        HTTP_IN_PROGRESS.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_IN_PROGRESS.dec()
+            _current.reset(token)
+            route = _route_of(scope)
+            method = scope["method"]
+            HTTP_REQUESTS.inc((method, route, str(status[0])))
+            HTTP_LATENCY.observe((method, route), elapsed)
+            DB_QUERIES_PER_REQUEST.observe((route,), stats.queries)
+            if stats.queries:
+                DB_QUERIES.inc((route,), stats.queries)
+                DB_TIME_PER_REQUEST.observe((route,), stats.db_seconds)
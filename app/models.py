@@ -6,6 +6,8 @@ from datetime import datetime, date
 from typing import Any, List, Optional
 
 from sqlalchemy import (
+    BigInteger,
+    Float,
     String,
     Integer,
     Date,
@@ -108,6 +110,10 @@ class Document(Base):
             "date_ref",
             postgresql_using="btree",
         ),
+        # Paginado por keyset: (date_ref, id) en el router SQL y
+        # (created_at, id) en el listado vía Supabase
+        Index("ix_documents_date_ref_id", "date_ref", "id"),
+        Index("ix_documents_created_at_id", "created_at", "id"),
     )
 
     def __repr__(self) -> str:
@@ -117,6 +123,115 @@ class Document(Base):
         )
 
 
+# ---------------------------
+# DocumentVersion
+# ---------------------------
+class DocumentVersion(Base):
+    __tablename__ = "document_versions"
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
+    )
+    document_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("documents.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    version: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    # Con dedup, varias versiones pueden apuntar al mismo objeto de Storage
+    storage_path: Mapped[str] = mapped_column(Text, nullable=False)
+    checksum: Mapped[str] = mapped_column(String(64), nullable=False)
+    size_bytes: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    mime_type: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    note: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_by: Mapped[Optional[uuid.UUID]] = mapped_column(UUID(as_uuid=True), nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(
+        nullable=False, server_default=func.now()
+    )
+
+    __table_args__ = (
+        UniqueConstraint("document_id", "version", name="uq_document_versions_doc_version"),
+        # Dedup por contenido y conteo de referencias por objeto
+        Index("ix_document_versions_checksum_size", "checksum", "size_bytes"),
+        Index("ix_document_versions_storage_path", "storage_path"),
+    )
+
+    def __repr__(self) -> str:  # pragma: no cover - repr simple
+        return f"<DocumentVersion document_id={self.document_id} version={self.version}>"
+
+
+# ---------------------------
+# DocumentTag (índice invertido de Document.tags)
+# ---------------------------
+class DocumentTag(Base):
+    """
+    Una fila por (documento, tag normalizado). La mantienen triggers de la
+    base sobre ``documents`` (ver ``app/tags.py``), así que también refleja
+    lo que se escribe vía Supabase.
+    """
+
+    __tablename__ = "document_tags"
+
+    document_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("documents.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    tag: Mapped[str] = mapped_column(String(255), primary_key=True)
+
+    __table_args__ = (
+        # filtro por tag -> documentos sin tocar la tabla documents
+        Index("ix_document_tags_tag_doc", "tag", "document_id"),
+    )
+
+
+class DocumentTagCount(Base):
+    """Cantidad de documentos por tag (facetas), mantenida por triggers."""
+
+    __tablename__ = "document_tag_counts"
+
+    tag: Mapped[str] = mapped_column(String(255), primary_key=True)
+    documents: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+# ---------------------------
+# DocumentExtraValue (claves "promovidas" de Document.extra)
+# ---------------------------
+class DocumentExtraKey(Base):
+    """Claves de ``extra`` indexadas (se sincroniza con PROMOTED_EXTRA_KEYS)."""
+
+    __tablename__ = "document_extra_keys"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+
+
+class DocumentExtraValue(Base):
+    """
+    Valor de una clave promovida de ``extra`` por documento, como texto y,
+    si es numérico, como número. Lo mantienen triggers (ver
+    ``app/extra_index.py``).
+    """
+
+    __tablename__ = "document_extra_values"
+
+    document_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("documents.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    value_text: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    value_num: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+
+    __table_args__ = (
+        # igualdad y rangos por clave
+        Index("ix_document_extra_values_num", "key", "value_num", "document_id"),
+        Index("ix_document_extra_values_text", "key", "value_text", "document_id"),
+    )
+
+
 # ---------------------------
 # Material
 # ---------------------------
@@ -161,7 +276,71 @@ class Batch(Base):
 
     __table_args__ = (
         UniqueConstraint("material_id", "batch_code", name="uq_batches_material_code"),
+        # Paginado por keyset en el listado
+        Index("ix_batches_prod_date_id", "production_date", "id"),
     )
 
     def __repr__(self) -> str:  # pragma: no cover - repr simple
         return f"<Batch id={self.id} material_id={self.material_id} code={self.batch_code!r}>"
+
+
+# ---------------------------
+# SchemaState (huella del esquema aplicado, ver app/schema_state.py)
+# ---------------------------
+class SchemaState(Base):
+    """
+    Huella del esquema (tablas, índices, triggers, migraciones) aplicado a
+    esta base. Si coincide con la del código, el arranque no corre DDL.
+    """
+
+    __tablename__ = "schema_state"
+
+    key: Mapped[str] = mapped_column(String(32), primary_key=True)
+    fingerprint: Mapped[str] = mapped_column(String(64), nullable=False)
+    applied_at: Mapped[datetime] = mapped_column(nullable=False, server_default=func.now())
+
+
+# ---------------------------
+# UploadSession (uploads reanudables, ver app/resumable.py)
+# ---------------------------
+class StorageOrphan(Base):
+    """
+    Objeto de Supabase Storage que quedó sin versión (alta compensada). No se
+    borra en el momento: el barrido lo elimina pasado ``STORAGE_ORPHAN_GRACE``
+    si ninguna versión lo referencia para entonces.
+    """
+
+    __tablename__ = "storage_orphans"
+
+    storage_path: Mapped[str] = mapped_column(Text, primary_key=True)
+    marked_at: Mapped[datetime] = mapped_column(nullable=False, server_default=func.now())
+
+    __table_args__ = (Index("ix_storage_orphans_marked_at", "marked_at"),)
+
+
+class UploadSession(Base):
+    """
+    Upload en curso por partes. Los bytes recibidos viven en un archivo en la
+    carpeta de spool del storage; ``received_bytes`` es el offset confirmado.
+    """
+
+    __tablename__ = "upload_sessions"
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
+    )
+    filename: Mapped[str] = mapped_column(String(255), nullable=False)
+    mime_type: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    size_bytes: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    received_bytes: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    # SHA-256 esperado del archivo completo (opcional, se verifica al finalizar)
+    checksum: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    # clave en el storage una vez publicado el archivo: si persistir el
+    # documento o la versión falla, se reintenta sin volver a subirlo
+    storage_key: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(nullable=False, server_default=func.now())
+    # se extiende con cada parte; vencida, la borra el GC
+    expires_at: Mapped[datetime] = mapped_column(nullable=False)
+
+    __table_args__ = (Index("ix_upload_sessions_expires_at", "expires_at"),)
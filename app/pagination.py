@@ -0,0 +1,32 @@
+# app/pagination.py
+"""
+Cursores opacos para paginado por keyset (``?after=<cursor>``).
+
+El cursor codifica los valores de las columnas de orden de la última fila
+devuelta; la página siguiente arranca con un seek sobre el índice compuesto
+en vez de saltear ``offset`` filas.
+"""
+from __future__ import annotations
+
+import base64
+import json
+from typing import Any, List
+
+from fastapi import HTTPException
+
+
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps([str(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[str]:
+    """Devuelve los ``size`` valores del cursor o responde 400 si es inválido."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    return [str(v) for v in values]
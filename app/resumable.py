@@ -0,0 +1,380 @@
+# app/resumable.py
+"""
+Uploads reanudables para archivos grandes (con y sin Supabase).
+
+1. ``POST /documents/uploads`` crea la sesión: nombre, tamaño y, opcional,
+   el SHA-256 esperado del archivo completo.
+2. ``PUT /documents/uploads/{id}?offset=N`` agrega una parte (cuerpo crudo).
+   ``offset`` tiene que ser el ya confirmado; si no, 409 con el actual en
+   ``Upload-Offset``. ``X-Chunk-Sha256`` (opcional) verifica la parte: si no
+   coincide se descarta y se responde 422.
+3. ``GET /documents/uploads/{id}`` devuelve el offset para reanudar.
+4. ``POST /documents/uploads/{id}/document`` o ``.../version`` publica el
+   archivo en el storage y crea el documento o la nueva versión.
+
+El SHA-256 se calcula a medida que llegan las partes: cada proceso guarda
+el estado del hash por sesión y, si una parte cae en otro worker, este lee
+del disco solo el tramo que le falta. Al finalizar no se relee el archivo y
+``LocalStorage`` lo publica con un rename. Una parte a la vez por sesión
+(``flock`` sobre el archivo de datos).
+
+Al finalizar, la clave del archivo publicado queda en la sesión hasta que
+el documento o la versión se confirman (en esa misma transacción se borra
+la sesión): si persistir falla, el cliente reintenta sin volver a subir.
+
+Con Supabase las partes se guardan igual, en el disco del servidor (sesión
+en ``upload_sessions`` de la base SQL), y al finalizar ``assembled`` entrega
+el archivo verificado para subirlo a Storage desde el servidor. La sesión
+se cierra recién con el documento o la versión confirmados.
+
+Las sesiones sin actividad durante ``RESUMABLE_TTL`` se borran (fila,
+bytes y archivo publicado que nadie use) con ``collect_expired``. Corre
+cada ``RESUMABLE_GC_INTERVAL`` en segundo plano (``collect_forever``, desde
+el arranque) y al crear sesiones, como mucho una vez por intervalo.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, BinaryIO, Iterator, Optional, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app import models
+from app.config import settings
+from app.database import SessionLocal
+from app.storage import Storage, get_storage, release
+from app.uploads import SpooledUpload
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: sin lock entre procesos
+    fcntl = None  # type: ignore[assignment]
+
+# Estados de hash por sesión en este proceso: (bytes ya hasheados, sha256)
+MAX_HASHERS = 1024
+_hashers: "OrderedDict[str, Tuple[int, Any]]" = OrderedDict()
+_hashers_lock = threading.Lock()
+_last_gc = 0.0
+
+
+def _now() -> datetime:
+    # las columnas son DateTime sin zona: UTC naive
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _expiry() -> datetime:
+    return _now() + timedelta(seconds=settings.RESUMABLE_TTL)
+
+
+def data_path(store: Storage, session_id: Any) -> str:
+    directory = store.spool_dir or settings.UPLOAD_SPOOL_DIR or tempfile.gettempdir()
+    return os.path.join(directory, f"resumable-{session_id}")
+
+
+def _remember(session_id: str, offset: int, hasher: Any) -> None:
+    with _hashers_lock:
+        _hashers[session_id] = (offset, hasher)
+        _hashers.move_to_end(session_id)
+        while len(_hashers) > MAX_HASHERS:
+            _hashers.popitem(last=False)
+
+
+def _forget(session_id: str) -> None:
+    with _hashers_lock:
+        _hashers.pop(session_id, None)
+
+
+def _hasher(session_id: str, fh: BinaryIO, offset: int) -> Any:
+    """SHA-256 de los primeros ``offset`` bytes; del disco lee solo lo que falte."""
+    with _hashers_lock:
+        cached = _hashers.get(session_id)
+    done, hasher = cached if cached and cached[0] <= offset else (0, hashlib.sha256())
+    hasher = hasher.copy()
+    fh.seek(done)
+    while done < offset:
+        block = fh.read(min(settings.UPLOAD_CHUNK_SIZE, offset - done))
+        if not block:
+            raise HTTPException(status_code=500, detail="Faltan datos de la sesión de upload en disco")
+        hasher.update(block)
+        done += len(block)
+    return hasher
+
+
+@contextmanager
+def _locked(path: str) -> Iterator[BinaryIO]:
+    """Archivo de datos abierto para escribir con lock exclusivo (409 si está tomado)."""
+    try:
+        fh = open(path, "r+b")
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Sesión de upload no encontrada")
+    with fh:
+        if fcntl is not None:
+            try:
+                fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise HTTPException(status_code=409, detail="Hay otra parte en curso para esta sesión")
+        yield fh
+
+
+def offset_header(session: models.UploadSession) -> dict:
+    return {"Upload-Offset": str(session.received_bytes)}
+
+
+def get(db: Session, session_id: UUID) -> models.UploadSession:
+    session = db.get(models.UploadSession, session_id)
+    if session is None or session.expires_at < _now():
+        raise HTTPException(status_code=404, detail="Sesión de upload no encontrada")
+    return session
+
+
+def create(
+    db: Session,
+    store: Storage,
+    filename: str,
+    size_bytes: int,
+    mime_type: Optional[str] = None,
+    checksum: Optional[str] = None,
+) -> models.UploadSession:
+    if size_bytes > settings.RESUMABLE_MAX_BYTES:
+        raise HTTPException(
+            status_code=413, detail=f"Tamaño máximo: {settings.RESUMABLE_MAX_BYTES} bytes"
+        )
+    maybe_collect(db, store)
+    session = models.UploadSession(
+        filename=filename,
+        mime_type=mime_type,
+        size_bytes=size_bytes,
+        received_bytes=0,
+        checksum=checksum.lower() if checksum else None,
+        expires_at=_expiry(),
+    )
+    db.add(session)
+    db.flush()
+    open(data_path(store, session.id), "wb").close()
+    db.commit()
+    db.refresh(session)
+    return session
+
+
+def _write(fh: BinaryIO, hashers: Tuple[Any, ...], data: bytes) -> None:
+    for hasher in hashers:
+        hasher.update(data)
+    fh.write(data)
+
+
+def _sync(fh: BinaryIO) -> None:
+    fh.flush()
+    os.fsync(fh.fileno())
+
+
+async def append(
+    db: Session,
+    store: Storage,
+    session_id: UUID,
+    offset: int,
+    body: AsyncIterator[bytes],
+    chunk_sha256: Optional[str] = None,
+) -> models.UploadSession:
+    """
+    Escribe la parte que empieza en ``offset`` y la confirma. Si algo falla
+    (cuerpo cortado, tamaño excedido, checksum de la parte) el archivo vuelve
+    al offset anterior y la parte se puede reenviar.
+    """
+    session = await run_in_threadpool(get, db, session_id)
+    key = str(session.id)
+    with _locked(data_path(store, key)) as fh:
+        # el offset confirmado se lee con el lock tomado
+        await run_in_threadpool(db.refresh, session)
+        if offset != session.received_bytes:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Offset {offset} inválido: el upload va por {session.received_bytes}",
+                headers=offset_header(session),
+            )
+        hasher = await run_in_threadpool(_hasher, key, fh, offset)
+        chunk_hash = hashlib.sha256()
+        written = 0
+        buffer = bytearray()
+        try:
+            fh.seek(offset)
+            fh.truncate()
+            async for piece in body:
+                if offset + written + len(buffer) + len(piece) > session.size_bytes:
+                    raise HTTPException(status_code=413, detail="La parte excede el tamaño declarado")
+                buffer += piece
+                if len(buffer) >= settings.UPLOAD_CHUNK_SIZE:
+                    await run_in_threadpool(_write, fh, (hasher, chunk_hash), bytes(buffer))
+                    written += len(buffer)
+                    buffer.clear()
+            if buffer:
+                await run_in_threadpool(_write, fh, (hasher, chunk_hash), bytes(buffer))
+                written += len(buffer)
+            if chunk_sha256 and chunk_hash.hexdigest() != chunk_sha256.lower():
+                raise HTTPException(status_code=422, detail="X-Chunk-Sha256 no coincide con la parte recibida")
+            await run_in_threadpool(_sync, fh)
+        except BaseException:
+            fh.truncate(offset)
+            raise
+
+        session.received_bytes = offset + written
+        session.expires_at = _expiry()
+        await run_in_threadpool(db.commit)
+        _remember(key, session.received_bytes, hasher)
+    return session
+
+
+def _spool(session: models.UploadSession, path: str, checksum: str) -> SpooledUpload:
+    return SpooledUpload(
+        path=path,
+        checksum=checksum,
+        size_bytes=session.size_bytes,
+        mime_type=session.mime_type or "application/octet-stream",
+    )
+
+
+def complete(db: Session, store: Storage, session_id: UUID) -> Tuple[models.UploadSession, SpooledUpload, str]:
+    """
+    Publica el archivo completo en ``store`` con el SHA-256 acumulado (sin
+    releerlo si este proceso recibió las partes) y anota la clave en la
+    sesión. Devuelve ``(sesión, spool, clave)``. La sesión sigue abierta
+    hasta que ``claim`` la cierra junto con el documento o la versión: si
+    eso falla, un nuevo intento reutiliza el archivo ya publicado.
+    """
+    session = get(db, session_id)
+    if session.storage_key and store.exists(session.storage_key):
+        return session, _spool(session, data_path(store, session.id), session.checksum), session.storage_key
+    with _locked(data_path(store, session.id)) as fh:
+        spool = _verified(db, store, session, fh)
+        # hasta que la sesión lo referencia, release no puede borrar el archivo
+        with store.hold(spool.checksum):
+            stored_key, _ = store.save(spool)
+            session.checksum, session.storage_key = spool.checksum, stored_key
+            session.expires_at = _expiry()
+            db.commit()
+    return session, spool, stored_key
+
+
+def _verified(db: Session, store: Storage, session: models.UploadSession, fh: BinaryIO) -> SpooledUpload:
+    """Archivo completo de la sesión con su SHA-256 (409 si faltan partes, 422 si no coincide)."""
+    db.refresh(session)
+    if session.received_bytes != session.size_bytes:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Upload incompleto: {session.received_bytes} de {session.size_bytes} bytes",
+            headers=offset_header(session),
+        )
+    key = str(session.id)
+    checksum = _hasher(key, fh, session.size_bytes).hexdigest()
+    if session.checksum and checksum != session.checksum:
+        close(db, store, session)
+        raise HTTPException(status_code=422, detail="El SHA-256 del archivo no coincide con el declarado")
+    return _spool(session, data_path(store, key), checksum)
+
+
+@asynccontextmanager
+async def assembled(
+    db: Session, store: Storage, session_id: UUID
+) -> AsyncIterator[Tuple[models.UploadSession, SpooledUpload]]:
+    """
+    Archivo completo y verificado de la sesión, para publicarlo en otro
+    storage (Supabase) desde el servidor. El lock de la sesión se mantiene
+    mientras se usa; si el bloque termina bien la sesión se cierra y, si
+    falla, queda intacta para reintentar sin volver a enviar partes.
+    """
+    session = await run_in_threadpool(get, db, session_id)
+    with _locked(data_path(store, session.id)) as fh:
+        spool = await run_in_threadpool(_verified, db, store, session, fh)
+        yield session, spool
+        await run_in_threadpool(close, db, store, session)
+
+
+def claim(db: Session, session: models.UploadSession) -> None:
+    """
+    Borra la fila de la sesión dentro de la transacción del documento o la
+    versión que la finaliza: si otro request ya la finalizó, 409.
+    """
+    deleted = db.execute(delete(models.UploadSession).where(models.UploadSession.id == session.id)).rowcount
+    if deleted != 1:
+        raise HTTPException(status_code=409, detail="El upload ya se finalizó")
+    db.expunge(session)
+
+
+def discard_data(store: Storage, session_id: Any) -> None:
+    """Borra los bytes de la sesión (si no se publicaron con un rename) y su hash en memoria."""
+    _forget(str(session_id))
+    try:
+        os.remove(data_path(store, session_id))
+    except FileNotFoundError:
+        pass
+
+
+def close(db: Session, store: Storage, session: models.UploadSession) -> None:
+    """Cancela la sesión: borra fila, bytes y el archivo publicado si nadie lo usa."""
+    discard_data(store, session.id)
+    key = session.storage_key
+    db.delete(session)
+    db.commit()
+    if key:
+        release(db, store, key)
+
+
+def collect_expired(db: Session, store: Storage, limit: int = 500) -> int:
+    """Borra hasta ``limit`` sesiones vencidas con sus archivos. Devuelve cuántas."""
+    expired = (
+        db.query(models.UploadSession.id, models.UploadSession.storage_key)
+        .filter(models.UploadSession.expires_at < _now())
+        .limit(limit)
+        .all()
+    )
+    for sid, _ in expired:
+        discard_data(store, sid)
+    if expired:
+        db.query(models.UploadSession).filter(
+            models.UploadSession.id.in_([sid for sid, _ in expired])
+        ).delete(synchronize_session=False)
+        db.commit()
+        for key in {key for _, key in expired if key}:
+            release(db, store, key)
+    return len(expired)
+
+
+def maybe_collect(db: Session, store: Storage) -> None:
+    global _last_gc
+    if time.monotonic() - _last_gc < settings.RESUMABLE_GC_INTERVAL:
+        return
+    _last_gc = time.monotonic()
+    collect_expired(db, store)
+
+
+def _collect_now() -> int:
+    with SessionLocal() as db:
+        return collect_expired(db, get_storage())
+
+
+async def collect_forever() -> None:
+    """
+    GC en segundo plano (se lanza al arrancar): corre ``collect_expired``
+    cada ``RESUMABLE_GC_INTERVAL`` aunque nadie use los uploads reanudables.
+    """
+    log = logging.getLogger(__name__)
+    while True:
+        await asyncio.sleep(settings.RESUMABLE_GC_INTERVAL)
+        try:
+            collected = await run_in_threadpool(_collect_now)
+            if collected:
+                log.info("Uploads reanudables vencidos borrados: %s", collected)
+        except Exception as e:  # pragma: no cover - logueado
+            log.warning("GC de uploads reanudables falló: %s", e)
@@ -1,16 +1,28 @@
 from __future__ import annotations
 
+import uuid
 from datetime import date
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import func
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import ValidationError
+from sqlalchemy import and_, or_, select
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app.database import get_db
-from app import models, schemas
+from app import entity_cache, models, schemas, search as text_search
+from app.bulk import BULK_CHUNK_SIZE, detect_format, dialect_insert, iter_records, validation_message
+from app.pagination import decode_cursor, encode_cursor
+from app.serialization import RowSerializer
+from app.streaming import ndjson_response
 
 router = APIRouter()
 
+# listados: columnas como tuplas -> JSON sin pasar por modelos Pydantic
+BATCH_ROWS = RowSerializer(schemas.BatchRead)
+
 
 @router.post("/", response_model=schemas.BatchRead, status_code=201)
 def create_batch(batch: schemas.BatchCreate, db: Session = Depends(get_db)):
@@ -25,35 +37,239 @@ def create_batch(batch: schemas.BatchCreate, db: Session = Depends(get_db)):
     return obj
 
 
+class BulkConflict(Exception):
+    pass
+
+
+def _batch_params(batches) -> list:
+    return [{"id": str(uuid.uuid4()), **b.model_dump()} for b in batches]
+
+
+def flush_batches(db: Session, chunk: list, on_conflict: str, report: schemas.BulkReport) -> None:
+    """Inserta un bloque de batches validados con un único INSERT multi-fila."""
+    material_ids = {b.material_id for _, b in chunk}
+    known = set(
+        db.scalars(select(models.Material.id).where(models.Material.id.in_(material_ids)))
+    )
+    valid = []
+    for row_no, b in chunk:
+        if b.material_id not in known:
+            report.rejected += 1
+            report.add_issue(row_no, "Material no encontrado")
+        else:
+            valid.append((row_no, b))
+    if not valid:
+        return
+
+    existing = {
+        (material_id, batch_code): batch_id
+        for batch_id, material_id, batch_code in db.execute(
+            select(models.Batch.id, models.Batch.material_id, models.Batch.batch_code).where(
+                models.Batch.material_id.in_({b.material_id for _, b in valid}),
+                models.Batch.batch_code.in_({b.batch_code for _, b in valid}),
+            )
+        )
+    }
+    fresh = []
+    for row_no, b in valid:
+        if (b.material_id, b.batch_code) in existing:
+            report.conflicts += 1
+            report.add_issue(row_no, f"Batch duplicado: {b.batch_code}")
+        else:
+            fresh.append(b)
+    if report.conflicts and on_conflict == "fail":
+        raise BulkConflict()
+
+    stmt = dialect_insert(db, models.Batch.__table__)
+    if on_conflict == "update":
+        # uq_batches_material_code decide qué filas se actualizan
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["material_id", "batch_code"],
+            set_={c: stmt.excluded[c] for c in ("quantity", "production_date", "is_active")},
+        )
+        db.execute(stmt, _batch_params(b for _, b in valid))
+        report.inserted += len(fresh)
+        report.updated += len(valid) - len(fresh)
+    elif on_conflict == "skip":
+        # se cuentan las filas que devuelve RETURNING: las que otro request
+        # insertó entre el SELECT de arriba y este INSERT quedan salteadas
+        stmt = stmt.on_conflict_do_nothing(index_elements=["material_id", "batch_code"])
+        inserted = len(db.execute(stmt.returning(models.Batch.id), _batch_params(fresh)).all()) if fresh else 0
+        report.inserted += inserted
+        report.skipped += len(valid) - inserted
+    elif fresh:
+        # fail: INSERT simple, un alta concurrente también termina en 409
+        try:
+            db.execute(stmt, _batch_params(fresh))
+        except IntegrityError:
+            report.conflicts += 1
+            report.add_issue(chunk[0][0], "Batch duplicado (alta concurrente)")
+            raise BulkConflict()
+        report.inserted += len(fresh)
+    if on_conflict != "fail":
+        db.commit()
+    if on_conflict == "update":
+        for _, b in valid:
+            batch_id = existing.get((b.material_id, b.batch_code))
+            if batch_id:
+                entity_cache.batches.invalidate(batch_id)
+
+
+async def batch_chunks(request: Request, report: schemas.BulkReport):
+    """
+    Lee el body CSV/NDJSON en streaming, valida cada fila (anotando los
+    rechazos en ``report``) y entrega bloques de hasta BULK_CHUNK_SIZE
+    ``(row_no, BatchCreate)``.
+    """
+    fmt = detect_format(request.headers.get("content-type"))
+    seen: set = set()
+    chunk: list = []
+    async for row_no, record, error in iter_records(request, fmt):
+        if error:
+            report.rejected += 1
+            report.add_issue(row_no, error)
+            continue
+        try:
+            batch = schemas.BatchCreate.model_validate(record)
+        except ValidationError as e:
+            report.rejected += 1
+            report.add_issue(row_no, validation_message(e))
+            continue
+        key = (batch.material_id, batch.batch_code)
+        if key in seen:
+            report.rejected += 1
+            report.add_issue(row_no, f"Batch repetido en el archivo: {batch.batch_code}")
+            continue
+        seen.add(key)
+        chunk.append((row_no, batch))
+        if len(chunk) >= BULK_CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+@router.post("/bulk", response_model=schemas.BulkReport)
+async def bulk_create_batches(
+    request: Request,
+    on_conflict: Literal["skip", "update", "fail"] = Query(
+        "skip", description="Qué hacer con batches existentes (material_id, batch_code)"
+    ),
+    db: Session = Depends(get_db),
+):
+    """
+    Alta masiva desde un body CSV (con encabezado) o NDJSON, leído en streaming.
+    Con ``skip``/``update`` cada bloque se confirma por separado; con ``fail``
+    todo corre en una transacción y el primer conflicto la revierte (409).
+    """
+    report = schemas.BulkReport()
+    try:
+        async for chunk in batch_chunks(request, report):
+            await run_in_threadpool(flush_batches, db, chunk, on_conflict, report)
+    except BulkConflict:
+        await run_in_threadpool(db.rollback)
+        report.inserted = 0
+        raise HTTPException(status_code=409, detail=report.model_dump())
+    except Exception:
+        await run_in_threadpool(db.rollback)
+        raise
+    if on_conflict == "fail":
+        await run_in_threadpool(db.commit)
+    return report
+
+
 @router.get("/{batch_id}", response_model=schemas.BatchRead)
 def get_batch(batch_id: str, db: Session = Depends(get_db)):
-    obj = db.get(models.Batch, batch_id)
-    if not obj:
+    def load():
+        obj = db.get(models.Batch, batch_id)
+        return schemas.BatchRead.model_validate(obj).model_dump(mode="json") if obj else None
+
+    data = entity_cache.batches.get_or_load(batch_id, load)
+    if not data:
         raise HTTPException(status_code=404, detail="Batch no encontrado")
-    return obj
+    return data
+
+
+def batches_select(
+    dialect: str,
+    material_id: str | None,
+    batch_code: str | None,
+    production_date_from: date | None,
+    production_date_to: date | None,
+    is_active: bool | None,
+    after: str | None,
+    prefix: bool = False,
+):
+    """SELECT del listado (lo comparten el router sync y el async)."""
+    stmt = select(models.Batch)
+    if material_id:
+        stmt = stmt.where(models.Batch.material_id == material_id)
+    if batch_code:
+        if prefix:
+            stmt = stmt.where(text_search.starts_with(dialect, models.Batch.batch_code, batch_code))
+        else:
+            stmt = stmt.where(
+                text_search.contains(dialect, text_search.BATCHES_TRGM, models.Batch, batch_code)
+            )
+    if production_date_from:
+        stmt = stmt.where(models.Batch.production_date >= production_date_from)
+    if production_date_to:
+        stmt = stmt.where(models.Batch.production_date <= production_date_to)
+    if is_active is not None:
+        stmt = stmt.where(models.Batch.is_active == is_active)
+    if after:
+        # keyset sobre (production_date, id): seek en ix_batches_prod_date_id
+        raw_date, last_id = decode_cursor(after, 2)
+        try:
+            last_date = date.fromisoformat(raw_date)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+        stmt = stmt.where(
+            or_(
+                models.Batch.production_date < last_date,
+                and_(models.Batch.production_date == last_date, models.Batch.id < last_id),
+            )
+        )
+    return stmt.order_by(models.Batch.production_date.desc(), models.Batch.id.desc())
 
 
 @router.get("/", response_model=list[schemas.BatchRead])
 def list_batches(
     db: Session = Depends(get_db),
     material_id: str | None = Query(None),
-    batch_code: str | None = Query(None),
+    batch_code: str | None = Query(None, description="Contiene (sin distinguir mayúsculas)"),
+    prefix: bool = Query(False, description="batch_code solo como prefijo (lectores de código)"),
     production_date_from: date | None = Query(None),
     production_date_to: date | None = Query(None),
     is_active: bool | None = Query(True),
+    limit: int | None = Query(None, ge=1, le=1000, description="Tamaño de página"),
+    after: str | None = Query(None, description="Cursor del header X-Next-Cursor"),
+    stream: bool = Query(False, description="Responder NDJSON en streaming"),
 ):
-    q = db.query(models.Batch)
-    if material_id:
-        q = q.filter(models.Batch.material_id == material_id)
-    if batch_code:
-        q = q.filter(func.lower(models.Batch.batch_code).like(f"%{batch_code.lower()}%"))
-    if production_date_from:
-        q = q.filter(models.Batch.production_date >= production_date_from)
-    if production_date_to:
-        q = q.filter(models.Batch.production_date <= production_date_to)
-    if is_active is not None:
-        q = q.filter(models.Batch.is_active == is_active)
-    return q.order_by(models.Batch.production_date.desc()).all()
+    stmt = batches_select(
+        db.get_bind().dialect.name,
+        material_id, batch_code, production_date_from, production_date_to, is_active, after, prefix,
+    )
+    if stream:
+        return ndjson_response(stmt.limit(limit) if limit else stmt, schemas.BatchRead)
+
+    stmt = stmt.with_only_columns(*BATCH_ROWS.columns(models.Batch))
+    if limit is None:
+        return BATCH_ROWS.response(db.execute(stmt))
+    rows = db.execute(stmt.limit(limit + 1)).all()
+    return BATCH_ROWS.response(rows[:limit], next_cursor_header(rows, limit))
+
+
+def next_cursor_header(rows: list, limit: int) -> dict[str, str] | None:
+    """``X-Next-Cursor`` si se trajo la fila extra (hay página siguiente)."""
+    if len(rows) <= limit:
+        return None
+    last = rows[limit - 1]
+    return {
+        "X-Next-Cursor": encode_cursor(
+            last[BATCH_ROWS.index("production_date")], last[BATCH_ROWS.index("id")]
+        )
+    }
 
 
 @router.put("/{batch_id}", response_model=schemas.BatchRead)
@@ -68,6 +284,7 @@ def update_batch(batch_id: str, payload: schemas.BatchUpdate, db: Session = Depe
     except IntegrityError:
         db.rollback()
         raise HTTPException(status_code=409, detail="Batch duplicado")
+    entity_cache.batches.invalidate(batch_id)
     db.refresh(obj)
     return obj
 
@@ -79,4 +296,5 @@ def delete_batch(batch_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Batch no encontrado")
     obj.is_active = False
     db.commit()
+    entity_cache.batches.invalidate(batch_id)
     return None
@@ -0,0 +1,134 @@
+"""
+Versión async del router de batches (``DB_ASYNC=true``): mismas rutas y
+respuestas, con ``AsyncSession`` en lugar de sesiones sync en el threadpool.
+"""
+from __future__ import annotations
+
+from datetime import date
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_async_db
+from app import entity_cache, models, schemas
+from app.routers.batches import (
+    BATCH_ROWS,
+    BulkConflict,
+    batch_chunks,
+    batches_select,
+    flush_batches,
+    next_cursor_header,
+)
+from app.streaming import ndjson_response
+
+router = APIRouter()
+
+
+@router.post("/", response_model=schemas.BatchRead, status_code=201)
+async def create_batch(batch: schemas.BatchCreate, db: AsyncSession = Depends(get_async_db)):
+    obj = models.Batch(**batch.model_dump())
+    db.add(obj)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Batch duplicado")
+    await db.refresh(obj)
+    return obj
+
+
+@router.post("/bulk", response_model=schemas.BulkReport)
+async def bulk_create_batches(
+    request: Request,
+    on_conflict: Literal["skip", "update", "fail"] = Query(
+        "skip", description="Qué hacer con batches existentes (material_id, batch_code)"
+    ),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Igual que el router sync; cada bloque corre con ``run_sync`` sobre la conexión async."""
+    report = schemas.BulkReport()
+    try:
+        async for chunk in batch_chunks(request, report):
+            await db.run_sync(flush_batches, chunk, on_conflict, report)
+    except BulkConflict:
+        await db.rollback()
+        report.inserted = 0
+        raise HTTPException(status_code=409, detail=report.model_dump())
+    except Exception:
+        await db.rollback()
+        raise
+    if on_conflict == "fail":
+        await db.commit()
+    return report
+
+
+@router.get("/{batch_id}", response_model=schemas.BatchRead)
+async def get_batch(batch_id: str, db: AsyncSession = Depends(get_async_db)):
+    async def load():
+        obj = await db.get(models.Batch, batch_id)
+        return schemas.BatchRead.model_validate(obj).model_dump(mode="json") if obj else None
+
+    data = await entity_cache.batches.aget_or_load(batch_id, load)
+    if not data:
+        raise HTTPException(status_code=404, detail="Batch no encontrado")
+    return data
+
+
+@router.get("/", response_model=list[schemas.BatchRead])
+async def list_batches(
+    db: AsyncSession = Depends(get_async_db),
+    material_id: str | None = Query(None),
+    batch_code: str | None = Query(None, description="Contiene (sin distinguir mayúsculas)"),
+    prefix: bool = Query(False, description="batch_code solo como prefijo (lectores de código)"),
+    production_date_from: date | None = Query(None),
+    production_date_to: date | None = Query(None),
+    is_active: bool | None = Query(True),
+    limit: int | None = Query(None, ge=1, le=1000, description="Tamaño de página"),
+    after: str | None = Query(None, description="Cursor del header X-Next-Cursor"),
+    stream: bool = Query(False, description="Responder NDJSON en streaming"),
+):
+    stmt = batches_select(
+        db.get_bind().dialect.name,
+        material_id, batch_code, production_date_from, production_date_to, is_active, after, prefix,
+    )
+    if stream:
+        # el streaming sigue usando su propia sesión sync (yield_per)
+        return ndjson_response(stmt.limit(limit) if limit else stmt, schemas.BatchRead)
+
+    stmt = stmt.with_only_columns(*BATCH_ROWS.columns(models.Batch))
+    if limit is None:
+        return BATCH_ROWS.response(await db.execute(stmt))
+    rows = (await db.execute(stmt.limit(limit + 1))).all()
+    return BATCH_ROWS.response(rows[:limit], next_cursor_header(rows, limit))
+
+
+@router.put("/{batch_id}", response_model=schemas.BatchRead)
+async def update_batch(
+    batch_id: str, payload: schemas.BatchUpdate, db: AsyncSession = Depends(get_async_db)
+):
+    obj = await db.get(models.Batch, batch_id)
+    if not obj:
+        raise HTTPException(status_code=404, detail="Batch no encontrado")
+    for k, v in payload.model_dump(exclude_unset=True).items():
+        setattr(obj, k, v)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Batch duplicado")
+    entity_cache.batches.invalidate(batch_id)
+    await db.refresh(obj)
+    return obj
+
+
+@router.delete("/{batch_id}", status_code=204)
+async def delete_batch(batch_id: str, db: AsyncSession = Depends(get_async_db)):
+    obj = await db.get(models.Batch, batch_id)
+    if not obj or not obj.is_active:
+        raise HTTPException(status_code=404, detail="Batch no encontrado")
+    obj.is_active = False
+    await db.commit()
+    entity_cache.batches.invalidate(batch_id)
+    return None
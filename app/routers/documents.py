@@ -2,10 +2,9 @@
 from __future__ import annotations
 
 import json
-import os
-import uuid
+import mimetypes
 from datetime import date
-from typing import List, Optional
+from typing import Callable, List, Literal, Optional, Tuple, TypeVar
 from uuid import UUID
 
 from fastapi import (
@@ -13,33 +12,166 @@ from fastapi import (
     Depends,
     File,
     Form,
+    Header,
     HTTPException,
     Query,
+    Request,
+    Response,
     UploadFile,
 )
+from sqlalchemy import and_, or_, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app.database import get_db
-from app import models, schemas
+from app import entity_cache, extra_index, models, resumable, schemas, search
+from app import tags as tag_index
+from app.pagination import decode_cursor, encode_cursor
+from app.serialization import RowSerializer
+from app.storage import Storage, get_storage, release
+from app.timing import ServerTiming
+from app.uploads import SpooledUpload, safe_filename, spool_upload
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 
-# --- Opcional: guardado efímero del archivo en disco (Render es efímero) ---
-UPLOAD_DIR = "/tmp/uploads"
+T = TypeVar("T")
 
-def _save_upload_temporarily(file: UploadFile) -> str:
+# listados: columnas como tuplas -> JSON sin pasar por modelos Pydantic
+DOCUMENT_ROWS = RowSerializer(schemas.DocumentOut)
+
+
+async def _store_upload(
+    db: Session,
+    store: Storage,
+    file: UploadFile,
+    timing: ServerTiming,
+    stage: str,
+    persist: Callable[[SpooledUpload, str], Optional[T]],
+) -> Optional[T]:
+    """
+    Spoolea ``file`` (SHA-256 incremental, memoria acotada) en el filesystem
+    del storage, lo publica y llama a ``persist(spool, clave)`` fuera del
+    event loop.
+    """
+    with await spool_upload(file, directory=store.spool_dir) as spool:
+        for stage_name, seconds in spool.timings.items():
+            timing.add(stage_name, seconds)
+        if not spool.size_bytes:
+            raise HTTPException(status_code=400, detail="Archivo vacío")
+        return await run_in_threadpool(_save_and_persist, db, store, spool, timing, stage, persist)
+
+
+def _save_and_persist(
+    db: Session,
+    store: Storage,
+    spool: SpooledUpload,
+    timing: ServerTiming,
+    stage: str,
+    persist: Callable[[SpooledUpload, str], Optional[T]],
+) -> Optional[T]:
+    """
+    Guarda el archivo y confirma la fila que lo referencia con la clave
+    retenida (``store.hold``): un ``release`` concurrente no puede borrar un
+    archivo ya existente entre el ``save`` que lo reutiliza y el commit. Si
+    ``persist`` falla o devuelve None, el archivo recién guardado se libera.
+    """
+    key, created, result = None, False, None
+    try:
+        # los backends guardan por contenido: la clave sale del checksum
+        with store.hold(spool.checksum):
+            with timing.stage("upload"):
+                key, created = store.save(spool)
+            with timing.stage(stage):
+                result = persist(spool, key)
+    finally:
+        # ya sin el lock: release toma el exclusivo de la misma clave
+        if created and result is None:
+            release(db, store, key)
+    return result
+
+
+def _version_row(spool: SpooledUpload, key: str, document_id: UUID, version: int, note: Optional[str]):
+    return models.DocumentVersion(
+        document_id=document_id,
+        version=version,
+        storage_path=key,
+        checksum=spool.checksum,
+        size_bytes=spool.size_bytes,
+        mime_type=spool.mime_type,
+        note=note,
+    )
+
+
+def _parse_fields(tags: str, extra: str) -> Tuple[List[str], dict]:
+    # Parseo/normalización de tags
+    tag_list = [t.strip() for t in tags.split(",") if t.strip()]
+
+    # Parseo de extra (JSON)
+    try:
+        extra_obj = json.loads(extra) if isinstance(extra, str) else (extra or {})
+        if not isinstance(extra_obj, dict):
+            raise ValueError("extra debe ser un objeto JSON")
+    except Exception:
+        raise HTTPException(status_code=422, detail="Campo 'extra' no es JSON válido (objeto)")
+    return tag_list, extra_obj
+
+
+def _persist_document(
+    db: Session,
+    doc: models.Document,
+    spool: SpooledUpload,
+    key: str,
+    upload: Optional[models.UploadSession] = None,
+) -> models.Document:
+    """
+    Inserta el documento y su v1. Con ``upload`` la sesión reanudable se
+    cierra en la misma transacción.
+    """
+    try:
+        db.add(doc)
+        db.flush()
+        db.add(_version_row(spool, key, doc.id, 1, doc.note))
+        if upload is not None:
+            resumable.claim(db, upload)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    db.refresh(doc)
+    return doc
+
+
+def _persist_version(
+    db: Session,
+    document_id: UUID,
+    spool: SpooledUpload,
+    key: str,
+    note: Optional[str],
+    upload: Optional[models.UploadSession] = None,
+) -> Optional[int]:
     """
-    Guarda el archivo en /tmp/uploads y devuelve la ruta.
-    Útil para depurar. En producción, reemplazar por S3/Backblaze/etc.
+    Reserva el próximo número e inserta la versión en la misma transacción:
+    el UPDATE bloquea la fila del documento, así que altas concurrentes
+    reciben números distintos. None si el documento no existe. Con
+    ``upload`` la sesión reanudable se cierra en la misma transacción.
     """
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
-    safe_name = f"{uuid.uuid4()}_{file.filename}".replace(os.sep, "_")
-    dest_path = os.path.join(UPLOAD_DIR, safe_name)
-    with open(dest_path, "wb") as out:
-        out.write(file.file.read())
-    # reset pointer por si alguien vuelve a leer
-    file.file.seek(0)
-    return dest_path
+    try:
+        version = db.execute(
+            update(models.Document)
+            .where(models.Document.id == document_id)
+            .values(current_version=models.Document.current_version + 1)
+            .returning(models.Document.current_version)
+        ).scalar()
+        if version is not None:
+            db.add(_version_row(spool, key, document_id, version, note))
+            if upload is not None:
+                resumable.claim(db, upload)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return version
 
 
 @router.post(
@@ -49,6 +181,7 @@ def _save_upload_temporarily(file: UploadFile) -> str:
     summary="Crear documento (multipart/form-data)",
 )
 async def create_document(
+    response: Response,
     file: UploadFile = File(..., description="Archivo PDF u otro"),
     title: str = Form(..., description="Título del documento"),
     category_id: int = Form(..., description="ID de categoría"),
@@ -57,26 +190,10 @@ async def create_document(
     extra: str = Form("{}", description="Objeto JSON en texto"),
     note: Optional[str] = Form(None, description="Nota opcional"),
     db: Session = Depends(get_db),
+    store: Storage = Depends(get_storage),
 ):
-    # Parseo/normalización de tags
-    tag_list = [t.strip() for t in tags.split(",") if t.strip()]
-
-    # Parseo de extra (JSON)
-    try:
-        extra_obj = json.loads(extra) if isinstance(extra, str) else (extra or {})
-        if not isinstance(extra_obj, dict):
-            raise ValueError("extra debe ser un objeto JSON")
-    except Exception:
-        raise HTTPException(status_code=422, detail="Campo 'extra' no es JSON válido (objeto)")
-
-    # (Opcional) Guardar temporalmente el archivo para auditar
-    # En producción, reemplazar por servicio de storage y guardar solo la URL/clave.
-    try:
-        _ = _save_upload_temporarily(file)
-    except Exception as e:
-        # No bloquea la creación del registro si falla el guardado efímero
-        # pero podés cambiar esto si querés hacerlo obligatorio.
-        print(f"[WARN] No se pudo guardar temporalmente el archivo: {e}")
+    timing = ServerTiming()
+    tag_list, extra_obj = _parse_fields(tags, extra)
 
     # Crear entidad
     doc = models.Document(
@@ -90,22 +207,43 @@ async def create_document(
         current_version=1,
     )
 
-    db.add(doc)
-    db.commit()
-    db.refresh(doc)
+    # Archivo al storage (v1) y alta, fuera del event loop: esperar una
+    # conexión del pool no frena otros requests
+    await _store_upload(
+        db, store, file, timing, "documents", lambda spool, key: _persist_document(db, doc, spool, key)
+    )
+    response.headers["Server-Timing"] = timing.header()
+    timing.log("create_document", doc_id=str(doc.id))
     return doc
 
 
+@router.get(
+    "/tags",
+    response_model=List[schemas.TagCount],
+    summary="Tags con cantidad de documentos (facetas)",
+)
+def list_tag_facets(
+    db: Session = Depends(get_db),
+    prefix: Optional[str] = Query(None, description="Solo tags que empiezan con este texto"),
+    limit: int = Query(50, ge=1, le=500),
+):
+    return db.execute(tag_index.facet_query(prefix, limit)).mappings().all()
+
+
 @router.get(
     "/{document_id}",
     response_model=schemas.DocumentOut,
     summary="Obtener documento por ID",
 )
 def get_document(document_id: UUID, db: Session = Depends(get_db)):
-    doc = db.query(models.Document).filter(models.Document.id == document_id).first()
-    if not doc:
+    def load():
+        doc = db.query(models.Document).filter(models.Document.id == document_id).first()
+        return schemas.DocumentOut.model_validate(doc).model_dump(mode="json") if doc else None
+
+    data = entity_cache.documents.get_or_load(str(document_id), load)
+    if not data:
         raise HTTPException(status_code=404, detail="Documento no encontrado")
-    return doc
+    return data
 
 
 @router.get(
@@ -114,15 +252,327 @@ def get_document(document_id: UUID, db: Session = Depends(get_db)):
     summary="Listar documentos (paginado)",
 )
 def list_documents(
+    request: Request,
     db: Session = Depends(get_db),
     limit: int = Query(20, ge=1, le=100, description="Cantidad a devolver"),
     offset: int = Query(0, ge=0, description="Desplazamiento para paginado"),
+    after: Optional[str] = Query(None, description="Cursor del header X-Next-Cursor (reemplaza a offset)"),
+    search_text: Optional[str] = Query(
+        None, alias="search", description="Texto completo en título, tags, nota y extra (por relevancia)"
+    ),
     status: Optional[str] = Query(None, description="Filtrar por estado, ej: 'vigente'"),
     category_id: Optional[int] = Query(None, description="Filtrar por categoría"),
+    tags: Optional[str] = Query(None, description="Tags separados por coma, ej: 'poes,qa'"),
+    tag_match: Literal["any", "all"] = Query("any", description="Alguno o todos los tags"),
 ):
     q = db.query(models.Document)
     if status:
         q = q.filter(models.Document.status == status)
     if category_id is not None:
         q = q.filter(models.Document.category_id == category_id)
-    return q.order_by(models.Document.date_ref.desc(), models.Document.id.desc()).limit(limit).offset(offset).all()
+    q = tag_index.filter_documents(q, tag_index.parse(tags), tag_match)
+    # extra.<clave>=[op.]valor sobre las claves promovidas
+    q = extra_index.filter_documents(q, extra_index.parse_filters(request.query_params.multi_items()))
+    if search.terms(search_text):
+        # por relevancia no hay keyset: se pagina con offset
+        if after:
+            raise HTTPException(status_code=400, detail="'after' no se combina con 'search': usá offset")
+        q = search.filter_ranked(q, db.get_bind().dialect.name, search_text)
+        q = q.with_entities(*DOCUMENT_ROWS.columns(models.Document))
+        return DOCUMENT_ROWS.response(q.limit(limit).offset(offset).all())
+    if after:
+        # keyset sobre (date_ref, id): seek en ix_documents_date_ref_id
+        raw_date, raw_id = decode_cursor(after, 2)
+        try:
+            last_date, last_id = date.fromisoformat(raw_date), UUID(raw_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+        q = q.filter(
+            or_(
+                models.Document.date_ref < last_date,
+                and_(models.Document.date_ref == last_date, models.Document.id < last_id),
+            )
+        )
+        offset = 0
+
+    # una fila extra indica si hay página siguiente
+    rows = (
+        q.with_entities(*DOCUMENT_ROWS.columns(models.Document))
+        .order_by(models.Document.date_ref.desc(), models.Document.id.desc())
+        .limit(limit + 1)
+        .offset(offset)
+        .all()
+    )
+    headers = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        headers = {
+            "X-Next-Cursor": encode_cursor(
+                last[DOCUMENT_ROWS.index("date_ref")], last[DOCUMENT_ROWS.index("id")]
+            )
+        }
+    return DOCUMENT_ROWS.response(rows, headers)
+
+
+@router.patch(
+    "/{document_id}",
+    response_model=schemas.DocumentOut,
+    summary="Actualizar parcialmente un documento",
+)
+def patch_document(document_id: UUID, payload: schemas.DocumentPatch, db: Session = Depends(get_db)):
+    doc = db.get(models.Document, document_id)
+    if not doc:
+        raise HTTPException(status_code=404, detail="Documento no encontrado")
+    for k, v in payload.model_dump(exclude_unset=True).items():
+        setattr(doc, k, v)
+    try:
+        # tags/extra: los triggers actualizan document_tags y document_extra_values
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=422, detail="Datos inválidos para el documento")
+    entity_cache.documents.invalidate(str(document_id))
+    db.refresh(doc)
+    return doc
+
+
+@router.get(
+    "/{document_id}/versions",
+    response_model=List[schemas.DocumentVersionOut],
+    summary="Versiones de un documento",
+)
+def list_versions(document_id: UUID, db: Session = Depends(get_db)):
+    return (
+        db.query(models.DocumentVersion)
+        .filter(models.DocumentVersion.document_id == document_id)
+        .order_by(models.DocumentVersion.version.desc())
+        .all()
+    )
+
+
+@router.post(
+    "/{document_id}/versions",
+    response_model=schemas.VersionAdded,
+    summary="Subir una nueva versión (multipart/form-data)",
+)
+async def add_version(
+    document_id: UUID,
+    response: Response,
+    file: UploadFile = File(..., description="Archivo de la nueva versión"),
+    note: Optional[str] = Form(None, description="Nota opcional"),
+    db: Session = Depends(get_db),
+    store: Storage = Depends(get_storage),
+):
+    timing = ServerTiming()
+    version = await _store_upload(
+        db, store, file, timing, "versions",
+        lambda spool, key: _persist_version(db, document_id, spool, key, note),
+    )
+    if version is None:
+        raise HTTPException(status_code=404, detail="Documento no encontrado")
+    entity_cache.documents.invalidate(str(document_id))
+    response.headers["Server-Timing"] = timing.header()
+    timing.log("add_version", doc_id=str(document_id))
+    return {"ok": True, "version": version}
+
+
+def _stored_version(db: Session, document_id: UUID, version: Optional[int]):
+    q = (
+        db.query(models.DocumentVersion, models.Document.title)
+        .join(models.Document, models.Document.id == models.DocumentVersion.document_id)
+        .filter(models.DocumentVersion.document_id == document_id)
+    )
+    if version is not None:
+        q = q.filter(models.DocumentVersion.version == version)
+    row = q.order_by(models.DocumentVersion.version.desc()).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Versión no encontrada")
+    return row
+
+
+@router.get(
+    "/{document_id}/file",
+    summary="Descargar el archivo (soporta Range y requests condicionales)",
+    response_class=Response,
+)
+def download_file(
+    document_id: UUID,
+    request: Request,
+    version: Optional[int] = Query(None, description="Versión (default: la última)"),
+    db: Session = Depends(get_db),
+    store: Storage = Depends(get_storage),
+):
+    ver, title = _stored_version(db, document_id, version)
+    ext = mimetypes.guess_extension(ver.mime_type or "") or ""
+    filename = f"{safe_filename(title)}-v{ver.version}{ext}"
+    return store.response(request, ver.storage_path, ver.mime_type, filename)
+
+
+@router.get(
+    "/{document_id}/download",
+    response_model=schemas.DownloadLink,
+    summary="Link de descarga (mismo formato que con Supabase)",
+)
+def download_link(
+    document_id: UUID,
+    request: Request,
+    version: Optional[int] = Query(None, description="Versión (default: la última)"),
+    db: Session = Depends(get_db),
+):
+    ver, _ = _stored_version(db, document_id, version)
+    url = request.url_for("download_file", document_id=str(document_id)).include_query_params(
+        version=ver.version
+    )
+    return {"url": str(url), "expires_in": None}
+
+
+# --------------------
+# Uploads reanudables (ver app/resumable.py). Las sesiones van en su propio
+# router: con Supabase se monta solo, junto a sus endpoints de finalizar.
+# --------------------
+uploads = APIRouter(prefix="/uploads")
+
+
+def _upload_out(session: models.UploadSession) -> dict:
+    return {
+        "id": session.id,
+        "filename": session.filename,
+        "size_bytes": session.size_bytes,
+        "offset": session.received_bytes,
+        "complete": session.received_bytes == session.size_bytes,
+        "expires_at": session.expires_at,
+    }
+
+
+@uploads.post(
+    "",
+    response_model=schemas.UploadSessionOut,
+    status_code=201,
+    summary="Iniciar un upload reanudable",
+)
+def create_upload(
+    payload: schemas.UploadSessionCreate,
+    db: Session = Depends(get_db),
+    store: Storage = Depends(get_storage),
+):
+    session = resumable.create(
+        db, store, safe_filename(payload.filename), payload.size_bytes, payload.mime_type, payload.checksum
+    )
+    return _upload_out(session)
+
+
+@uploads.get(
+    "/{upload_id}",
+    response_model=schemas.UploadSessionOut,
+    summary="Progreso de un upload reanudable",
+)
+def upload_progress(upload_id: UUID, response: Response, db: Session = Depends(get_db)):
+    session = resumable.get(db, upload_id)
+    response.headers.update(resumable.offset_header(session))
+    return _upload_out(session)
+
+
+@uploads.put(
+    "/{upload_id}",
+    response_model=schemas.UploadSessionOut,
+    summary="Enviar una parte (cuerpo crudo) a partir de offset",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/octet-stream": {"schema": {"type": "string", "format": "binary"}}},
+        }
+    },
+)
+async def upload_chunk(
+    upload_id: UUID,
+    request: Request,
+    response: Response,
+    offset: int = Query(..., ge=0, description="Offset confirmado (GET /documents/uploads/{id})"),
+    chunk_sha256: Optional[str] = Header(None, alias="X-Chunk-Sha256", description="SHA-256 de esta parte"),
+    db: Session = Depends(get_db),
+    store: Storage = Depends(get_storage),
+):
+    session = await resumable.append(db, store, upload_id, offset, request.stream(), chunk_sha256)
+    response.headers.update(resumable.offset_header(session))
+    return _upload_out(session)
+
+
+@uploads.delete("/{upload_id}", status_code=204, summary="Cancelar un upload reanudable")
+def cancel_upload(upload_id: UUID, db: Session = Depends(get_db), store: Storage = Depends(get_storage)):
+    resumable.close(db, store, resumable.get(db, upload_id))
+    return Response(status_code=204)
+
+
+router.include_router(uploads)
+
+
+@router.post(
+    "/uploads/{upload_id}/document",
+    response_model=schemas.DocumentOut,
+    status_code=201,
+    summary="Finalizar un upload reanudable como documento nuevo",
+)
+async def finish_upload_as_document(
+    upload_id: UUID,
+    title: str = Form(..., description="Título del documento"),
+    category_id: int = Form(..., description="ID de categoría"),
+    date_ref: date = Form(..., description="Fecha de referencia (YYYY-MM-DD)"),
+    tags: str = Form("", description="Tags separados por coma, ej: 'poes,enjuagadora,qa'"),
+    extra: str = Form("{}", description="Objeto JSON en texto"),
+    note: Optional[str] = Form(None, description="Nota opcional"),
+    db: Session = Depends(get_db),
+    store: Storage = Depends(get_storage),
+):
+    tag_list, extra_obj = _parse_fields(tags, extra)
+    doc = models.Document(
+        title=title,
+        category_id=category_id,
+        date_ref=date_ref,
+        tags=tag_list,
+        extra=extra_obj,
+        note=note,
+        status="vigente",
+        current_version=1,
+    )
+
+    def finish() -> None:
+        # si algo falla la sesión queda (con el archivo ya publicado) para reintentar
+        session, spool, key = resumable.complete(db, store, upload_id)
+        try:
+            _persist_document(db, doc, spool, key, upload=session)
+        except IntegrityError:
+            raise HTTPException(status_code=422, detail="Datos inválidos para el documento")
+        resumable.discard_data(store, upload_id)
+
+    await run_in_threadpool(finish)
+    return doc
+
+
+@router.post(
+    "/uploads/{upload_id}/version",
+    response_model=schemas.VersionAdded,
+    summary="Finalizar un upload reanudable como nueva versión de un documento",
+)
+async def finish_upload_as_version(
+    upload_id: UUID,
+    document_id: UUID = Form(..., description="Documento al que se agrega la versión"),
+    note: Optional[str] = Form(None, description="Nota opcional"),
+    db: Session = Depends(get_db),
+    store: Storage = Depends(get_storage),
+):
+    def finish() -> Optional[int]:
+        # antes de publicar el archivo: con un documento inexistente la sesión sigue intacta
+        if db.get(models.Document, document_id) is None:
+            return None
+        session, spool, key = resumable.complete(db, store, upload_id)
+        version = _persist_version(db, document_id, spool, key, note, upload=session)
+        if version is not None:
+            resumable.discard_data(store, upload_id)
+        return version
+
+    version = await run_in_threadpool(finish)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Documento no encontrado")
+    entity_cache.documents.invalidate(str(document_id))
+    return {"ok": True, "version": version}
@@ -1,15 +1,24 @@
 from __future__ import annotations
 
+import uuid
+
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import func, or_
+from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from app.database import get_db
-from app import models, schemas
+from app import entity_cache, models, schemas, search as text_search
+from app.bulk import BULK_CHUNK_SIZE, dialect_insert
+from app.pagination import decode_cursor, encode_cursor
+from app.serialization import RowSerializer
+from app.streaming import ndjson_response
 
 router = APIRouter()
 
+# listados: columnas como tuplas -> JSON sin pasar por modelos Pydantic
+MATERIAL_ROWS = RowSerializer(schemas.MaterialRead)
+
 
 @router.post("/", response_model=schemas.MaterialRead, status_code=201)
 def create_material(material: schemas.MaterialCreate, db: Session = Depends(get_db)):
@@ -24,32 +33,137 @@ def create_material(material: schemas.MaterialCreate, db: Session = Depends(get_
     return obj
 
 
+def _material_ids(db: Session, names) -> dict[str, str]:
+    rows = db.execute(
+        select(models.Material.name, models.Material.id).where(models.Material.name.in_(names))
+    )
+    return {name: id_ for name, id_ in rows}
+
+
+@router.post("/bulk", response_model=schemas.MaterialIdMap)
+def bulk_upsert_materials(payload: schemas.MaterialBulkUpsert, db: Session = Depends(get_db)):
+    """
+    Alta masiva por nombre: inserta los que no existen y, con
+    ``update_description``, actualiza la descripción de los existentes.
+    Devuelve el id de cada nombre recibido.
+    """
+    # último valor gana si el nombre viene repetido
+    items = {i.name: i for i in payload.items}
+    result = schemas.MaterialIdMap(ids={})
+    names = list(items)
+    updated_names: list[str] = []
+    for start in range(0, len(names), BULK_CHUNK_SIZE):
+        chunk = names[start:start + BULK_CHUNK_SIZE]
+        existing = {
+            name: description
+            for name, description in db.execute(
+                select(models.Material.name, models.Material.description).where(
+                    models.Material.name.in_(chunk)
+                )
+            )
+        }
+        fresh = [n for n in chunk if n not in existing]
+        stale = [
+            n for n in chunk
+            if payload.update_description
+            and n in existing
+            and items[n].description is not None
+            and items[n].description != existing[n]
+        ]
+        rows = fresh + stale
+        if rows:
+            stmt = dialect_insert(db, models.Material.__table__)
+            if stale:
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["name"], set_={"description": stmt.excluded.description}
+                )
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=["name"])
+            db.execute(stmt, [
+                {"id": str(uuid.uuid4()), "name": n, "description": items[n].description, "is_active": True}
+                for n in rows
+            ])
+        result.created += len(fresh)
+        result.updated += len(stale)
+        result.ids.update(_material_ids(db, chunk))
+        updated_names.extend(stale)
+    db.commit()
+    for name in updated_names:
+        entity_cache.materials.invalidate(result.ids[name])
+    return result
+
+
+@router.post("/resolve", response_model=schemas.MaterialIdMap)
+def resolve_materials(payload: schemas.MaterialResolve, db: Session = Depends(get_db)):
+    """Resuelve nombres de material a ids en una sola llamada."""
+    names = list(dict.fromkeys(payload.names))
+    result = schemas.MaterialIdMap(ids={})
+    for start in range(0, len(names), BULK_CHUNK_SIZE):
+        result.ids.update(_material_ids(db, names[start:start + BULK_CHUNK_SIZE]))
+    result.missing = [n for n in names if n not in result.ids]
+    return result
+
+
 @router.get("/{material_id}", response_model=schemas.MaterialRead)
 def get_material(material_id: str, db: Session = Depends(get_db)):
-    obj = db.get(models.Material, material_id)
-    if not obj:
+    def load():
+        obj = db.get(models.Material, material_id)
+        return schemas.MaterialRead.model_validate(obj).model_dump(mode="json") if obj else None
+
+    data = entity_cache.materials.get_or_load(material_id, load)
+    if not data:
         raise HTTPException(status_code=404, detail="Material no encontrado")
-    return obj
+    return data
+
+
+def materials_select(
+    dialect: str,
+    search: str | None,
+    is_active: bool | None,
+    after: str | None,
+    prefix: bool = False,
+):
+    """SELECT del listado (lo comparten el router sync y el async)."""
+    stmt = select(models.Material)
+    if search:
+        if prefix:
+            stmt = stmt.where(text_search.starts_with(dialect, models.Material.name, search))
+        else:
+            stmt = stmt.where(
+                text_search.contains(dialect, text_search.MATERIALS_TRGM, models.Material, search)
+            )
+    if is_active is not None:
+        stmt = stmt.where(models.Material.is_active == is_active)
+    if after:
+        # name es único: alcanza con seek sobre el índice de name
+        (last_name,) = decode_cursor(after, 1)
+        stmt = stmt.where(models.Material.name > last_name)
+    return stmt.order_by(models.Material.name)
 
 
 @router.get("/", response_model=list[schemas.MaterialRead])
 def list_materials(
     db: Session = Depends(get_db),
     search: str | None = Query(None, description="Filtro por nombre/descripcion"),
+    prefix: bool = Query(False, description="search solo como prefijo del nombre (lectores de código)"),
     is_active: bool | None = Query(True, description="Filtrar por activos"),
+    limit: int | None = Query(None, ge=1, le=1000, description="Tamaño de página"),
+    after: str | None = Query(None, description="Cursor del header X-Next-Cursor"),
+    stream: bool = Query(False, description="Responder NDJSON en streaming"),
 ):
-    q = db.query(models.Material)
-    if search:
-        pattern = f"%{search.lower()}%"
-        q = q.filter(
-            or_(
-                func.lower(models.Material.name).like(pattern),
-                func.lower(models.Material.description).like(pattern),
-            )
-        )
-    if is_active is not None:
-        q = q.filter(models.Material.is_active == is_active)
-    return q.order_by(models.Material.name).all()
+    stmt = materials_select(db.get_bind().dialect.name, search, is_active, after, prefix)
+    if stream:
+        return ndjson_response(stmt.limit(limit) if limit else stmt, schemas.MaterialRead)
+
+    stmt = stmt.with_only_columns(*MATERIAL_ROWS.columns(models.Material))
+    if limit is None:
+        return MATERIAL_ROWS.response(db.execute(stmt))
+    rows = db.execute(stmt.limit(limit + 1)).all()
+    headers = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers = {"X-Next-Cursor": encode_cursor(rows[-1][MATERIAL_ROWS.index("name")])}
+    return MATERIAL_ROWS.response(rows, headers)
 
 
 @router.put("/{material_id}", response_model=schemas.MaterialRead)
@@ -66,6 +180,7 @@ def update_material(
     except IntegrityError:
         db.rollback()
         raise HTTPException(status_code=409, detail="Material name duplicado")
+    entity_cache.materials.invalidate(material_id)
     db.refresh(obj)
     return obj
 
@@ -77,4 +192,5 @@ def delete_material(material_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Material no encontrado")
     obj.is_active = False
     db.commit()
+    entity_cache.materials.invalidate(material_id)
     return None
@@ -0,0 +1,124 @@
+"""
+Versión async del router de materials (``DB_ASYNC=true``): mismas rutas y
+respuestas, con ``AsyncSession`` en lugar de sesiones sync en el threadpool.
+"""
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_async_db
+from app import entity_cache, models, schemas
+from app.bulk import BULK_CHUNK_SIZE
+from app.pagination import encode_cursor
+from app.routers.materials import MATERIAL_ROWS, bulk_upsert_materials, materials_select
+from app.streaming import ndjson_response
+
+router = APIRouter()
+
+
+@router.post("/", response_model=schemas.MaterialRead, status_code=201)
+async def create_material(material: schemas.MaterialCreate, db: AsyncSession = Depends(get_async_db)):
+    obj = models.Material(**material.model_dump())
+    db.add(obj)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Material name duplicado")
+    await db.refresh(obj)
+    return obj
+
+
+@router.post("/bulk", response_model=schemas.MaterialIdMap)
+async def bulk_upsert_materials_async(
+    payload: schemas.MaterialBulkUpsert, db: AsyncSession = Depends(get_async_db)
+):
+    # mismo algoritmo por bloques que el router sync, sobre la conexión async
+    return await db.run_sync(lambda session: bulk_upsert_materials(payload, session))
+
+
+@router.post("/resolve", response_model=schemas.MaterialIdMap)
+async def resolve_materials(payload: schemas.MaterialResolve, db: AsyncSession = Depends(get_async_db)):
+    """Resuelve nombres de material a ids en una sola llamada."""
+    names = list(dict.fromkeys(payload.names))
+    result = schemas.MaterialIdMap(ids={})
+    for start in range(0, len(names), BULK_CHUNK_SIZE):
+        rows = await db.execute(
+            select(models.Material.name, models.Material.id).where(
+                models.Material.name.in_(names[start:start + BULK_CHUNK_SIZE])
+            )
+        )
+        result.ids.update({name: id_ for name, id_ in rows})
+    result.missing = [n for n in names if n not in result.ids]
+    return result
+
+
+@router.get("/{material_id}", response_model=schemas.MaterialRead)
+async def get_material(material_id: str, db: AsyncSession = Depends(get_async_db)):
+    async def load():
+        obj = await db.get(models.Material, material_id)
+        return schemas.MaterialRead.model_validate(obj).model_dump(mode="json") if obj else None
+
+    data = await entity_cache.materials.aget_or_load(material_id, load)
+    if not data:
+        raise HTTPException(status_code=404, detail="Material no encontrado")
+    return data
+
+
+@router.get("/", response_model=list[schemas.MaterialRead])
+async def list_materials(
+    db: AsyncSession = Depends(get_async_db),
+    search: str | None = Query(None, description="Filtro por nombre/descripcion"),
+    prefix: bool = Query(False, description="search solo como prefijo del nombre (lectores de código)"),
+    is_active: bool | None = Query(True, description="Filtrar por activos"),
+    limit: int | None = Query(None, ge=1, le=1000, description="Tamaño de página"),
+    after: str | None = Query(None, description="Cursor del header X-Next-Cursor"),
+    stream: bool = Query(False, description="Responder NDJSON en streaming"),
+):
+    stmt = materials_select(db.get_bind().dialect.name, search, is_active, after, prefix)
+    if stream:
+        # el streaming sigue usando su propia sesión sync (yield_per)
+        return ndjson_response(stmt.limit(limit) if limit else stmt, schemas.MaterialRead)
+
+    stmt = stmt.with_only_columns(*MATERIAL_ROWS.columns(models.Material))
+    if limit is None:
+        return MATERIAL_ROWS.response(await db.execute(stmt))
+    rows = (await db.execute(stmt.limit(limit + 1))).all()
+    headers = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers = {"X-Next-Cursor": encode_cursor(rows[-1][MATERIAL_ROWS.index("name")])}
+    return MATERIAL_ROWS.response(rows, headers)
+
+
+@router.put("/{material_id}", response_model=schemas.MaterialRead)
+async def update_material(
+    material_id: str, payload: schemas.MaterialUpdate, db: AsyncSession = Depends(get_async_db)
+):
+    obj = await db.get(models.Material, material_id)
+    if not obj:
+        raise HTTPException(status_code=404, detail="Material no encontrado")
+    for k, v in payload.model_dump(exclude_unset=True).items():
+        setattr(obj, k, v)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Material name duplicado")
+    entity_cache.materials.invalidate(material_id)
+    await db.refresh(obj)
+    return obj
+
+
+@router.delete("/{material_id}", status_code=204)
+async def delete_material(material_id: str, db: AsyncSession = Depends(get_async_db)):
+    obj = await db.get(models.Material, material_id)
+    if not obj or not obj.is_active:
+        raise HTTPException(status_code=404, detail="Material no encontrado")
+    obj.is_active = False
+    await db.commit()
+    entity_cache.materials.invalidate(material_id)
+    return None
@@ -0,0 +1,123 @@
+# app/schema_state.py
+"""
+Arranque idempotente y barato: una huella (SHA-256) del esquema que el
+código espera se guarda en ``schema_state`` después de sincronizar la base.
+En los arranques siguientes alcanza con leer esa fila; ``create_all``, los
+índices/triggers y las migraciones de Alembic solo corren si no coincide.
+
+La huella cubre el DDL de ``Base.metadata`` compilado para el dialecto, el
+código de los instaladores de índices y funciones (``search``, ``tags``,
+``extra_index``, ``versions``), la configuración que cambia su DDL
+(PROMOTED_EXTRA_KEYS, SEARCH_TS_CONFIG) y las revisiones de Alembic presentes.
+
+La sincronización corre bajo un lock (``pg_advisory_lock`` en Postgres, un
+``flock`` junto al archivo en SQLite) y vuelve a mirar la huella al
+obtenerlo, así varios workers que arrancan juntos no la repiten ni compiten.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from app import models
+from app.config import settings
+from app.database import Base
+
+STATE_KEY = "app"
+# pg_advisory_lock: entero arbitrario y fijo para esta app
+_PG_LOCK_ID = 0x5C4E_4D41
+_INSTALLERS = ("search.py", "tags.py", "extra_index.py", "versions.py")
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def fingerprint(engine: Engine) -> str:
+    h = hashlib.sha256()
+    dialect = engine.dialect
+    for table in Base.metadata.sorted_tables:
+        h.update(str(CreateTable(table).compile(dialect=dialect)).encode())
+        for index in sorted(table.indexes, key=lambda ix: ix.name or ""):
+            h.update(str(CreateIndex(index).compile(dialect=dialect)).encode())
+    for name in _INSTALLERS:
+        with open(os.path.join(_HERE, name), "rb") as fh:
+            h.update(fh.read())
+    h.update(f"{settings.PROMOTED_EXTRA_KEYS}|{settings.SEARCH_TS_CONFIG}".encode())
+    versions = os.path.join(_HERE, "alembic", "versions")
+    h.update("|".join(sorted(f for f in os.listdir(versions) if f.endswith(".py"))).encode())
+    return h.hexdigest()
+
+
+def stored(engine: Engine) -> Optional[str]:
+    """Huella guardada, o None si no hay (o todavía no existe la tabla)."""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(
+                select(models.SchemaState.fingerprint).where(models.SchemaState.key == STATE_KEY)
+            ).scalar()
+    except Exception:
+        return None
+
+
+def _store(engine: Engine, value: str) -> None:
+    table = models.SchemaState.__table__
+    with engine.begin() as conn:
+        conn.execute(table.delete().where(table.c.key == STATE_KEY))
+        conn.execute(table.insert().values(key=STATE_KEY, fingerprint=value))
+
+
+@contextmanager
+def _lock(engine: Engine) -> Iterator[None]:
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            conn.exec_driver_sql(f"SELECT pg_advisory_lock({_PG_LOCK_ID})")
+            try:
+                yield
+            finally:
+                conn.exec_driver_sql(f"SELECT pg_advisory_unlock({_PG_LOCK_ID})")
+                conn.commit()
+        return
+    database = engine.url.database
+    if engine.dialect.name != "sqlite" or not database or database == ":memory:":
+        yield
+        return
+    try:
+        import fcntl
+    except ImportError:  # pragma: no cover - Windows: sin lock entre procesos
+        yield
+        return
+    with open(f"{database}.schema-lock", "a") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def ensure(engine: Engine, sync: Callable[[], bool], force: bool = False) -> Dict[str, Any]:
+    """
+    Corre ``sync`` (migraciones, ``create_all``, índices) solo si la huella
+    guardada no coincide con la del código, o si ``force``. La huella se
+    guarda únicamente si ``sync`` devuelve True (todo se aplicó sin errores).
+    Devuelve ``{"fingerprint", "applied", "check_s", "ddl_s"}``.
+    """
+    start = time.perf_counter()
+    expected = fingerprint(engine)
+    current = None if force else stored(engine)
+    result: Dict[str, Any] = {"fingerprint": expected[:12], "applied": False, "ddl_s": 0.0}
+    if current != expected:
+        with _lock(engine):
+            # otro worker pudo haberlo hecho mientras esperábamos el lock
+            if force or stored(engine) != expected:
+                ddl_start = time.perf_counter()
+                if sync():
+                    _store(engine, expected)
+                result["applied"] = True
+                result["ddl_s"] = time.perf_counter() - ddl_start
+    result["check_s"] = time.perf_counter() - start - result["ddl_s"]
+    return result
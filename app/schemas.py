@@ -1,7 +1,7 @@
 # app/schemas.py
 from __future__ import annotations
 
-from datetime import date
+from datetime import date, datetime
 from typing import Any, Dict, List, Optional
 from uuid import UUID
 
@@ -32,11 +32,54 @@ class DocumentOut(BaseModel):
         from_attributes = True
 
 
+class DocumentVersionOut(BaseModel):
+    """Versión de un documento (router SQL: el archivo vive en el storage local)."""
+    version: int
+    checksum: str
+    size_bytes: int
+    mime_type: Optional[str] = None
+    note: Optional[str] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class VersionAdded(BaseModel):
+    ok: bool = True
+    version: int
+
+
+class DownloadLink(BaseModel):
+    """Link de descarga; ``expires_in`` es None cuando no vence (storage local)."""
+    url: str
+    expires_in: Optional[int] = None
+
+
+class UploadSessionCreate(BaseModel):
+    """Inicio de un upload reanudable (ver ``app/resumable.py``)."""
+    filename: str = Field(..., min_length=1, max_length=255)
+    size_bytes: int = Field(..., gt=0, description="Tamaño total del archivo")
+    mime_type: Optional[str] = Field(None, max_length=255)
+    checksum: Optional[str] = Field(
+        None, pattern=r"^[0-9a-fA-F]{64}$", description="SHA-256 del archivo completo (se verifica al finalizar)"
+    )
+
+
+class UploadSessionOut(BaseModel):
+    id: UUID
+    filename: str
+    size_bytes: int
+    offset: int = Field(..., description="Bytes confirmados: la próxima parte empieza acá")
+    complete: bool
+    expires_at: datetime
+
+
 # (Opcional) Si más adelante exponés una actualización parcial vía PATCH
 class DocumentPatch(BaseModel):
     """
-    Campos opcionales para actualizar parcialmente un documento.
-    No es usado por el POST multipart; sirve para futuros endpoints PATCH/PUT.
+    Campos opcionales para actualizar parcialmente un documento (PATCH).
+    ``current_version`` no se expone: lo asigna solo el alta de versiones.
     """
     title: Optional[str] = None
     category_id: Optional[int] = None
@@ -45,7 +88,6 @@ class DocumentPatch(BaseModel):
     extra: Optional[Dict[str, Any]] = None
     note: Optional[str] = None
     status: Optional[str] = None
-    current_version: Optional[int] = None
 
     class Config:
         from_attributes = True
@@ -64,6 +106,15 @@ class DocumentList(BaseModel):
         from_attributes = True
 
 
+class TagCount(BaseModel):
+    """Faceta de tags: cantidad de documentos por tag."""
+    tag: str
+    documents: int
+
+    class Config:
+        from_attributes = True
+
+
 # ---------------------------------------------------------------------
 # Material Schemas
 # ---------------------------------------------------------------------
@@ -94,6 +145,29 @@ class MaterialRead(MaterialBase):
         from_attributes = True
 
 
+class MaterialBulkItem(BaseModel):
+    name: str
+    description: Optional[str] = None
+
+
+class MaterialBulkUpsert(BaseModel):
+    items: List[MaterialBulkItem]
+    # Si es True, pisa la descripción de materiales existentes (cuando viene)
+    update_description: bool = False
+
+
+class MaterialResolve(BaseModel):
+    names: List[str]
+
+
+class MaterialIdMap(BaseModel):
+    """Mapa nombre -> id, junto con lo que se creó/actualizó o no se encontró."""
+    ids: Dict[str, str]
+    created: int = 0
+    updated: int = 0
+    missing: List[str] = Field(default_factory=list)
+
+
 # ---------------------------------------------------------------------
 # Batch Schemas
 # ---------------------------------------------------------------------
@@ -126,3 +200,29 @@ class BatchRead(BatchBase):
 
     class Config:
         from_attributes = True
+
+
+# ---------------------------------------------------------------------
+# Bulk Schemas
+# ---------------------------------------------------------------------
+
+class BulkRowIssue(BaseModel):
+    row: int
+    error: str
+
+
+class BulkReport(BaseModel):
+    """
+    Resultado de una carga masiva. ``issues`` detalla solo los primeros
+    problemas (rechazos y conflictos); los contadores son siempre exactos.
+    """
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0
+    rejected: int = 0
+    conflicts: int = 0
+    issues: List[BulkRowIssue] = Field(default_factory=list)
+
+    def add_issue(self, row: int, error: str, limit: int = 1000) -> None:
+        if len(self.issues) < limit:
+            self.issues.append(BulkRowIssue(row=row, error=error))
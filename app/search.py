@@ -0,0 +1,346 @@
+# app/search.py
+"""
+Búsqueda de texto completo sobre documentos: ``title``, ``tags``, ``note``
+y los valores de texto dentro de ``extra``.
+
+- SQLite: tabla FTS5 ``documents_fts`` mantenida por triggers sobre
+  ``documents`` y ordenada por ``bm25``.
+- Postgres: índice GIN sobre ``documents_search_vector(...)`` (función
+  IMMUTABLE, Postgres lo mantiene en cada INSERT/UPDATE) y la función
+  ``search_documents(query)`` para llamarla por RPC desde Supabase,
+  ordenada por ``ts_rank_cd``.
+
+Cada palabra de la búsqueda se toma como prefijo y todas tienen que
+aparecer ("mante bomba" encuentra "Mantenimiento de bombas").
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, cast, column, event, func, literal_column, or_, select, table, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import Connection, Engine
+
+from app import models
+from app.config import settings
+
+# Palabras a considerar por búsqueda (el resto se ignora)
+MAX_TERMS = 8
+
+_TERM = re.compile(r"[^\W_]+", re.UNICODE)
+_IDENTIFIER = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+
+def terms(query: Optional[str]) -> List[str]:
+    return _TERM.findall(query or "")[:MAX_TERMS]
+
+
+def fts5_query(query: Optional[str]) -> Optional[str]:
+    """Expresión MATCH de FTS5 (sin la columna ``doc_id``) o None si no hay palabras."""
+    words = terms(query)
+    if not words:
+        return None
+    return "{title tags note extra} : (" + " AND ".join(f'"{w}"*' for w in words) + ")"
+
+
+def tsquery(query: Optional[str]) -> Optional[str]:
+    """Texto para ``to_tsquery`` (``palabra:* & ...``) o None si no hay palabras."""
+    words = terms(query)
+    if not words:
+        return None
+    return " & ".join(f"{w}:*" for w in words)
+
+
+def _ts_config() -> str:
+    cfg = settings.SEARCH_TS_CONFIG.lower()
+    if not _IDENTIFIER.match(cfg):
+        raise RuntimeError(f"SEARCH_TS_CONFIG inválido: {settings.SEARCH_TS_CONFIG!r}")
+    return cfg
+
+
+# --------------------
+# SQLite (FTS5)
+# --------------------
+@dataclass(frozen=True)
+class FtsSpec:
+    """
+    Tabla FTS5 espejo de ``source``: ``key`` guarda el id de la fila y
+    ``columns`` mapea cada columna FTS a su expresión SQL (``{row}`` es
+    NEW/OLD en los triggers o el alias de la reconstrucción).
+    """
+
+    table: str
+    source: str
+    key: str
+    columns: Dict[str, str]
+    tokenize: str
+
+    def values(self, row: str) -> str:
+        exprs = [f"{row}.id"] + [e.format(row=row) for e in self.columns.values()]
+        return ", ".join(exprs)
+
+    @property
+    def insert(self) -> str:
+        return f"INSERT INTO {self.table} ({self.key}, {', '.join(self.columns)}) "
+
+    def triggers(self) -> Dict[str, str]:
+        # la clave queda indexada para borrar por MATCH en vez de recorrer la tabla
+        delete = (
+            f"DELETE FROM {self.table} WHERE {self.table} MATCH "
+            f"'{self.key}:\"' || OLD.id || '\"';"
+        )
+        insert = self.insert + "VALUES (" + self.values("NEW") + ");"
+        watched = ", ".join(["id"] + [c for c in self.columns])
+        return {
+            f"{self.table}_ai": f"AFTER INSERT ON {self.source} BEGIN {insert} END",
+            f"{self.table}_ad": f"AFTER DELETE ON {self.source} BEGIN {delete} END",
+            f"{self.table}_au": (
+                f"AFTER UPDATE OF {watched} ON {self.source} BEGIN {delete} {insert} END"
+            ),
+        }
+
+
+_JSON_TEXT = (
+    "(SELECT group_concat(value, ' ') FROM {func}("
+    "CASE WHEN json_valid({{row}}.{col}) THEN {{row}}.{col} END) WHERE type = 'text')"
+)
+
+DOCUMENTS_FTS = FtsSpec(
+    table="documents_fts",
+    source="documents",
+    key="doc_id",
+    columns={
+        "title": "{row}.title",
+        "tags": _JSON_TEXT.format(func="json_each", col="tags"),
+        "note": "{row}.note",
+        "extra": _JSON_TEXT.format(func="json_tree", col="extra"),
+    },
+    tokenize="unicode61 remove_diacritics 2",
+)
+SQLITE_TRIGGERS = DOCUMENTS_FTS.triggers()
+
+
+def _install_sqlite(conn: Connection, spec: FtsSpec) -> None:
+    conn.exec_driver_sql(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {spec.table} USING fts5("
+        f"{spec.key}, {', '.join(spec.columns)}, tokenize = '{spec.tokenize}')"
+    )
+    triggers = spec.triggers()
+    existing = {
+        name
+        for (name,) in conn.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?",
+            (spec.source,),
+        )
+    }
+    if set(triggers) <= existing:
+        return
+    # Sin triggers (tabla recién creada o recreada) el índice puede estar
+    # desfasado: se reconstruye completo una sola vez
+    for name, body in triggers.items():
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+        conn.exec_driver_sql(f"CREATE TRIGGER {name} {body}")
+    conn.exec_driver_sql(f"DELETE FROM {spec.table}")
+    conn.exec_driver_sql(
+        spec.insert + "SELECT " + spec.values("s") + f" FROM {spec.source} AS s"
+    )
+
+
+# --------------------
+# Postgres (tsvector + GIN)
+# --------------------
+def postgres_ddl() -> List[str]:
+    cfg = _ts_config()
+    return [
+        f"""
+        CREATE OR REPLACE FUNCTION documents_search_vector(title text, tags jsonb, note text, extra jsonb)
+        RETURNS tsvector LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT setweight(to_tsvector('{cfg}'::regconfig, coalesce(title, '')), 'A')
+                || setweight(jsonb_to_tsvector('{cfg}'::regconfig, coalesce(tags, '[]'::jsonb), '["string"]'), 'B')
+                || setweight(to_tsvector('{cfg}'::regconfig, coalesce(note, '')), 'C')
+                || setweight(jsonb_to_tsvector('{cfg}'::regconfig, coalesce(extra, '{{}}'::jsonb), '["string"]'), 'D')
+        $$
+        """,
+        f"""
+        CREATE OR REPLACE FUNCTION documents_tsquery(query text)
+        RETURNS tsquery LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT to_tsquery('{cfg}'::regconfig, query)
+        $$
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS ix_documents_search ON documents USING gin (
+            documents_search_vector(title, CAST(tags AS jsonb), note, CAST(extra AS jsonb))
+        )
+        """,
+        # Para Supabase (RPC): recibe el texto de tsquery() y devuelve por relevancia
+        """
+        CREATE OR REPLACE FUNCTION search_documents(query text)
+        RETURNS SETOF documents LANGUAGE sql STABLE AS $$
+            SELECT d.*
+            FROM documents AS d, documents_tsquery(query) AS q
+            WHERE documents_search_vector(d.title, CAST(d.tags AS jsonb), d.note, CAST(d.extra AS jsonb)) @@ q
+            ORDER BY ts_rank_cd(
+                documents_search_vector(d.title, CAST(d.tags AS jsonb), d.note, CAST(d.extra AS jsonb)), q
+            ) DESC, d.id DESC
+        $$
+        """,
+    ]
+
+
+# --------------------
+# Substring: materiales y batches (trigramas)
+# --------------------
+MATERIALS_TRGM = FtsSpec(
+    table="materials_trgm",
+    source="materials",
+    key="material_id",
+    columns={"name": "{row}.name", "description": "{row}.description"},
+    tokenize="trigram",
+)
+BATCHES_TRGM = FtsSpec(
+    table="batches_trgm",
+    source="batches",
+    key="batch_id",
+    columns={"batch_code": "{row}.batch_code"},
+    tokenize="trigram",
+)
+
+# El tokenizer trigram (y pg_trgm) necesita al menos 3 caracteres
+MIN_TRIGRAM = 3
+
+# Índices de prefijo (lectores de código); text_pattern_ops para LIKE 'x%' en Postgres
+_PREFIX_INDEXES = {
+    "materials": ("ix_materials_name_lower", "name"),
+    "batches": ("ix_batches_code_lower", "batch_code"),
+}
+
+
+def _trigram_postgres_ddl(source: str) -> List[str]:
+    spec = MATERIALS_TRGM if source == "materials" else BATCHES_TRGM
+    ddl = ["CREATE EXTENSION IF NOT EXISTS pg_trgm"]
+    for col in spec.columns:
+        ddl.append(
+            f"CREATE INDEX IF NOT EXISTS ix_{source}_{col}_trgm "
+            f"ON {source} USING gin (lower({col}) gin_trgm_ops)"
+        )
+    name, col = _PREFIX_INDEXES[source]
+    ddl.append(f"CREATE INDEX IF NOT EXISTS {name} ON {source} (lower({col}) text_pattern_ops)")
+    return ddl
+
+
+def _install_trigram_sqlite(conn: Connection, source: str) -> None:
+    _install_sqlite(conn, MATERIALS_TRGM if source == "materials" else BATCHES_TRGM)
+    name, col = _PREFIX_INDEXES[source]
+    conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {name} ON {source} (lower({col}))")
+
+
+SEARCH_TABLES = ("documents", "materials", "batches")
+
+
+def install(bind: Any, tables: Optional[List[str]] = None) -> None:
+    """
+    Crea (idempotente) los índices de búsqueda de ``tables`` (default:
+    todas las de SEARCH_TABLES) para el dialecto de ``bind`` (Engine o
+    Connection). En otros dialectos no hace nada.
+    """
+    if isinstance(bind, Engine):
+        with bind.begin() as conn:
+            install(conn, tables)
+        return
+    dialect = bind.dialect.name
+    for source in tables or SEARCH_TABLES:
+        if dialect == "sqlite":
+            if source == "documents":
+                _install_sqlite(bind, DOCUMENTS_FTS)
+            else:
+                _install_trigram_sqlite(bind, source)
+        elif dialect == "postgresql":
+            ddl = postgres_ddl() if source == "documents" else _trigram_postgres_ddl(source)
+            for stmt in ddl:
+                bind.exec_driver_sql(stmt)
+
+
+def _on_created(target: Any, connection: Connection, **kw: Any) -> None:
+    install(connection, [target.name])
+
+
+for _model in (models.Document, models.Material, models.Batch):
+    event.listen(_model.__table__, "after_create", _on_created)
+
+
+# --------------------
+# Consulta (router SQL)
+# --------------------
+def filter_ranked(query: Any, dialect: str, search: str) -> Any:
+    """
+    Restringe ``query`` (sobre ``models.Document``) a los documentos que
+    matchean ``search`` y la ordena por relevancia. Sin palabras útiles
+    devuelve ``query`` sin cambios.
+    """
+    D = models.Document
+    if dialect == "sqlite":
+        match = fts5_query(search)
+        if match is None:
+            return query
+        # pesos bm25 por columna: doc_id, title, tags, note, extra
+        fts = (
+            select(
+                column("doc_id"),
+                literal_column("bm25(documents_fts, 0.0, 10.0, 5.0, 2.0, 1.0)").label("rank"),
+            )
+            .select_from(table("documents_fts"))
+            .where(text("documents_fts MATCH :fts_match").bindparams(fts_match=match))
+            .subquery("fts")
+        )
+        return query.join(fts, fts.c.doc_id == D.id).order_by(fts.c.rank, D.id.desc())
+    if dialect == "postgresql":
+        tsq_text = tsquery(search)
+        if tsq_text is None:
+            return query
+        vector = func.documents_search_vector(
+            D.title, cast(D.tags, JSONB), D.note, cast(D.extra, JSONB)
+        )
+        tsq = func.documents_tsquery(tsq_text)
+        return query.filter(vector.op("@@")(tsq)).order_by(
+            func.ts_rank_cd(vector, tsq).desc(), D.id.desc()
+        )
+    raise HTTPException(status_code=501, detail=f"Búsqueda no soportada en {dialect}")
+
+
+def _fts_phrase(value: str) -> str:
+    return '"' + value.replace('"', '""') + '"'
+
+
+def contains(dialect: str, spec: FtsSpec, model: Any, value: str) -> Any:
+    """
+    Condición "alguna columna de ``spec`` contiene ``value``" (sin
+    distinguir mayúsculas). En SQLite usa la tabla de trigramas; en
+    Postgres el mismo LIKE de siempre, que ya resuelven los índices GIN
+    de pg_trgm. Con menos de MIN_TRIGRAM caracteres cae al LIKE.
+    """
+    cols = [getattr(model, c) for c in spec.columns]
+    if dialect == "sqlite" and len(value) >= MIN_TRIGRAM:
+        match = "{" + " ".join(spec.columns) + "} : " + _fts_phrase(value)
+        ids = (
+            select(column(spec.key))
+            .select_from(table(spec.table))
+            .where(text(f"{spec.table} MATCH :{spec.table}_match").bindparams(
+                **{f"{spec.table}_match": match}
+            ))
+        )
+        return model.id.in_(ids)
+    pattern = f"%{value.lower()}%"
+    return or_(*[func.lower(c).like(pattern) for c in cols])
+
+
+def starts_with(dialect: str, col: Any, value: str) -> Any:
+    """Condición ``lower(col)`` empieza con ``value``, resuelta con el índice de prefijo."""
+    v = value.lower()
+    if dialect == "postgresql":
+        escaped = v.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return func.lower(col).like(escaped + "%", escape="\\")
+    # rango [v, v con el último carácter + 1): seek sobre lower(col) en SQLite
+    return and_(func.lower(col) >= v, func.lower(col) < v[:-1] + chr(ord(v[-1]) + 1))
@@ -0,0 +1,80 @@
+# app/serialization.py
+"""
+Serialización rápida de listados.
+
+El camino normal de FastAPI valida cada fila contra el ``response_model``
+(objetos ORM -> modelos Pydantic), la vuelca a dict y la codifica con el
+``json`` de la stdlib. ``RowSerializer`` evita todo eso: la consulta trae
+solo las columnas del esquema como tuplas y un ``TypeAdapter`` precompilado
+(sobre un TypedDict con los mismos campos y tipos) las codifica a JSON en
+pydantic-core. Los datos vienen de la base, así que no se revalidan.
+
+Los endpoints mantienen su ``response_model``, de modo que el esquema
+OpenAPI no cambia; lo que devuelven es un ``Response`` ya codificado.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Type
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+from typing_extensions import TypedDict
+
+JSON = "application/json"
+
+
+def row_type(schema: Type[BaseModel]) -> Any:
+    """TypedDict con los campos (nombre y tipo) de ``schema``, en el mismo orden."""
+    return TypedDict(
+        f"{schema.__name__}Row",
+        {name: field.annotation for name, field in schema.model_fields.items()},
+    )
+
+
+class RowSerializer:
+    """
+    Codificador de listas de ``schema`` a partir de tuplas de columnas.
+    ``columns(model)`` da las columnas a seleccionar, en el orden de los campos.
+    """
+
+    def __init__(self, schema: Type[BaseModel]):
+        self.schema = schema
+        self.fields: List[str] = list(schema.model_fields)
+        self.row = row_type(schema)
+        self.adapter = TypeAdapter(List[self.row])
+
+    def columns(self, model: Any) -> List[Any]:
+        return [getattr(model, name) for name in self.fields]
+
+    def index(self, field: str) -> int:
+        return self.fields.index(field)
+
+    def dicts(self, rows: Iterable[Sequence[Any]]) -> List[Dict[str, Any]]:
+        fields = self.fields
+        return [dict(zip(fields, row)) for row in rows]
+
+    def dump(self, rows: Iterable[Sequence[Any]]) -> bytes:
+        return self.adapter.dump_json(self.dicts(rows))
+
+    def response(self, rows: Iterable[Sequence[Any]], headers: Optional[Dict[str, str]] = None) -> Response:
+        return Response(self.dump(rows), media_type=JSON, headers=headers)
+
+
+def envelope_adapter(schema: Type[BaseModel]) -> TypeAdapter:
+    """
+    ``TypeAdapter`` para un sobre (p. ej. ``{"items": [...], "total": ...}``)
+    cuyas listas de modelos se serializan como TypedDict: las claves que no
+    son campos (columnas extra, embeds de PostgREST) se omiten.
+    """
+    fields: Dict[str, Any] = {}
+    for name, field in schema.model_fields.items():
+        annotation = field.annotation
+        args = getattr(annotation, "__args__", ())
+        if getattr(annotation, "__origin__", None) in (list, List) and args and _is_model(args[0]):
+            annotation = List[row_type(args[0])]
+        fields[name] = annotation
+    return TypeAdapter(TypedDict(f"{schema.__name__}Envelope", fields))
+
+
+def _is_model(tp: Any) -> bool:
+    return isinstance(tp, type) and issubclass(tp, BaseModel)
@@ -0,0 +1,289 @@
+# app/storage.py
+"""
+Almacenamiento de archivos de documentos detrás de una interfaz chica
+(``Storage``): lo usa el router SQL de documentos, que es el que se monta
+cuando no hay Supabase (plantas on-prem, desarrollo).
+
+``LocalStorage`` guarda por contenido: la clave es el SHA-256 del archivo y
+vive en ``<raíz>/ab/cd/<sha256>``, así que el mismo archivo subido dos veces
+ocupa lugar una sola. Los uploads se spoolean en ``<raíz>/.tmp`` (mismo
+filesystem) y se publican con ``os.replace``: sin copias y sin archivos a
+medio escribir con su nombre final.
+
+Las descargas salen con ``FileResponse`` (``http.response.pathsend`` si el
+servidor lo soporta) y atienden ``Range`` de un solo rango (206 / 416, por
+bloques) y ``If-None-Match`` / ``If-Modified-Since`` (304). El ETag es el
+SHA-256, así que no cambia aunque el archivo se reescriba.
+
+Como varias versiones comparten archivo, ``release`` solo borra una clave
+que nadie referencia. Para que no la borre entre que ``save`` la encuentra
+y la fila que la referencia se confirma, quien guarda la retiene
+(``hold``, lock compartido) hasta el commit y ``release`` chequea y borra
+con el lock exclusivo de la misma clave.
+"""
+from __future__ import annotations
+
+import errno
+import os
+import re
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Callable, Dict, Iterator, Mapping, Optional, Tuple
+
+import anyio
+from fastapi import HTTPException, Request, Response
+from sqlalchemy.orm import Session
+from starlette.responses import FileResponse
+from starlette.types import Receive, Scope, Send
+
+from app import models
+from app.config import settings
+from app.uploads import SpooledUpload
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: sin lock entre procesos
+    fcntl = None  # type: ignore[assignment]
+
+
+class Storage(ABC):
+    """Backend de archivos: guarda uploads ya spooleados y arma su descarga."""
+
+    # carpeta donde conviene spoolear los uploads (None: UPLOAD_SPOOL_DIR)
+    spool_dir: Optional[str] = None
+
+    @abstractmethod
+    def save(self, spool: SpooledUpload) -> Tuple[str, bool]:
+        """Guarda el archivo; devuelve ``(clave, creado)`` (False si ya estaba)."""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool: ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None: ...
+
+    @abstractmethod
+    def response(self, request: Request, key: str, media_type: Optional[str], filename: str) -> Response:
+        """Respuesta HTTP con el contenido de ``key``."""
+
+    @contextmanager
+    def hold(self, key: str, exclusive: bool = False) -> Iterator[None]:
+        """
+        Lock sobre ``key`` entre procesos: compartido mientras se guarda y se
+        confirma la fila que la referencia, exclusivo para chequear y borrar.
+        Sin implementación, no hace nada.
+        """
+        yield
+
+
+_KEY = re.compile(r"^[0-9a-f]{64}$")
+
+
+def _fsync(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class LocalStorage(Storage):
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.spool_dir = os.path.join(self.root, ".tmp")
+        os.makedirs(self.spool_dir, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        if not _KEY.match(key):
+            raise ValueError(f"Clave de storage inválida: {key!r}")
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def save(self, spool: SpooledUpload) -> Tuple[str, bool]:
+        key = spool.checksum
+        dest = self.path(key)
+        if os.path.exists(dest):
+            return key, False
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        _fsync(spool.path)
+        try:
+            # mismo filesystem: el spool pasa a ser el objeto, sin copiarlo
+            os.replace(spool.path, dest)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            fd, tmp = tempfile.mkstemp(prefix="copy-", dir=self.spool_dir)
+            os.close(fd)
+            try:
+                shutil.copyfile(spool.path, tmp)
+                _fsync(tmp)
+                os.replace(tmp, dest)
+            except BaseException:
+                os.remove(tmp)
+                raise
+        return key, True
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    @contextmanager
+    def hold(self, key: str, exclusive: bool = False) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        # un archivo de lock por prefijo de la clave: a lo sumo 256, sin limpieza
+        self.path(key)  # valida la clave
+        os.makedirs(os.path.join(self.root, ".locks"), exist_ok=True)
+        with open(os.path.join(self.root, ".locks", key[:2]), "a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def response(self, request: Request, key: str, media_type: Optional[str], filename: str) -> Response:
+        path = self.path(key)
+        try:
+            stat_result = os.stat(path)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Archivo no encontrado en storage")
+        return file_response(request, path, stat_result, key, media_type, filename)
+
+
+def release(db: Session, store: Storage, key: str) -> None:
+    """
+    Borra ``key`` si ninguna versión ni upload reanudable sin finalizar lo
+    referencia (por contenido, varias versiones pueden compartir archivo).
+    Llamar sin transacción abierta (la consulta tiene que ver los commits
+    hechos hasta tomar el lock) y sin ``store.hold(key)`` tomado.
+    """
+    with store.hold(key, exclusive=True):
+        for column in (models.DocumentVersion.storage_path, models.UploadSession.storage_key):
+            if db.query(column).filter(column == key).first():
+                return
+        store.delete(key)
+
+
+# --------------------
+# Descargas: Range + condicionales
+# --------------------
+class FileRangeResponse(FileResponse):
+    """``FileResponse`` parcial (206): envía ``[start, end]`` por bloques."""
+
+    def __init__(self, path: str, start: int, end: int, stat_result: os.stat_result, **kwargs):
+        headers = dict(kwargs.pop("headers", None) or {})
+        headers["content-length"] = str(end - start + 1)
+        headers["content-range"] = f"bytes {start}-{end}/{stat_result.st_size}"
+        super().__init__(path, status_code=206, headers=headers, stat_result=stat_result, **kwargs)
+        self.start, self.end = start, end
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        remaining = 0 if scope["method"].upper() == "HEAD" else self.end - self.start + 1
+        if remaining:
+            async with await anyio.open_file(self.path, mode="rb") as file:
+                await file.seek(self.start)
+                while remaining:
+                    chunk = await file.read(min(self.chunk_size, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def _etags(header: str) -> set:
+    return {tag.strip().removeprefix("W/") for tag in header.split(",")}
+
+
+def _not_modified(headers: Mapping[str, str], etag: str, mtime: float) -> bool:
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = _etags(if_none_match)
+        return "*" in tags or etag in tags
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def byte_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    ``(inicio, fin)`` inclusivo de un header ``Range: bytes=...`` con un solo
+    rango. None si no hay, es inválido o pide varios rangos (se responde el
+    archivo completo); ``inicio >= size`` si no es satisfacible (416).
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, sep, last = header[len("bytes="):].strip().partition("-")
+    if not sep or (first and not first.isdigit()) or (last and not last.isdigit()) or not (first or last):
+        return None
+    if not first:
+        # sufijo: los últimos N bytes
+        suffix = int(last)
+        return (size, size) if suffix == 0 else (max(size - suffix, 0), size - 1)
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    end = int(last) if last else size - 1
+    return start, min(end, size - 1)
+
+
+def file_response(
+    request: Request,
+    path: str,
+    stat_result: os.stat_result,
+    etag: str,
+    media_type: Optional[str],
+    filename: str,
+) -> Response:
+    """Descarga de ``path`` con ETag fuerte ``etag``: 200, 206, 304 o 416."""
+    headers = {
+        "etag": f'"{etag}"',
+        "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "accept-ranges": "bytes",
+    }
+    if _not_modified(request.headers, headers["etag"], stat_result.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    size = stat_result.st_size
+    requested = byte_range(request.headers.get("range"), size)
+    if_range = request.headers.get("if-range")
+    if requested and if_range and if_range not in (headers["etag"], headers["last-modified"]):
+        requested = None  # el archivo cambió desde que el cliente empezó: va completo
+    kwargs = dict(media_type=media_type, filename=filename, headers=headers)
+    if requested is None:
+        return FileResponse(path, stat_result=stat_result, **kwargs)
+    start, end = requested
+    if start >= size:
+        return Response(status_code=416, headers={**headers, "content-range": f"bytes */{size}"})
+    return FileRangeResponse(path, start, end, stat_result, **kwargs)
+
+
+# --------------------
+# Backend configurado
+# --------------------
+BACKENDS: Dict[str, Callable[[], Storage]] = {
+    "local": lambda: LocalStorage(settings.STORAGE_LOCAL_DIR),
+}
+
+_storage: Optional[Storage] = None
+
+
+def get_storage() -> Storage:
+    """Backend de ``STORAGE_BACKEND`` (uno por proceso). Sirve como dependencia de FastAPI."""
+    global _storage
+    if _storage is None:
+        factory = BACKENDS.get(settings.STORAGE_BACKEND)
+        if factory is None:
+            raise RuntimeError(f"STORAGE_BACKEND desconocido: {settings.STORAGE_BACKEND!r}")
+        _storage = factory()
+    return _storage
@@ -0,0 +1,33 @@
+# app/streaming.py
+"""
+Respuestas NDJSON en streaming para listados grandes.
+
+La consulta se itera con ``yield_per`` (cursor server-side en Postgres), de
+modo que la memoria queda acotada al tamaño de bloque sin importar cuántas
+filas coincidan. Usa su propia sesión (sync): la del request se cierra
+antes de que termine de enviarse la respuesta.
+"""
+from __future__ import annotations
+
+from typing import Iterator, Type
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import Select
+
+from app.database import SessionLocal
+
+STREAM_BATCH_SIZE = 500
+
+
+def _iter_ndjson(stmt: Select, schema: Type[BaseModel]) -> Iterator[bytes]:
+    db = SessionLocal()
+    try:
+        for obj in db.scalars(stmt.execution_options(yield_per=STREAM_BATCH_SIZE)):
+            yield schema.model_validate(obj).model_dump_json().encode() + b"\n"
+    finally:
+        db.close()
+
+
+def ndjson_response(stmt: Select, schema: Type[BaseModel]) -> StreamingResponse:
+    return StreamingResponse(_iter_ndjson(stmt, schema), media_type="application/x-ndjson")
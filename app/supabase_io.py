@@ -0,0 +1,69 @@
+# app/supabase_io.py
+"""
+Acceso no bloqueante al SDK (sync) de Supabase.
+
+Las llamadas de red se ejecutan en un executor propio y acotado
+(``SUPABASE_MAX_WORKERS``) en lugar de bloquear el event loop. El cliente
+Supabase reutiliza sus sesiones httpx con keep-alive, de modo que todos los
+hilos comparten el mismo pool de conexiones.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from app import metrics
+from app.config import settings
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.SUPABASE_MAX_WORKERS,
+            thread_name_prefix="supabase",
+        )
+    return _executor
+
+
+def warm_up(client: Any) -> None:
+    """
+    Instancia una sola vez los sub-clientes de PostgREST y Storage para que
+    sus sesiones httpx (y conexiones keep-alive) se compartan entre hilos.
+    """
+    client.postgrest
+    client.storage
+
+
+async def _run(op: str, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    loop = asyncio.get_running_loop()
+    call = functools.partial(fn, *args, **kwargs)
+    if not settings.METRICS_ENABLED:
+        return await loop.run_in_executor(get_executor(), call)
+    # el tiempo incluye la espera en el executor: es lo que ve el request
+    with metrics.time_call(op):
+        return await loop.run_in_executor(get_executor(), call)
+
+
+async def run(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Ejecuta ``fn`` en el executor de Supabase y espera el resultado."""
+    return await _run(f"storage.{getattr(fn, '__name__', 'call')}", fn, *args, **kwargs)
+
+
+async def execute(builder: Any) -> Any:
+    """Atajo para ``await run(builder.execute)`` con builders de PostgREST."""
+    op = f"{getattr(builder, 'http_method', 'GET')} {getattr(builder, 'path', '?')}"
+    return await _run(op, builder.execute)
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
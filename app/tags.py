@@ -0,0 +1,222 @@
+# app/tags.py
+"""
+Índice invertido de ``Document.tags`` (columna JSON).
+
+``document_tags`` guarda una fila por (documento, tag normalizado) y
+``document_tag_counts`` la cantidad de documentos por tag. Ambas las
+mantienen triggers de la base sobre ``documents``, así que quedan al día
+con cualquier escritura: ORM, Supabase/PostgREST o SQL a mano.
+"""
+from __future__ import annotations
+
+from typing import Any, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import event, func, select
+from sqlalchemy.engine import Connection, Engine
+
+from app import models
+from app.database import Base
+
+# Tags por consulta (?tags=a,b,...)
+MAX_TAGS = 10
+# Largo de models.DocumentTag.tag
+TAG_LENGTH = 255
+
+
+def normalize(tag: str) -> str:
+    return tag.strip().lower()[:TAG_LENGTH]
+
+
+def parse(raw: Optional[str]) -> List[str]:
+    """``"POES, qa,,poes"`` -> ``["poes", "qa"]``."""
+    tags = list(dict.fromkeys(t for t in (normalize(x) for x in (raw or "").split(",")) if t))
+    if len(tags) > MAX_TAGS:
+        raise HTTPException(status_code=422, detail=f"Máximo {MAX_TAGS} tags por consulta")
+    return tags
+
+
+# Reconstrucción de conteos (con los triggers de conteo apagados)
+_REBUILD_COUNTS = (
+    "INSERT INTO document_tag_counts (tag, documents) "
+    "SELECT tag, count(*) FROM document_tags GROUP BY tag"
+)
+
+
+# --------------------
+# SQLite
+# --------------------
+def _sqlite_tag_rows(row: str) -> str:
+    return (
+        f"SELECT DISTINCT {row}.id, substr(lower(trim(value)), 1, {TAG_LENGTH}) "
+        f"FROM json_each(CASE WHEN json_valid({row}.tags) THEN {row}.tags END) "
+        "WHERE type = 'text' AND trim(value) <> ''"
+    )
+
+
+_SQLITE_INSERT = "INSERT OR IGNORE INTO document_tags (document_id, tag) " + _sqlite_tag_rows("NEW") + ";"
+_SQLITE_DELETE = "DELETE FROM document_tags WHERE document_id = OLD.id;"
+
+SQLITE_TRIGGERS = {
+    "document_tags_ai": f"AFTER INSERT ON documents BEGIN {_SQLITE_INSERT} END",
+    "document_tags_au": f"AFTER UPDATE OF id, tags ON documents BEGIN {_SQLITE_DELETE} {_SQLITE_INSERT} END",
+    "document_tags_ad": f"AFTER DELETE ON documents BEGIN {_SQLITE_DELETE} END",
+    "document_tag_counts_ai": (
+        "AFTER INSERT ON document_tags BEGIN "
+        "INSERT INTO document_tag_counts (tag, documents) VALUES (NEW.tag, 1) "
+        "ON CONFLICT (tag) DO UPDATE SET documents = documents + 1; END"
+    ),
+    "document_tag_counts_ad": (
+        "AFTER DELETE ON document_tags BEGIN "
+        "UPDATE document_tag_counts SET documents = documents - 1 WHERE tag = OLD.tag; END"
+    ),
+}
+
+_SQLITE_REBUILD = [
+    "DELETE FROM document_tags",
+    "DELETE FROM document_tag_counts",
+    "INSERT OR IGNORE INTO document_tags (document_id, tag) "
+    + _sqlite_tag_rows("d").replace("FROM json_each", "FROM documents AS d, json_each"),
+]
+
+
+def _install_sqlite(conn: Connection) -> None:
+    existing = {
+        name for (name,) in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+    }
+    if set(SQLITE_TRIGGERS) <= existing:
+        return
+    # Sin triggers el índice puede estar desfasado: se reconstruye sin
+    # triggers y los conteos salen de un GROUP BY
+    for name in SQLITE_TRIGGERS:
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+    for stmt in _SQLITE_REBUILD + [_REBUILD_COUNTS]:
+        conn.exec_driver_sql(stmt)
+    for name, body in SQLITE_TRIGGERS.items():
+        conn.exec_driver_sql(f"CREATE TRIGGER {name} {body}")
+
+
+# --------------------
+# Postgres
+# --------------------
+_PG_TAG_ROWS = f"""
+    SELECT DISTINCT {{row}}.id, left(lower(btrim(t)), {TAG_LENGTH})
+    FROM json_array_elements_text(
+        CASE WHEN json_typeof({{row}}.tags::json) = 'array' THEN {{row}}.tags::json ELSE '[]'::json END
+    ) AS t
+    WHERE btrim(t) <> ''
+"""
+
+POSTGRES_FUNCTIONS = [
+    f"""
+    CREATE OR REPLACE FUNCTION document_tags_sync() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP <> 'INSERT' THEN
+            DELETE FROM document_tags WHERE document_id = OLD.id;
+        END IF;
+        IF TG_OP <> 'DELETE' THEN
+            INSERT INTO document_tags (document_id, tag)
+            {_PG_TAG_ROWS.format(row="NEW")}
+            ON CONFLICT DO NOTHING;
+        END IF;
+        RETURN NULL;
+    END
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION document_tag_counts_sync() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO document_tag_counts (tag, documents) VALUES (NEW.tag, 1)
+            ON CONFLICT (tag) DO UPDATE SET documents = document_tag_counts.documents + 1;
+        ELSE
+            UPDATE document_tag_counts SET documents = documents - 1 WHERE tag = OLD.tag;
+        END IF;
+        RETURN NULL;
+    END
+    $$
+    """,
+]
+
+POSTGRES_TRIGGERS = {
+    "document_tags_ai": "AFTER INSERT ON documents FOR EACH ROW EXECUTE FUNCTION document_tags_sync()",
+    "document_tags_au": (
+        "AFTER UPDATE OF id, tags ON documents FOR EACH ROW "
+        "WHEN (OLD.id IS DISTINCT FROM NEW.id OR OLD.tags::jsonb IS DISTINCT FROM NEW.tags::jsonb) "
+        "EXECUTE FUNCTION document_tags_sync()"
+    ),
+    "document_tags_ad": "AFTER DELETE ON documents FOR EACH ROW EXECUTE FUNCTION document_tags_sync()",
+    "document_tag_counts_aid": (
+        "AFTER INSERT OR DELETE ON document_tags FOR EACH ROW EXECUTE FUNCTION document_tag_counts_sync()"
+    ),
+}
+
+
+def _install_postgres(conn: Connection) -> None:
+    for ddl in POSTGRES_FUNCTIONS:
+        conn.exec_driver_sql(ddl)
+    existing = {
+        name
+        for (name,) in conn.exec_driver_sql(
+            "SELECT tgname FROM pg_trigger WHERE NOT tgisinternal "
+            "AND tgrelid IN ('documents'::regclass, 'document_tags'::regclass)"
+        )
+    }
+    if set(POSTGRES_TRIGGERS) <= existing:
+        return
+    for name in POSTGRES_TRIGGERS:
+        table = "document_tags" if name.startswith("document_tag_counts") else "documents"
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name} ON {table}")
+    conn.exec_driver_sql("DELETE FROM document_tags")
+    conn.exec_driver_sql("DELETE FROM document_tag_counts")
+    conn.exec_driver_sql(
+        "INSERT INTO document_tags (document_id, tag) "
+        + _PG_TAG_ROWS.format(row="d").replace("FROM json_array", "FROM documents AS d, json_array")
+    )
+    conn.exec_driver_sql(_REBUILD_COUNTS)
+    for name, body in POSTGRES_TRIGGERS.items():
+        conn.exec_driver_sql(f"CREATE TRIGGER {name} {body}")
+    # PostgREST necesita ver la relación nueva para los embeds de Supabase
+    conn.exec_driver_sql("NOTIFY pgrst, 'reload schema'")
+
+
+def install(bind: Any) -> None:
+    """
+    Crea (idempotente) los triggers del índice de tags y, si faltaban,
+    reconstruye ``document_tags``/``document_tag_counts`` desde ``documents``.
+    """
+    if isinstance(bind, Engine):
+        with bind.begin() as conn:
+            install(conn)
+        return
+    if bind.dialect.name == "sqlite":
+        _install_sqlite(bind)
+    elif bind.dialect.name == "postgresql":
+        _install_postgres(bind)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _on_metadata_created(target: Any, connection: Connection, **kw: Any) -> None:
+    install(connection)
+
+
+# --------------------
+# Consulta (router SQL)
+# --------------------
+def filter_documents(query: Any, tags: List[str], match: str = "any") -> Any:
+    """Restringe ``query`` a documentos con alguno (``any``) o todos (``all``) los ``tags``."""
+    if not tags:
+        return query
+    T = models.DocumentTag
+    ids = select(T.document_id).where(T.tag.in_(tags))
+    if match == "all":
+        ids = ids.group_by(T.document_id).having(func.count() == len(tags))
+    return query.filter(models.Document.id.in_(ids))
+
+
+def facet_query(prefix: Optional[str], limit: int) -> Any:
+    C = models.DocumentTagCount
+    q = select(C.tag, C.documents).where(C.documents > 0)
+    if prefix:
+        q = q.where(C.tag.startswith(normalize(prefix), autoescape=True))
+    return q.order_by(C.documents.desc(), C.tag).limit(limit)
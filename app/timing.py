@@ -0,0 +1,60 @@
+# app/timing.py
+"""
+Tiempos por etapa de un request, para el header ``Server-Timing``
+(visible en la pestaña Network de devtools) y un log estructurado.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Dict, Iterator, TypeVar
+
+T = TypeVar("T")
+
+logger = logging.getLogger("app.timing")
+
+
+class ServerTiming:
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    async def measure(self, name: str, awaitable: Awaitable[T]) -> T:
+        """Espera ``awaitable`` midiendo su duración (sirve dentro de ``asyncio.gather``)."""
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def total(self) -> float:
+        return time.perf_counter() - self.start
+
+    def header(self) -> str:
+        """Valor de ``Server-Timing``: ``read;dur=1.2, upload;dur=80.4, total;dur=95.0`` (ms)."""
+        parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages.items()]
+        parts.append(f"total;dur={self.total() * 1000:.1f}")
+        return ", ".join(parts)
+
+    def log(self, event: str, **fields: Any) -> None:
+        """Registro estructurado (JSON en el mensaje y ``record.timing`` para handlers propios)."""
+        record = {
+            "event": event,
+            **fields,
+            "stages_ms": {name: round(s * 1000, 1) for name, s in self.stages.items()},
+            "total_ms": round(self.total() * 1000, 1),
+        }
+        logger.info(json.dumps(record, default=str), extra={"timing": record})
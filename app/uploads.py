@@ -0,0 +1,101 @@
+# app/uploads.py
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import BinaryIO, Dict, Optional, Tuple
+
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+
+SAFE_CHARS = re.compile(r"[^a-zA-Z0-9._-]+")
+
+
+def safe_filename(name: str) -> str:
+    name = (name or "").strip().replace(" ", "_")
+    return SAFE_CHARS.sub("_", name) or "archivo"
+
+
+@dataclass
+class SpooledUpload:
+    """
+    Archivo recibido y volcado a un temporal en disco, bloque a bloque.
+    ``checksum`` (SHA-256) y ``size_bytes`` se calculan durante la lectura,
+    así que nunca hay más de un bloque del archivo en memoria.
+    """
+    path: str
+    checksum: str
+    size_bytes: int
+    mime_type: str
+    # segundos acumulados por etapa: "read" (cuerpo), "sha256" y "spool" (disco)
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    def open(self) -> BinaryIO:
+        # BufferedReader: el SDK de Storage lo envía en streaming
+        return open(self.path, "rb")
+
+    def cleanup(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "SpooledUpload":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.cleanup()
+
+
+def _write_chunk(out: BinaryIO, hasher: "hashlib._Hash", chunk: bytes) -> Tuple[float, float]:
+    # hashlib libera el GIL con bloques grandes: corre bien en el threadpool
+    t0 = time.perf_counter()
+    hasher.update(chunk)
+    t1 = time.perf_counter()
+    out.write(chunk)
+    return t1 - t0, time.perf_counter() - t1
+
+
+async def spool_upload(
+    file: UploadFile, chunk_size: Optional[int] = None, directory: Optional[str] = None
+) -> SpooledUpload:
+    """
+    Lee ``file`` en bloques de ``chunk_size`` (por defecto
+    ``settings.UPLOAD_CHUNK_SIZE``), actualizando SHA-256 y tamaño de forma
+    incremental. El hash y la escritura se hacen fuera del event loop.
+    ``directory`` (por defecto ``UPLOAD_SPOOL_DIR``) permite spoolear en el
+    mismo filesystem que el storage y publicar el archivo sin copiarlo.
+    """
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+    hasher = hashlib.sha256()
+    size = 0
+    read_s = hash_s = write_s = 0.0
+    fd, path = tempfile.mkstemp(prefix="upload-", dir=directory or settings.UPLOAD_SPOOL_DIR or None)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                t0 = time.perf_counter()
+                chunk = await file.read(chunk_size)
+                read_s += time.perf_counter() - t0
+                if not chunk:
+                    break
+                size += len(chunk)
+                h, w = await run_in_threadpool(_write_chunk, out, hasher, chunk)
+                hash_s += h
+                write_s += w
+    except BaseException:
+        os.remove(path)
+        raise
+    return SpooledUpload(
+        path=path,
+        checksum=hasher.hexdigest(),
+        size_bytes=size,
+        mime_type=file.content_type or "application/octet-stream",
+        timings={"read": read_s, "sha256": hash_s, "spool": write_s},
+    )
@@ -0,0 +1,83 @@
+# app/versions.py
+"""
+Alta de versiones de documentos en una sola ida a la base (Postgres).
+
+``add_document_version(...)`` (llamada por RPC desde Supabase) reserva el
+próximo número con ``UPDATE documents SET current_version = current_version
++ 1 ... RETURNING`` e inserta la fila de ``document_versions`` en la misma
+transacción. El UPDATE toma el lock de la fila del documento, así que dos
+altas concurrentes sobre un mismo documento quedan en serie y reciben
+números distintos.
+
+Se llama recién con el objeto ya en Storage (subido o reutilizado): una
+versión visible, y por lo tanto candidata para dedup, siempre tiene su
+archivo, y si el upload falla no hay nada que deshacer en la base.
+
+En SQLite no se instala nada (las versiones solo se dan de alta vía Supabase).
+"""
+from __future__ import annotations
+
+from typing import Any, List
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+
+from app import models
+
+# Firmas anteriores (dedup dentro de la función, alta antes del upload)
+DROPPED_FUNCTIONS: List[str] = [
+    "DROP FUNCTION IF EXISTS add_document_version(uuid, text, text, bigint, text, text, boolean)",
+    "DROP FUNCTION IF EXISTS discard_document_version(uuid, integer)",
+]
+
+POSTGRES_FUNCTIONS: List[str] = [
+    """
+    CREATE OR REPLACE FUNCTION add_document_version(
+        p_document_id uuid,
+        p_storage_path text,
+        p_checksum text,
+        p_size_bytes bigint,
+        p_mime_type text DEFAULT NULL,
+        p_note text DEFAULT NULL
+    ) RETURNS TABLE (version integer)
+    LANGUAGE plpgsql AS $$
+    #variable_conflict use_column
+    DECLARE
+        v integer;
+    BEGIN
+        UPDATE documents SET current_version = current_version + 1, updated_at = now()
+        WHERE id = p_document_id
+        RETURNING current_version INTO v;
+        IF NOT FOUND THEN
+            RETURN;
+        END IF;
+        INSERT INTO document_versions
+            (id, document_id, version, storage_path, checksum, size_bytes, mime_type, note)
+        VALUES (
+            gen_random_uuid(), p_document_id, v, p_storage_path,
+            p_checksum, p_size_bytes, p_mime_type, p_note
+        );
+        RETURN QUERY SELECT v;
+    END
+    $$
+    """,
+]
+
+
+def install(bind: Any) -> None:
+    """Crea (idempotente) la función de alta de versiones en Postgres."""
+    if isinstance(bind, Engine):
+        with bind.begin() as conn:
+            install(conn)
+        return
+    if bind.dialect.name != "postgresql":
+        return
+    for ddl in DROPPED_FUNCTIONS + POSTGRES_FUNCTIONS:
+        bind.exec_driver_sql(ddl)
+    # PostgREST necesita recargar el esquema para exponer las funciones por RPC
+    bind.exec_driver_sql("NOTIFY pgrst, 'reload schema'")
+
+
+@event.listens_for(models.DocumentVersion.__table__, "after_create")
+def _on_created(target: Any, connection: Connection, **kw: Any) -> None:
+    install(connection)
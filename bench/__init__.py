@@ -0,0 +1,5 @@
+"""
+Benchmarks de la API: ``python -m bench.seed`` carga datos sintéticos y
+``python -m bench.run`` mide latencia (p50/p95/p99) y requests/s por
+escenario, comparando contra un baseline JSON guardado en ``bench/baselines``.
+"""
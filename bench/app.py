@@ -0,0 +1,12 @@
+# bench/app.py
+"""
+La app real sin Supabase: ``/documents`` lo sirve el router SQL con el
+storage local (``STORAGE_LOCAL_DIR``). Para medir con uvicorn:
+
+    SUPABASE_ENABLED=false uvicorn bench.app:app --workers 4
+"""
+import os
+
+os.environ.setdefault("SUPABASE_ENABLED", "false")
+
+from app.main import app  # noqa: E402,F401
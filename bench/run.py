@@ -0,0 +1,259 @@
+# bench/run.py
+"""
+Carga concurrente contra la API y reporte de latencias por escenario.
+
+    python -m bench.run                                  # in-process (ASGI), 16 workers
+    python -m bench.run --url http://127.0.0.1:8000      # contra uvicorn bench.app:app
+    python -m bench.run --save bench/baselines/local.json
+    python -m bench.run --compare bench/baselines/sqlite-small.json --tolerance 0.25
+
+Escenarios: ``create``, ``list``, ``get`` y ``search`` sobre ``materials``,
+``batches`` y ``documents`` (router SQL, montado sin Supabase). Los ids para
+``get`` salen de la misma ``DATABASE_URL`` (sembrada con ``bench.seed``).
+Cada escenario reporta p50/p95/p99 (ms), requests/s y errores.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+os.environ.setdefault("SUPABASE_ENABLED", "false")
+
+import httpx  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+
+from app import models  # noqa: E402
+
+DOCS = "/documents"
+
+# número de request único en toda la corrida (nombres y códigos de los create)
+_sequence = itertools.count()
+
+
+@dataclass
+class Request:
+    method: str
+    url: str
+    kwargs: Dict[str, Any]
+
+
+@dataclass
+class Scenario:
+    name: str
+    make: Callable[[random.Random, int], Request]
+    ok: tuple = (200, 201)
+
+
+def _sample_ids(limit: int = 2000) -> Dict[str, List[Any]]:
+    from app.database import SessionLocal
+
+    with SessionLocal() as db:
+        return {
+            "materials": list(db.scalars(select(models.Material.id).limit(limit))),
+            "batches": list(db.scalars(select(models.Batch.id).limit(limit))),
+            "documents": [str(i) for i in db.scalars(select(models.Document.id).limit(limit))],
+            "categories": list(db.scalars(select(models.Category.id))),
+            "codes": list(db.scalars(select(models.Batch.batch_code).limit(limit))),
+        }
+
+
+def scenarios(ids: Dict[str, List[Any]], run_id: str) -> List[Scenario]:
+    if not ids["materials"] or not ids["categories"]:
+        raise SystemExit("Base vacía: correr antes `python -m bench.seed`")
+    words = ("envase", "bomba", "valvula", "filtro", "preforma", "etiqueta")
+
+    def pick(key):
+        return lambda rng: rng.choice(ids[key])
+
+    material, batch, document = pick("materials"), pick("batches"), pick("documents")
+
+    return [
+        Scenario("materials.create", lambda rng, i: Request(
+            "POST", "/materials/", {"json": {"name": f"bench {run_id} {i}", "description": "bench"}})),
+        Scenario("materials.list", lambda rng, i: Request("GET", "/materials/", {"params": {"limit": 100}})),
+        Scenario("materials.get", lambda rng, i: Request("GET", f"/materials/{material(rng)}", {})),
+        Scenario("materials.search", lambda rng, i: Request(
+            "GET", "/materials/", {"params": {"search": rng.choice(words)[:4], "limit": 50}})),
+        Scenario("batches.create", lambda rng, i: Request("POST", "/batches/", {"json": {
+            "material_id": material(rng),
+            "batch_code": f"B-{run_id}-{i}",
+            "quantity": rng.randrange(1, 1000),
+            "production_date": str(date(2024, 1, 1) + timedelta(days=rng.randrange(365))),
+        }})),
+        Scenario("batches.list", lambda rng, i: Request("GET", "/batches/", {"params": {"limit": 100}})),
+        Scenario("batches.get", lambda rng, i: Request("GET", f"/batches/{batch(rng)}", {})),
+        Scenario("batches.search", lambda rng, i: Request(
+            "GET", "/batches/", {"params": {"batch_code": rng.choice(ids["codes"])[:6], "limit": 50}})),
+        Scenario("documents.create", lambda rng, i: Request("POST", DOCS, {
+            "data": {
+                "title": f"Bench {run_id} {i}",
+                "category_id": str(rng.choice(ids["categories"])),
+                "date_ref": "2024-01-01",
+                "tags": "bench,qa",
+            },
+            "files": {"file": ("bench.pdf", b"%PDF-1.4 " + os.urandom(2048), "application/pdf")},
+        })),
+        Scenario("documents.list", lambda rng, i: Request("GET", DOCS, {"params": {"limit": 20}})),
+        Scenario("documents.get", lambda rng, i: Request("GET", f"{DOCS}/{document(rng)}", {})),
+        Scenario("documents.search", lambda rng, i: Request(
+            "GET", DOCS, {"params": {"search": rng.choice(words), "limit": 20}})),
+    ]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+async def run_scenario(
+    client: httpx.AsyncClient, scenario: Scenario, requests: int, concurrency: int, seed: int
+) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    counter = itertools.count()
+
+    async def worker(n: int) -> None:
+        nonlocal errors
+        rng = random.Random(seed * 1000 + n)
+        while True:
+            if next(counter) >= requests:
+                return
+            req = scenario.make(rng, next(_sequence))
+            start = time.perf_counter()
+            try:
+                r = await client.request(req.method, req.url, **req.kwargs)
+                ok = r.status_code in scenario.ok
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            errors += not ok
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / wall, 1) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    ids = _sample_ids()
+    run_id = f"{int(time.time())}-{os.getpid()}"
+    selected = [s for s in scenarios(ids, run_id) if not args.only or any(s.name.startswith(o) for o in args.only)]
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=30)
+        app = None
+    else:
+        from bench.app import app
+
+        await app.router.startup()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=30)
+
+    results: Dict[str, Any] = {}
+    try:
+        async with client:
+            for scenario in selected:
+                # calentamiento: conexiones, cachés de planes y de la app
+                await run_scenario(client, scenario, min(args.warmup, args.requests), args.concurrency, args.seed)
+                results[scenario.name] = await run_scenario(
+                    client, scenario, args.requests, args.concurrency, args.seed
+                )
+                print(_fmt_row(scenario.name, results[scenario.name]), flush=True)
+    finally:
+        if app is not None:
+            await app.router.shutdown()
+
+    from app.database import DATABASE_URL, engine
+    from bench.seed import counts
+
+    return {
+        "meta": {
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "target": args.url or "in-process",
+            "database": engine.dialect.name,
+            "database_url": DATABASE_URL.split("@")[-1],
+            "python": platform.python_version(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "rows": counts(engine),
+        },
+        "results": results,
+    }
+
+
+def _fmt_row(name: str, r: Dict[str, Any]) -> str:
+    return (
+        f"{name:<20} {r['rps']:>9.1f} req/s  p50 {r['p50_ms']:>8.2f}  p95 {r['p95_ms']:>8.2f}  "
+        f"p99 {r['p99_ms']:>8.2f} ms  errores {r['errors']}"
+    )
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Escenarios con p95 o req/s peores que el baseline en más de ``tolerance`` (fracción)."""
+    regressions = []
+    for name, now in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        if base["p95_ms"] and now["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {base['p95_ms']} -> {now['p95_ms']} ms")
+        if base["rps"] and now["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: req/s {base['rps']} -> {now['rps']}")
+        if now["errors"] > base["errors"]:
+            regressions.append(f"{name}: errores {base['errors']} -> {now['errors']}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="API ya levantada (por defecto, la app in-process vía ASGI)")
+    parser.add_argument("--requests", type=int, default=500, help="requests medidos por escenario")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--only", action="append", help="prefijo de escenario, ej: batches o documents.get")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", help="guardar el resultado como JSON (baseline)")
+    parser.add_argument("--compare", help="baseline JSON contra el cual comparar")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="degradación admitida (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    if args.save:
+        with open(args.save, "w") as fh:
+            json.dump(report, fh, indent=2, sort_keys=True)
+            fh.write("\n")
+        print(f"Guardado en {args.save}")
+    if args.compare:
+        with open(args.compare) as fh:
+            regressions = compare(report, json.load(fh), args.tolerance)
+        for line in regressions:
+            print(f"REGRESIÓN {line}")
+        if regressions:
+            return 1
+        print(f"Sin regresiones respecto de {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
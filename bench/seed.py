@@ -0,0 +1,155 @@
+# bench/seed.py
+"""
+Carga datos sintéticos reproducibles (semilla fija) en ``DATABASE_URL``.
+
+    python -m bench.seed --scale full        # 10k materiales, 1M batches, 100k documentos
+    python -m bench.seed --materials 500 --batches 5000 --documents 1000
+
+Inserta con INSERT multi-fila por bloques, después de crear tablas, índices
+y triggers como en el arranque de la app (así FTS y trigramas quedan al día).
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import time
+import uuid
+from datetime import date, timedelta
+from typing import Dict
+
+os.environ.setdefault("SUPABASE_ENABLED", "false")
+
+from sqlalchemy import delete, func, insert, select  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+
+from app import models  # noqa: E402
+
+SCALES: Dict[str, Dict[str, int]] = {
+    "small": {"materials": 1_000, "batches": 20_000, "documents": 2_000},
+    "full": {"materials": 10_000, "batches": 1_000_000, "documents": 100_000},
+}
+CHUNK = 5_000
+
+WORDS = (
+    "envase pet tapa etiqueta carton film acero bomba valvula filtro resina "
+    "jarabe azucar gas preforma pallet caja botella lata aluminio lubricante"
+).split()
+CATEGORIES = ("POES", "Calidad", "Mantenimiento", "Produccion", "Seguridad")
+TAGS = ("poes", "qa", "haccp", "linea1", "linea2", "auditoria", "limpieza", "sanitizacion")
+
+
+def _name(rng: random.Random, i: int) -> str:
+    return f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {i:05d}"
+
+
+def reset(engine: Engine) -> None:
+    """Tablas, índices y triggers como en ``startup_event`` (con la base vacía)."""
+    from app.main import startup_event
+
+    startup_event()
+    with engine.begin() as conn:
+        for table in (models.DocumentVersion, models.Document, models.Category, models.Batch, models.Material):
+            conn.execute(delete(table))
+
+
+def seed(engine: Engine, materials: int, batches: int, documents: int, seed: int = 42) -> Dict[str, float]:
+    rng = random.Random(seed)
+    timings: Dict[str, float] = {}
+
+    start = time.perf_counter()
+    material_ids = []
+    rows = []
+    for i in range(materials):
+        mid = str(uuid.UUID(int=rng.getrandbits(128)))
+        material_ids.append(mid)
+        rows.append({"id": mid, "name": _name(rng, i), "description": rng.choice(WORDS), "is_active": True})
+    _insert_chunks(engine, models.Material.__table__, rows)
+    timings["materials"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    day0 = date(2022, 1, 1)
+    with engine.begin() as conn:
+        chunk = []
+        for i in range(batches):
+            chunk.append({
+                "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "material_id": material_ids[i % materials],
+                # (material, código) único: la "vuelta" sobre los materiales va en el código
+                "batch_code": f"L{i // materials:05d}-{rng.randrange(16 ** 4):04X}",
+                "quantity": rng.randrange(1, 10_000),
+                "production_date": day0 + timedelta(days=rng.randrange(1_000)),
+                "is_active": rng.random() > 0.05,
+            })
+            if len(chunk) >= CHUNK:
+                conn.execute(insert(models.Batch.__table__), chunk)
+                chunk = []
+        if chunk:
+            conn.execute(insert(models.Batch.__table__), chunk)
+    timings["batches"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(insert(models.Category.__table__), [{"name": c} for c in CATEGORIES])
+        category_ids = list(conn.execute(select(models.Category.id)).scalars())
+    rows = [
+        {
+            "id": uuid.UUID(int=rng.getrandbits(128)),
+            "title": f"{rng.choice(CATEGORIES)} {rng.choice(WORDS)} {rng.choice(WORDS)} {i}",
+            "category_id": rng.choice(category_ids),
+            "date_ref": day0 + timedelta(days=rng.randrange(1_000)),
+            "tags": rng.sample(TAGS, rng.randrange(0, 4)),
+            "extra": {"linea": rng.randrange(1, 6), "turno": rng.choice(("mañana", "tarde", "noche"))},
+            "note": " ".join(rng.choice(WORDS) for _ in range(8)),
+            "status": "vigente",
+            "current_version": 1,
+        }
+        for i in range(documents)
+    ]
+    _insert_chunks(engine, models.Document.__table__, rows)
+    timings["documents"] = time.perf_counter() - start
+
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE")
+    elif engine.dialect.name == "postgresql":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("ANALYZE")
+    return timings
+
+
+def _insert_chunks(engine: Engine, table, rows) -> None:
+    with engine.begin() as conn:
+        for start in range(0, len(rows), CHUNK):
+            conn.execute(insert(table), rows[start:start + CHUNK])
+
+
+def counts(engine: Engine) -> Dict[str, int]:
+    with engine.connect() as conn:
+        return {
+            m.__tablename__: conn.execute(select(func.count()).select_from(m)).scalar_one()
+            for m in (models.Material, models.Batch, models.Document)
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--materials", type=int)
+    parser.add_argument("--batches", type=int)
+    parser.add_argument("--documents", type=int)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    from app.database import DATABASE_URL, engine
+
+    volumes = {k: getattr(args, k) if getattr(args, k) is not None else v for k, v in SCALES[args.scale].items()}
+    print(f"Sembrando {DATABASE_URL}: {volumes}")
+    reset(engine)
+    timings = seed(engine, seed=args.seed, **volumes)
+    print("Tiempos (s):", {k: round(v, 1) for k, v in timings.items()})
+    print("Filas:", counts(engine))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import os
+
+os.environ.setdefault("SUPABASE_ENABLED", "false")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.database import Base, async_url, dispose_async_engine, engine
+from app.routers import batches_async, materials_async
+
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def client():
+    pytest.importorskip("aiosqlite")
+    # un solo event loop por test: el pool async no se comparte entre loops
+    app = FastAPI(on_shutdown=[dispose_async_engine])
+    app.include_router(materials_async.router, prefix="/materials")
+    app.include_router(batches_async.router, prefix="/batches")
+    with TestClient(app) as c:
+        yield c
+
+
+def test_async_url_maps_drivers():
+    assert async_url("sqlite:///./app.db") == "sqlite+aiosqlite:///./app.db"
+    assert async_url("postgres://u:p@h/db") == "postgresql+asyncpg://u:p@h/db"
+    assert async_url("postgresql+psycopg2://u@h/db") == "postgresql+asyncpg://u@h/db"
+
+
+def test_async_materials_batches_flow(client):
+    resp = client.post("/materials/", json={"name": "Steel", "description": "A"})
+    assert resp.status_code == 201, resp.text
+    mat = resp.json()
+    assert client.post("/materials/", json={"name": "Steel"}).status_code == 409
+
+    resp = client.post("/batches/", json={
+        "material_id": mat["id"], "batch_code": "B-001", "quantity": 5, "production_date": "2024-01-01",
+    })
+    assert resp.status_code == 201, resp.text
+    batch = resp.json()
+
+    body = '{"material_id": "%s", "batch_code": "B-002", "quantity": 1, "production_date": "2024-01-02"}\n' % mat["id"]
+    resp = client.post("/batches/bulk", content=body, headers={"content-type": "application/x-ndjson"})
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["inserted"] == 1
+
+    resp = client.get("/batches/", params={"limit": 1})
+    assert [b["batch_code"] for b in resp.json()] == ["B-002"]
+    assert resp.headers["X-Next-Cursor"]
+    assert client.get(f"/batches/{batch['id']}").json()["quantity"] == 5
+
+    resp = client.put(f"/materials/{mat['id']}", json={"description": "B"})
+    assert resp.json()["description"] == "B"
+    assert client.get(f"/materials/{mat['id']}").json()["description"] == "B"
+    assert client.post("/materials/resolve", json={"names": ["Steel", "Nope"]}).json()["missing"] == ["Nope"]
+    resp = client.post("/materials/bulk", json={"items": [{"name": "Steel"}, {"name": "Iron"}]})
+    assert resp.json()["created"] == 1 and resp.json()["ids"]["Steel"] == mat["id"]
+
+    assert client.delete(f"/batches/{batch['id']}").status_code == 204
+    assert [b["batch_code"] for b in client.get("/batches/").json()] == ["B-002"]
@@ -0,0 +1,97 @@
+import json
+import os
+
+os.environ.setdefault("SUPABASE_ENABLED", "false")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
+
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import Base, engine
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+client = TestClient(app)
+
+
+def test_bulk_csv_and_ndjson_with_conflict_policies():
+    mat_id = client.post("/materials/", json={"name": "PET"}).json()["id"]
+    client.post("/batches/", json={
+        "material_id": mat_id, "batch_code": "L-001", "quantity": 1, "production_date": "2024-01-01",
+    })
+
+    csv_body = "\n".join([
+        "material_id,batch_code,quantity,production_date",
+        f"{mat_id},L-001,10,2024-01-02",   # ya existe
+        f"{mat_id},L-002,20,2024-01-02",
+        f"{mat_id},L-002,21,2024-01-02",   # repetido en el archivo
+        f"{mat_id},L-003,-1,2024-01-02",   # quantity inválida
+        "no-existe,L-004,5,2024-01-02",
+    ])
+    resp = client.post("/batches/bulk", content=csv_body, headers={"Content-Type": "text/csv"})
+    assert resp.status_code == 200, resp.text
+    report = resp.json()
+    assert (report["inserted"], report["skipped"], report["conflicts"], report["rejected"]) == (1, 1, 1, 3)
+    assert sorted(i["row"] for i in report["issues"]) == [1, 3, 4, 5]
+
+    ndjson = "\n".join(json.dumps({
+        "material_id": mat_id, "batch_code": code, "quantity": 99, "production_date": "2024-02-01",
+    }) for code in ("L-001", "L-005"))
+    resp = client.post(
+        "/batches/bulk?on_conflict=fail", content=ndjson, headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert resp.status_code == 409
+    assert len(client.get("/batches/").json()) == 2  # nada insertado
+
+    resp = client.post(
+        "/batches/bulk?on_conflict=update", content=ndjson, headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert resp.json()["inserted"] == 1 and resp.json()["updated"] == 1
+    quantities = {b["batch_code"]: b["quantity"] for b in client.get("/batches/").json()}
+    assert quantities == {"L-001": 99, "L-002": 20, "L-005": 99}
+
+
+def test_bulk_counts_rows_lost_to_a_concurrent_insert(monkeypatch):
+    from datetime import date
+
+    from app import models
+    from app.database import SessionLocal
+    from app.routers import batches
+
+    mat_id = client.post("/materials/", json={"name": "PET"}).json()["id"]
+    real_insert = batches.dialect_insert
+    racing = []
+
+    def racing_insert(db, table):
+        # otro request da de alta el mismo batch después del SELECT de existentes
+        with SessionLocal() as other:
+            other.add(models.Batch(material_id=mat_id, batch_code=racing.pop(), quantity=1,
+                                   production_date=date(2024, 1, 1)))
+            other.commit()
+        return real_insert(db, table)
+
+    monkeypatch.setattr(batches, "dialect_insert", racing_insert)
+    headers = {"Content-Type": "application/x-ndjson"}
+
+    def body(*codes):
+        return "\n".join(json.dumps({
+            "material_id": mat_id, "batch_code": code, "quantity": 5, "production_date": "2024-02-01",
+        }) for code in codes)
+
+    racing.append("L-010")
+    report = client.post("/batches/bulk", content=body("L-010", "L-011"), headers=headers).json()
+    assert (report["inserted"], report["skipped"]) == (1, 1)
+
+    racing.append("L-020")
+    resp = client.post("/batches/bulk?on_conflict=fail", content=body("L-020", "L-021"), headers=headers)
+    assert resp.status_code == 409 and resp.json()["detail"]["conflicts"] == 1
+    codes = {b["batch_code"] for b in client.get("/batches/").json()}
+    assert codes == {"L-010", "L-011", "L-020"}  # L-021 no quedó
@@ -0,0 +1,39 @@
+import json
+import os
+
+os.environ.setdefault("SUPABASE_ENABLED", "false")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
+
+from app import storage
+from app.database import Base, engine
+from bench import run as bench_run
+from bench.seed import counts, reset, seed
+
+
+def test_seed_and_run_in_process(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "_storage", storage.LocalStorage(str(tmp_path / "files")))
+    reset(engine)
+    seed(engine, materials=20, batches=100, documents=10)
+    assert counts(engine) == {"materials": 20, "batches": 100, "documents": 10}
+
+    out = tmp_path / "baseline.json"
+    code = bench_run.main([
+        "--requests", "6", "--warmup", "0", "--concurrency", "2",
+        "--only", "materials.get", "--only", "batches.create", "--only", "documents",
+        "--save", str(out),
+    ])
+    assert code == 0
+    report = json.loads(out.read_text())
+    assert set(report["results"]) == {
+        "materials.get", "batches.create",
+        "documents.create", "documents.list", "documents.get", "documents.search",
+    }
+    for result in report["results"].values():
+        assert result["requests"] == 6 and result["errors"] == 0
+        assert result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"]
+
+    # contra sí mismo no hay regresiones; con el doble de latencia sí
+    assert bench_run.compare(report, report, 0.2) == []
+    slower = {"results": {k: {**v, "p95_ms": v["p95_ms"] * 2} for k, v in report["results"].items()}}
+    assert bench_run.compare(slower, report, 0.2)
+    Base.metadata.drop_all(bind=engine)
@@ -0,0 +1,83 @@
+import time
+
+from app.cache import TTLCache
+
+
+def test_ttl_cache_expires_and_evicts_lru():
+    cache = TTLCache(maxsize=2, ttl=0.05)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" pasa a ser el más reciente
+    cache.set("c", 3)           # desaloja "b"
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    assert cache.stats() == {"size": 1, "hits": 2, "misses": 2}
+
+
+class _DictRedis:
+    """Cliente mínimo con la interfaz de redis-py que usa RedisCache."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, px=None):
+        self.data[key] = value
+
+    def delete(self, *keys):
+        for k in keys:
+            self.data.pop(k, None)
+
+    def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+
+    def scan_iter(self, match):
+        return [k for k in self.data if k.startswith(match.rstrip("*"))]
+
+
+def test_tiered_cache_shares_entries_between_workers():
+    from app.cache import RedisCache, TieredCache
+
+    shared = _DictRedis()
+    worker_a = TieredCache(TTLCache(), RedisCache(shared, "urls"))
+    worker_b = TieredCache(TTLCache(), RedisCache(shared, "urls"))
+
+    worker_a.set("doc/v1", {"url": "https://x"})
+    assert worker_b.get("doc/v1") == {"url": "https://x"}
+    worker_a.clear()
+    assert shared.data == {}
+
+
+def test_tiered_cache_promotes_with_the_remaining_ttl():
+    from app.cache import RedisCache, TieredCache
+
+    shared = _DictRedis()  # no vence por px: el vencimiento viaja con el valor
+    worker_a = TieredCache(TTLCache(ttl=60), RedisCache(shared, "urls"))
+    worker_b = TieredCache(TTLCache(ttl=60), RedisCache(shared, "urls"))
+
+    worker_a.set("doc/v1", {"url": "https://x"}, ttl=0.05)
+    assert worker_b.get("doc/v1") == {"url": "https://x"}
+    time.sleep(0.06)
+    # la copia local de worker_b vence con la de Redis, no a los 60 s
+    assert worker_b.get("doc/v1") is None and worker_a.get("doc/v1") is None
+
+
+def test_entity_cache_version_counter_invalidates_other_workers():
+    from app.cache import EntityCache, RedisCache
+
+    shared = _DictRedis()
+    worker_a, worker_b = EntityCache("batches"), EntityCache("batches")
+    worker_a.shared = RedisCache(shared, "entity:batches")
+    worker_b.shared = RedisCache(shared, "entity:batches")
+
+    assert worker_a.get_or_load("b1", lambda: {"quantity": 1}) == {"quantity": 1}
+    assert worker_b.get_or_load("b1", lambda: {"quantity": 1}) == {"quantity": 1}
+    assert worker_b.stats()["hits"] == 1  # leído de la caché compartida
+
+    worker_a.invalidate("b1")
+    assert worker_b.get_or_load("b1", lambda: {"quantity": 2}) == {"quantity": 2}
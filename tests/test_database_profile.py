@@ -0,0 +1,20 @@
+from app.database import describe_engine, make_engine, pool_options
+
+
+def test_sqlite_file_engine_applies_wal_profile(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'perf.db'}")
+    try:
+        info = describe_engine(engine)
+        assert info["pool"] == "QueuePool" and info["size"] == 5
+        assert info["journal_mode"] == "wal"
+        assert info["synchronous"] == 1  # NORMAL
+        assert info["busy_timeout"] == 5000
+        assert info["cache_size"] == -65536
+    finally:
+        engine.dispose()
+
+
+def test_pool_options_skip_queue_settings_for_non_queue_pools():
+    assert "pool_size" not in pool_options("sqlite://")
+    assert "pool_size" not in pool_options("sqlite+aiosqlite:///./x.db")
+    assert pool_options("postgresql://u:p@db/app")["max_overflow"] == 10
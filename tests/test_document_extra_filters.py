@@ -0,0 +1,111 @@
+import os
+from datetime import date
+
+os.environ.setdefault("SUPABASE_ENABLED", "false")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
+os.environ.setdefault("PROMOTED_EXTRA_KEYS", "linea,turno,maquina")
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import extra_index, models  # noqa: F401 - extra_index instala los triggers en create_all
+from app.database import Base, SessionLocal, engine
+from app.routers import documents
+
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(documents.router)
+    return TestClient(app)
+
+
+def _seed():
+    with SessionLocal() as db:
+        cat = models.Category(name="POES")
+        db.add(cat)
+        db.flush()
+        extras = [
+            {"linea": 1, "turno": "mañana"},
+            {"linea": "3", "turno": "noche", "otro": "x"},
+            {"linea": 5.5, "maquina": {"no": "escalar"}},
+        ]
+        docs = [
+            models.Document(title=f"D{i}", category_id=cat.id, date_ref=date(2024, 1, 1), extra=e)
+            for i, e in enumerate(extras)
+        ]
+        db.add_all(docs)
+        db.commit()
+        return [str(d.id) for d in docs]
+
+
+def _titles(client, query):
+    r = client.get("/documents?" + query)
+    assert r.status_code == 200, r.text
+    return sorted(d["title"] for d in r.json())
+
+
+def test_equality_and_range_on_promoted_keys(client):
+    _seed()
+    assert _titles(client, "extra.linea=3") == ["D1"]
+    assert _titles(client, "extra.linea=gte.3") == ["D1", "D2"]
+    assert _titles(client, "extra.linea=gt.1&extra.linea=lt.5") == ["D1"]
+    assert _titles(client, "extra.turno=noche") == ["D1"]
+    assert _titles(client, "extra.maquina=escalar") == []
+
+    r = client.get("/documents?extra.otro=x")
+    assert r.status_code == 400
+
+
+def test_patch_keeps_extra_index_consistent(client):
+    ids = _seed()
+    r = client.patch(f"/documents/{ids[0]}", json={"extra": {"linea": 7, "turno": "tarde"}, "current_version": 9})
+    assert r.status_code == 200, r.text
+    # current_version no se toca por PATCH (la numeración es del alta de versiones)
+    assert r.json()["extra"] == {"linea": 7, "turno": "tarde"} and r.json()["current_version"] == 1
+
+    assert _titles(client, "extra.turno=mañana") == []
+    assert _titles(client, "extra.linea=gte.6") == ["D0"]
+
+
+NUMERIC_CASES = [
+    ("3", 3.0), ("-3", -3.0), ("2.5", 2.5), ("-0.5", -0.5), ("007", 7.0),
+    ("1.2.3", None), ("3.", None), (".5", None), ("1_0", None), ("1e3", None),
+    ("-", None), ("--1", None), ("", None), (" 3", None), ("inf", None), ("NaN", None),
+]
+
+
+@pytest.mark.parametrize("text, expected", NUMERIC_CASES)
+def test_numeric_text_is_detected_alike_everywhere(text, expected):
+    import re
+
+    # filtro (Python) y trigger de Postgres usan la misma regex
+    assert extra_index.number(text) == expected
+    assert bool(re.match(extra_index.NUMERIC_TEXT, text)) == (expected is not None)
+    assert f"~ '{extra_index.NUMERIC_TEXT}'" in extra_index.POSTGRES_FUNCTION
+
+    # trigger de SQLite: el valor de texto queda indexado como número solo si lo es
+    with SessionLocal() as db:
+        cat = models.Category(name="POES")
+        db.add(cat)
+        db.flush()
+        doc = models.Document(title="D", category_id=cat.id, date_ref=date(2024, 1, 1), extra={"linea": text})
+        db.add(doc)
+        db.commit()
+        stored = db.query(models.DocumentExtraValue.value_num).filter_by(document_id=doc.id, key="linea").scalar()
+    assert stored == expected
+
+
+def test_postgres_function_parses():
+    pglast = pytest.importorskip("pglast")
+    pglast.parse_sql(extra_index.POSTGRES_FUNCTION)
+    pglast.parse_plpgsql(extra_index.POSTGRES_FUNCTION)
@@ -0,0 +1,85 @@
+import os
+from datetime import date
+
+os.environ.setdefault("SUPABASE_ENABLED", "false")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import models, tags  # noqa: F401 - tags instala los triggers en create_all
+from app.database import Base, SessionLocal, engine
+from app.routers import documents
+
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(documents.router)
+    return TestClient(app)
+
+
+def _seed():
+    with SessionLocal() as db:
+        cat = models.Category(name="POES")
+        db.add(cat)
+        db.flush()
+        docs = [
+            models.Document(title="A", category_id=cat.id, date_ref=date(2024, 1, 1), tags=["POES", "qa"]),
+            models.Document(title="B", category_id=cat.id, date_ref=date(2024, 1, 2), tags=["poes"]),
+            models.Document(title="C", category_id=cat.id, date_ref=date(2024, 1, 3), tags=["Planta ", "qa"]),
+        ]
+        db.add_all(docs)
+        db.commit()
+        return [d.id for d in docs]
+
+
+def _titles(client, **params):
+    r = client.get("/documents", params=params)
+    assert r.status_code == 200, r.text
+    return sorted(d["title"] for d in r.json())
+
+
+def _facets(client, **params):
+    r = client.get("/documents/tags", params=params)
+    assert r.status_code == 200, r.text
+    return {f["tag"]: f["documents"] for f in r.json()}
+
+
+def test_tag_filter_any_all_and_facets_follow_writes(client):
+    ids = _seed()
+    assert _titles(client, tags="poes,qa") == ["A", "B", "C"]
+    assert _titles(client, tags="POES, qa", tag_match="all") == ["A"]
+    assert _titles(client, tags="planta") == ["C"]
+    assert _facets(client) == {"poes": 2, "qa": 2, "planta": 1}
+    assert _facets(client, prefix="p") == {"poes": 2, "planta": 1}
+
+    with SessionLocal() as db:
+        db.get(models.Document, ids[1]).tags = ["qa"]
+        db.delete(db.get(models.Document, ids[2]))
+        db.commit()
+
+    assert _titles(client, tags="qa") == ["A", "B"]
+    assert _facets(client) == {"poes": 1, "qa": 2}
+
+
+def test_install_rebuilds_tags_for_existing_rows():
+    _seed()
+    with engine.begin() as conn:
+        for name in tags.SQLITE_TRIGGERS:
+            conn.exec_driver_sql(f"DROP TRIGGER {name}")
+        conn.exec_driver_sql("DELETE FROM document_tags")
+
+    tags.install(engine)
+    with engine.connect() as conn:
+        counts = dict(conn.exec_driver_sql("SELECT tag, documents FROM document_tag_counts").all())
+    assert counts == {"poes": 2, "qa": 2, "planta": 1}
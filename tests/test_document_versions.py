@@ -0,0 +1,230 @@
+import asyncio
+import io
+import os
+import threading
+import time
+import types
+import uuid
+
+os.environ.setdefault("SUPABASE_ENABLED", "false")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
+
+import pytest
+from fastapi import HTTPException, Response
+from starlette.datastructures import UploadFile
+
+from app import main, versions
+from app.config import settings
+from app.timing import ServerTiming
+
+DELAY = 0.2
+
+
+class FakeRpc:
+    """Emula add_document_version: el lock es el de la fila del documento."""
+
+    def __init__(self, sb, name, params):
+        self.sb, self.name, self.params = sb, name, params
+        self.http_method, self.path = "POST", f"/rpc/{name}"
+
+    def execute(self):
+        p, sb = self.params, self.sb
+        sb.calls.append(self.name)
+        # la versión se publica recién con el objeto en Storage
+        assert p["p_storage_path"] in sb.files
+        with sb.lock:
+            time.sleep(DELAY)
+            doc = sb.documents.get(p["p_document_id"])
+            if doc is None:
+                return types.SimpleNamespace(data=[])
+            doc["current_version"] += 1
+            sb.versions.append({
+                "version": doc["current_version"], "storage_path": p["p_storage_path"],
+                "checksum": p["p_checksum"], "size_bytes": p["p_size_bytes"],
+            })
+            return types.SimpleNamespace(data=[{"version": doc["current_version"]}])
+
+
+class FakeQuery:
+    """select(...).eq(...).eq(...).limit(1) sobre documentos o versiones publicadas."""
+
+    def __init__(self, sb, name, rows):
+        self.sb, self.name, self.rows, self.filters = sb, name, rows, {}
+        self.http_method, self.path = "GET", f"/{name}"
+
+    def select(self, columns):
+        return self
+
+    def eq(self, column, value):
+        self.filters[column] = value
+        return self
+
+    def limit(self, n):
+        return self
+
+    def execute(self):
+        self.sb.calls.append(self.name)
+        rows = [v for v in self.rows if all(v[k] == val for k, val in self.filters.items())]
+        return types.SimpleNamespace(data=rows[:1])
+
+
+class FakeSupabase:
+    def __init__(self, fail_upload=False):
+        self.lock = threading.Lock()
+        self.documents = {}
+        self.versions = []
+        self.files = {}
+        self.orphans = []
+        self.calls = []
+        self.fail_upload = fail_upload
+        self.postgrest = types.SimpleNamespace(rpc=lambda name, params: FakeRpc(self, name, params))
+        self.storage = types.SimpleNamespace(from_=lambda bucket: types.SimpleNamespace(
+            upload=self.upload, remove=self.remove,
+        ))
+
+    def table(self, name):
+        if name == "storage_orphans":
+            return types.SimpleNamespace(upsert=lambda row: types.SimpleNamespace(
+                http_method="POST", path=f"/{name}", execute=lambda: self.orphans.append(row["storage_path"]),
+            ))
+        if name == "documents":
+            return FakeQuery(self, name, [{"id": k} for k in self.documents])
+        assert name == "document_versions"
+        return FakeQuery(self, name, self.versions)
+
+    def upload(self, path, file, file_options=None):
+        self.calls.append("upload")
+        time.sleep(DELAY)
+        if self.fail_upload:
+            return {"error": "bucket lleno"}
+        self.files[path] = file.read()
+        return {"Key": path}
+
+    def remove(self, paths):
+        for path in paths:
+            self.files.pop(path, None)
+
+
+@pytest.fixture
+def sb(monkeypatch):
+    fake = FakeSupabase()
+    monkeypatch.setattr(main, "sb", fake)
+    return fake
+
+
+def add_version(doc_id, payload=b"%PDF-1.4 v2"):
+    upload = UploadFile(file=io.BytesIO(payload), filename="poes.pdf")
+    return main._add_version(doc_id, None, upload, Response(), ServerTiming())
+
+
+def test_parallel_uploads_get_distinct_versions(sb, monkeypatch):
+    monkeypatch.setattr(settings, "DEDUP_UPLOADS", False)
+    doc_id = str(uuid.uuid4())
+    sb.documents[doc_id] = {"current_version": 1}
+
+    async def run():
+        start = time.perf_counter()
+        results = await asyncio.gather(*(add_version(doc_id, b"v%d" % i) for i in range(4)))
+        return results, time.perf_counter() - start
+
+    results, elapsed = asyncio.run(run())
+    assert sorted(r["version"] for r in results) == [2, 3, 4, 5]
+    assert sb.documents[doc_id]["current_version"] == 5
+    assert len(sb.files) == 4 and sb.calls.count("add_document_version") == 4
+    # uploads en paralelo y altas en serie por el lock: no 8 esperas seguidas
+    assert elapsed < DELAY * 7
+
+
+def test_dedup_reuses_published_objects_and_failures_leave_nothing(sb, monkeypatch):
+    monkeypatch.setattr(settings, "DEDUP_UPLOADS", True)
+    doc_id = str(uuid.uuid4())
+    sb.documents[doc_id] = {"current_version": 1}
+
+    assert asyncio.run(add_version(doc_id))["version"] == 2
+    assert asyncio.run(add_version(doc_id))["version"] == 3
+    assert sb.calls.count("upload") == 1 and len(sb.files) == 1
+    assert sb.versions[0]["storage_path"] == sb.versions[1]["storage_path"]
+
+    # documento inexistente: 404 antes de leer o subir el archivo
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(add_version(str(uuid.uuid4()), b"solo para este"))
+    assert exc.value.status_code == 404 and sb.calls[-1] == "documents"
+    assert sb.calls.count("upload") == 1 and len(sb.files) == 1
+
+    # documento borrado durante el upload: el objeto recién subido queda
+    # marcado para el barrido de huérfanos
+    gone = str(uuid.uuid4())
+    sb.documents[gone] = {"current_version": 1}
+    upload = sb.upload
+
+    def upload_and_delete(*args, **kwargs):
+        sb.documents.pop(gone)
+        return upload(*args, **kwargs)
+
+    monkeypatch.setattr(sb, "upload", upload_and_delete)
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(add_version(gone, b"solo para este"))
+    assert exc.value.status_code == 404 and len(sb.files) == 2
+    assert sb.orphans == [p for p in sb.files if p.startswith(gone)]
+    monkeypatch.setattr(sb, "upload", upload)
+
+    # upload fallido: no hay versión que deshacer ni número consumido
+    sb.fail_upload = True
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(add_version(doc_id, b"otro contenido"))
+    assert exc.value.status_code == 500
+    assert sb.calls[-1] == "upload"
+    assert [v["version"] for v in sb.versions] == [2, 3]
+    assert sb.documents[doc_id]["current_version"] == 3
+
+
+def test_postgres_function_parses():
+    pglast = pytest.importorskip("pglast")
+    for ddl in versions.DROPPED_FUNCTIONS + versions.POSTGRES_FUNCTIONS:
+        pglast.parse_sql(ddl)
+    for ddl in versions.POSTGRES_FUNCTIONS:
+        pglast.parse_plpgsql(ddl)
+
+
+@pytest.mark.skipif(not os.getenv("TEST_POSTGRES_URL"), reason="TEST_POSTGRES_URL no configurada")
+def test_postgres_function_allocates_distinct_versions():
+    asyncpg = pytest.importorskip("asyncpg")
+    url, schema = os.environ["TEST_POSTGRES_URL"], f"test_versions_{uuid.uuid4().hex[:8]}"
+
+    async def run():
+        admin = await asyncpg.connect(url)
+        await admin.execute(f"CREATE SCHEMA {schema}")
+        try:
+            conns = [await asyncpg.connect(url, server_settings={"search_path": schema}) for _ in range(4)]
+            await conns[0].execute(
+                """
+                CREATE TABLE documents (
+                    id uuid PRIMARY KEY, current_version integer NOT NULL, updated_at timestamptz
+                );
+                CREATE TABLE document_versions (
+                    id uuid PRIMARY KEY, document_id uuid NOT NULL REFERENCES documents(id),
+                    version integer NOT NULL, storage_path text NOT NULL, checksum text,
+                    size_bytes bigint, mime_type text, note text, UNIQUE (document_id, version)
+                );
+                """
+            )
+            for ddl in versions.POSTGRES_FUNCTIONS:
+                await conns[0].execute(ddl)
+            doc_id = uuid.uuid4()
+            await conns[0].execute("INSERT INTO documents (id, current_version) VALUES ($1, 1)", doc_id)
+
+            call = "SELECT * FROM add_document_version($1, $2, 'abc', 3)"
+            results = await asyncio.gather(*(c.fetch(call, doc_id, f"{doc_id}/{i}/f") for i, c in enumerate(conns)))
+            missing = await conns[0].fetch(call, uuid.uuid4(), "x/y/f")
+            current = await conns[0].fetchval("SELECT current_version FROM documents")
+            stored = await conns[0].fetchval("SELECT count(*) FROM document_versions")
+            for c in conns:
+                await c.close()
+            return sorted(r[0]["version"] for r in results), missing, current, stored
+        finally:
+            await admin.execute(f"DROP SCHEMA {schema} CASCADE")
+            await admin.close()
+
+    allocated, missing, current, stored = asyncio.run(run())
+    assert allocated == [2, 3, 4, 5] and current == 5 and stored == 4
+    assert missing == []
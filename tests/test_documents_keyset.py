@@ -0,0 +1,62 @@
+import os
+from datetime import date, timedelta
+
+os.environ.setdefault("SUPABASE_ENABLED", "false")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import models
+from app.database import Base, SessionLocal, engine
+from app.routers import documents
+
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def _seed(n):
+    with SessionLocal() as db:
+        cat = models.Category(name="POES")
+        db.add(cat)
+        db.flush()
+        for i in range(n):
+            db.add(models.Document(
+                title=f"Doc {i}",
+                category_id=cat.id,
+                # fechas repetidas para ejercitar el desempate por id
+                date_ref=date(2024, 1, 1) + timedelta(days=i // 3),
+            ))
+        db.commit()
+
+
+def test_keyset_pages_cover_all_documents_once():
+    _seed(10)
+    app = FastAPI()
+    app.include_router(documents.router)
+    client = TestClient(app)
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": 4}
+        if cursor:
+            params["after"] = cursor
+        r = client.get("/documents", params=params)
+        assert r.status_code == 200, r.text
+        seen.extend(d["id"] for d in r.json())
+        pages += 1
+        cursor = r.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert pages == 3
+    assert len(seen) == len(set(seen)) == 10
+
+    r = client.get("/documents", params={"after": "no-es-un-cursor"})
+    assert r.status_code == 400
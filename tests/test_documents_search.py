@@ -0,0 +1,93 @@
+import os
+from datetime import date
+
+os.environ.setdefault("SUPABASE_ENABLED", "false")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import models, search  # noqa: F401 - search instala FTS5 en create_all
+from app.database import Base, SessionLocal, engine
+from app.routers import documents
+
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(documents.router)
+    return TestClient(app)
+
+
+def _seed():
+    with SessionLocal() as db:
+        cat = models.Category(name="POES")
+        db.add(cat)
+        db.flush()
+        docs = [
+            models.Document(title="Mantenimiento de bombas", category_id=cat.id,
+                            date_ref=date(2024, 1, 1), tags=["planta"]),
+            models.Document(title="Limpieza de enjuagadora", category_id=cat.id,
+                            date_ref=date(2024, 1, 2), tags=["poes", "bombas"]),
+            models.Document(title="Registro diario", category_id=cat.id,
+                            date_ref=date(2024, 1, 3), note="Revisión de la bomba 3",
+                            extra={"equipo": {"linea": "Línea Envasado"}}),
+        ]
+        db.add_all(docs)
+        db.commit()
+        return [d.id for d in docs]
+
+
+def _titles(r):
+    assert r.status_code == 200, r.text
+    return [d["title"] for d in r.json()]
+
+
+def test_search_ranks_and_covers_tags_note_extra(client):
+    _seed()
+    # prefijo en todas las columnas; el título pesa más que tags y nota
+    assert _titles(client.get("/documents", params={"search": "bomba"})) == [
+        "Mantenimiento de bombas",
+        "Limpieza de enjuagadora",
+        "Registro diario",
+    ]
+    # valores anidados de extra, sin acentos
+    assert _titles(client.get("/documents", params={"search": "linea envasado"})) == ["Registro diario"]
+    assert _titles(client.get("/documents", params={"search": "bomba planta"})) == ["Mantenimiento de bombas"]
+
+    r = client.get("/documents", params={"search": "bomba", "after": "x"})
+    assert r.status_code == 400
+
+
+def test_search_index_follows_updates_and_deletes(client):
+    ids = _seed()
+    with SessionLocal() as db:
+        doc = db.get(models.Document, ids[0])
+        doc.title = "Calibración de balanza"
+        db.delete(db.get(models.Document, ids[1]))
+        db.commit()
+
+    assert _titles(client.get("/documents", params={"search": "bomba"})) == ["Registro diario"]
+    assert _titles(client.get("/documents", params={"search": "balanza"})) == ["Calibración de balanza"]
+
+
+def test_install_rebuilds_index_for_existing_rows():
+    _seed()
+    with engine.begin() as conn:
+        for name in search.SQLITE_TRIGGERS:
+            conn.exec_driver_sql(f"DROP TRIGGER {name}")
+        conn.exec_driver_sql("DELETE FROM documents_fts")
+
+    search.install(engine)
+    with engine.connect() as conn:
+        (n,) = conn.exec_driver_sql("SELECT count(*) FROM documents_fts").one()
+    assert n == 3
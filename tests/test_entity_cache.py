@@ -0,0 +1,40 @@
+import os
+
+os.environ.setdefault("SUPABASE_ENABLED", "false")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
+
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import Base, engine
+from app import entity_cache
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+client = TestClient(app)
+
+
+def test_get_material_is_cached_and_invalidated_on_update():
+    mat_id = client.post("/materials/", json={"name": "PET", "description": "A"}).json()["id"]
+    before = entity_cache.materials.stats()
+
+    assert client.get(f"/materials/{mat_id}").json()["description"] == "A"
+    assert client.get(f"/materials/{mat_id}").json()["description"] == "A"
+    after = entity_cache.materials.stats()
+    assert after["hits"] - before["hits"] == 1
+    assert after["misses"] - before["misses"] == 1
+
+    client.put(f"/materials/{mat_id}", json={"description": "B"})
+    assert client.get(f"/materials/{mat_id}").json()["description"] == "B"
+
+    client.delete(f"/materials/{mat_id}")
+    assert client.get(f"/materials/{mat_id}").json()["is_active"] is False
+    assert "entities" in client.get("/cache/stats").json()
@@ -0,0 +1,55 @@
+import json
+import os
+
+os.environ.setdefault("SUPABASE_ENABLED", "false")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
+
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import Base, engine
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+client = TestClient(app)
+
+
+def test_batches_cursor_pages_and_ndjson_stream():
+    mat_id = client.post("/materials/", json={"name": "PET"}).json()["id"]
+    for i in range(7):
+        resp = client.post("/batches/", json={
+            "material_id": mat_id,
+            "batch_code": f"L-{i:03d}",
+            "quantity": i,
+            "production_date": f"2024-01-0{1 + i % 3}",
+        })
+        assert resp.status_code == 201
+
+    codes, cursor = [], None
+    while True:
+        params = {"limit": 3, **({"after": cursor} if cursor else {})}
+        resp = client.get("/batches/", params=params)
+        assert resp.status_code == 200
+        codes.extend(b["batch_code"] for b in resp.json())
+        cursor = resp.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert sorted(codes) == [f"L-{i:03d}" for i in range(7)]
+    assert codes == [b["batch_code"] for b in client.get("/batches/").json()]
+
+    resp = client.get("/batches/", params={"stream": True, "material_id": mat_id})
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    streamed = [json.loads(line) for line in resp.text.splitlines()]
+    assert [b["batch_code"] for b in streamed] == codes
+
+    resp = client.get("/materials/", params={"limit": 1})
+    assert [m["name"] for m in resp.json()] == ["PET"]
+    assert "X-Next-Cursor" not in resp.headers
@@ -0,0 +1,137 @@
+import hashlib
+import os
+
+os.environ.setdefault("SUPABASE_ENABLED", "false")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import models
+from app.database import Base, SessionLocal, engine
+from app.main import app
+from app.storage import LocalStorage, byte_range, get_storage
+
+PAYLOAD = bytes(range(256)) * 40
+
+
+@pytest.fixture
+def client(tmp_path):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    store = LocalStorage(str(tmp_path / "files"))
+    app.dependency_overrides[get_storage] = lambda: store
+    with SessionLocal() as db:
+        db.add(models.Category(id=1, name="POES"))
+        db.commit()
+    yield TestClient(app), store
+    app.dependency_overrides.clear()
+    Base.metadata.drop_all(bind=engine)
+
+
+def test_byte_range_parsing():
+    assert byte_range("bytes=0-9", 100) == (0, 9)
+    assert byte_range("bytes=90-", 100) == (90, 99)
+    assert byte_range("bytes=-10", 100) == (90, 99)
+    assert byte_range("bytes=50-500", 100) == (50, 99)
+    assert byte_range("bytes=100-", 100)[0] >= 100
+    for header in (None, "items=0-1", "bytes=0-1,5-6", "bytes=5-1", "bytes=x-1", "bytes=-"):
+        assert byte_range(header, 100) is None
+
+
+def test_documents_without_supabase_use_local_storage(client):
+    client, store = client
+    r = client.post(
+        "/documents",
+        data={"title": "POES línea 2", "category_id": 1, "date_ref": "2024-01-01"},
+        files={"file": ("poes.pdf", PAYLOAD, "application/pdf")},
+    )
+    assert r.status_code == 201, r.text
+    doc_id = r.json()["id"]
+
+    # contenido direccionado: <raíz>/ab/cd/<sha256>, sin temporales sueltos
+    checksum = hashlib.sha256(PAYLOAD).hexdigest()
+    assert open(store.path(checksum), "rb").read() == PAYLOAD
+    assert store.path(checksum).endswith(os.path.join(checksum[:2], checksum[2:4], checksum))
+    assert os.listdir(store.spool_dir) == []
+
+    # nueva versión con el mismo contenido: misma clave, un solo archivo
+    r = client.post(f"/documents/{doc_id}/versions", files={"file": ("v2.pdf", PAYLOAD, "application/pdf")})
+    assert r.json() == {"ok": True, "version": 2}
+    r = client.post(f"/documents/{doc_id}/versions", files={"file": ("v3.pdf", b"otro", "text/plain")})
+    assert r.json()["version"] == 3
+    assert [v["version"] for v in client.get(f"/documents/{doc_id}/versions").json()] == [3, 2, 1]
+    assert client.get(f"/documents/{doc_id}").json()["current_version"] == 3
+    missing = "00000000-0000-0000-0000-000000000000"
+    assert client.post(f"/documents/{missing}/versions", files={"file": ("x", b"nuevo")}).status_code == 404
+    assert not store.exists(hashlib.sha256(b"nuevo").hexdigest())
+
+    link = client.get(f"/documents/{doc_id}/download", params={"version": 1}).json()
+    assert link["expires_in"] is None and link["url"].endswith(f"/documents/{doc_id}/file?version=1")
+
+    full = client.get(link["url"])
+    assert full.status_code == 200 and full.content == PAYLOAD
+    assert full.headers["etag"] == f'"{checksum}"' and full.headers["accept-ranges"] == "bytes"
+    assert "POES_l_nea_2-v1.pdf" in full.headers["content-disposition"]
+
+    part = client.get(link["url"], headers={"Range": "bytes=100-199"})
+    assert part.status_code == 206 and part.content == PAYLOAD[100:200]
+    assert part.headers["content-range"] == f"bytes 100-199/{len(PAYLOAD)}"
+    assert client.get(link["url"], headers={"Range": "bytes=-16"}).content == PAYLOAD[-16:]
+    unsatisfiable = client.get(link["url"], headers={"Range": f"bytes={len(PAYLOAD)}-"})
+    assert unsatisfiable.status_code == 416 and unsatisfiable.headers["content-range"] == f"bytes */{len(PAYLOAD)}"
+    # If-Range con otro ETag: el archivo completo
+    stale = client.get(link["url"], headers={"Range": "bytes=0-9", "If-Range": '"otro"'})
+    assert stale.status_code == 200 and stale.content == PAYLOAD
+
+    assert client.get(link["url"], headers={"If-None-Match": full.headers["etag"]}).status_code == 304
+    assert client.get(link["url"], headers={"If-Modified-Since": full.headers["last-modified"]}).status_code == 304
+    latest = client.get(f"/documents/{doc_id}/file")
+    assert latest.content == b"otro" and latest.headers["content-type"].startswith("text/plain")
+
+
+def test_release_waits_for_an_upload_reusing_the_file(client, monkeypatch):
+    import threading
+    import time
+
+    from app.routers import documents
+    from app.storage import release
+    from app.uploads import SpooledUpload
+
+    client, store = client
+    r = client.post(
+        "/documents",
+        data={"title": "POES", "category_id": 1, "date_ref": "2024-01-01"},
+        files={"file": ("poes.pdf", b"v1", "application/pdf")},
+    )
+    doc_id = r.json()["id"]
+
+    # archivo huérfano (su última versión se borró) que un upload reutiliza
+    checksum = hashlib.sha256(PAYLOAD).hexdigest()
+    orphan = store.spool_dir + "/orphan"
+    with open(orphan, "wb") as fh:
+        fh.write(PAYLOAD)
+    store.save(SpooledUpload(path=orphan, checksum=checksum, size_bytes=len(PAYLOAD), mime_type="application/pdf"))
+
+    saved = threading.Event()
+    real_persist = documents._persist_version
+
+    def slow_persist(*args, **kwargs):
+        saved.set()  # save() ya encontró el archivo; la versión todavía no está
+        time.sleep(0.3)
+        return real_persist(*args, **kwargs)
+
+    def release_orphan():
+        saved.wait()
+        with SessionLocal() as db:
+            release(db, store, checksum)
+
+    monkeypatch.setattr(documents, "_persist_version", slow_persist)
+    releaser = threading.Thread(target=release_orphan)
+    releaser.start()
+    r = client.post(f"/documents/{doc_id}/versions", files={"file": ("v2.pdf", PAYLOAD, "application/pdf")})
+    releaser.join()
+    assert r.json()["version"] == 2
+    # release esperó al commit, vio la versión nueva y no borró el archivo
+    assert store.exists(checksum)
+    assert client.get(f"/documents/{doc_id}/file").content == PAYLOAD
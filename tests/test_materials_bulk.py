@@ -0,0 +1,45 @@
+import os
+
+os.environ.setdefault("SUPABASE_ENABLED", "false")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
+
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import Base, engine
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+client = TestClient(app)
+
+
+def test_bulk_upsert_returns_name_id_map():
+    steel_id = client.post("/materials/", json={"name": "Steel", "description": "A"}).json()["id"]
+
+    payload = {"items": [
+        {"name": "Steel", "description": "Acero inoxidable"},
+        {"name": "PET"},
+        {"name": "Vidrio", "description": "ámbar"},
+    ]}
+    resp = client.post("/materials/bulk", json=payload)
+    assert resp.status_code == 200, resp.text
+    data = resp.json()
+    assert (data["created"], data["updated"]) == (2, 0)
+    assert data["ids"]["Steel"] == steel_id
+    assert client.get(f"/materials/{steel_id}").json()["description"] == "A"
+
+    resp = client.post("/materials/bulk", json={**payload, "update_description": True})
+    assert (resp.json()["created"], resp.json()["updated"]) == (0, 1)
+    assert client.get(f"/materials/{steel_id}").json()["description"] == "Acero inoxidable"
+
+    resp = client.post("/materials/resolve", json={"names": ["PET", "Steel", "Aluminio"]})
+    assert resp.json()["ids"] == {"PET": data["ids"]["PET"], "Steel": steel_id}
+    assert resp.json()["missing"] == ["Aluminio"]
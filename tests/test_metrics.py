@@ -0,0 +1,54 @@
+import os
+
+os.environ.setdefault("SUPABASE_ENABLED", "false")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app import metrics
+from app.database import get_db
+
+
+def test_middleware_records_route_template_status_and_queries():
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/things/{thing_id}")
+    def get_thing(thing_id: str, db=Depends(get_db)):
+        db.execute(text("SELECT 1"))
+        db.execute(text("SELECT 2"))
+        return {"id": thing_id}
+
+    route = "/things/{thing_id}"
+    before_ok = metrics.HTTP_REQUESTS.value(("GET", route, "200"))
+    before_queries = metrics.DB_QUERIES.value((route,))
+    with TestClient(app) as client:
+        assert client.get("/things/a").status_code == 200
+        assert client.get("/things/b").status_code == 200
+        assert client.get("/nope").status_code == 404
+
+    assert metrics.HTTP_REQUESTS.value(("GET", route, "200")) == before_ok + 2
+    assert metrics.HTTP_REQUESTS.value(("GET", "unmatched", "404")) >= 1
+    assert metrics.DB_QUERIES.value((route,)) == before_queries + 4
+    assert metrics.HTTP_IN_PROGRESS.value() == 0
+
+    body = metrics.render()
+    assert "# TYPE http_request_duration_seconds histogram" in body
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/things/{thing_id}",le="+Inf"}' in body
+    assert 'db_queries_per_request_bucket{route="/things/{thing_id}",le="2"}' in body
+
+
+def test_histogram_renders_cumulative_buckets():
+    h = metrics.Histogram("test_latency_seconds", "prueba", ("op",), buckets=(0.1, 1.0))
+    metrics._registry.remove(h)
+    for v in (0.05, 0.5, 0.5, 3.0):
+        h.observe(("x",), v)
+    assert h.render()[2:] == [
+        'test_latency_seconds_bucket{op="x",le="0.1"} 1',
+        'test_latency_seconds_bucket{op="x",le="1"} 3',
+        'test_latency_seconds_bucket{op="x",le="+Inf"} 4',
+        'test_latency_seconds_sum{op="x"} 4.05',
+        'test_latency_seconds_count{op="x"} 4',
+    ]
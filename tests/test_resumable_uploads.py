@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import os
+from datetime import datetime, timedelta
+from uuid import UUID
+
+os.environ.setdefault("SUPABASE_ENABLED", "false")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import models, resumable, storage
+from app.config import settings
+from app.database import Base, SessionLocal, engine
+from app.main import app
+from app.routers import documents
+from app.storage import LocalStorage, get_storage
+
+PAYLOAD = os.urandom(300_000)
+CHECKSUM = hashlib.sha256(PAYLOAD).hexdigest()
+DOC = {"title": "Registro de lote", "category_id": 1, "date_ref": "2024-03-01"}
+
+
+@pytest.fixture
+def client(tmp_path):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    store = LocalStorage(str(tmp_path / "files"))
+    app.dependency_overrides[get_storage] = lambda: store
+    with SessionLocal() as db:
+        db.add(models.Category(id=1, name="Lotes"))
+        db.commit()
+    yield TestClient(app), store
+    app.dependency_overrides.clear()
+    Base.metadata.drop_all(bind=engine)
+
+
+def start(client, **fields):
+    r = client.post("/documents/uploads", json={"filename": "lote 7.pdf", "size_bytes": len(PAYLOAD), **fields})
+    assert r.status_code == 201, r.text
+    return r.json()["id"]
+
+
+def put(client, upload_id, offset, data, **headers):
+    return client.put(f"/documents/uploads/{upload_id}", params={"offset": offset}, content=data, headers=headers)
+
+
+def test_resume_verify_and_finalize_as_document(client):
+    client, store = client
+    upload_id = start(client, mime_type="application/pdf", checksum=CHECKSUM)
+
+    first = PAYLOAD[:100_000]
+    r = put(client, upload_id, 0, first, **{"X-Chunk-Sha256": hashlib.sha256(first).hexdigest()})
+    assert r.json()["offset"] == 100_000 and r.headers["Upload-Offset"] == "100000"
+
+    # offset viejo (reintento) o parte corrupta: no avanza
+    stale = put(client, upload_id, 0, first)
+    assert stale.status_code == 409 and stale.headers["Upload-Offset"] == "100000"
+    bad = put(client, upload_id, 100_000, PAYLOAD[100_000:200_000], **{"X-Chunk-Sha256": "0" * 64})
+    assert bad.status_code == 422
+    assert client.get(f"/documents/uploads/{upload_id}").json()["offset"] == 100_000
+
+    # incompleto: no se puede finalizar
+    assert client.post(f"/documents/uploads/{upload_id}/document", data=DOC).status_code == 409
+
+    assert put(client, upload_id, 100_000, PAYLOAD[100_000:]).json()["complete"] is True
+    r = client.post(f"/documents/uploads/{upload_id}/document", data=DOC)
+    assert r.status_code == 201, r.text
+    doc_id = r.json()["id"]
+
+    assert open(store.path(CHECKSUM), "rb").read() == PAYLOAD
+    assert os.listdir(store.spool_dir) == []
+    assert client.get(f"/documents/uploads/{upload_id}").status_code == 404
+    assert client.get(f"/documents/{doc_id}/file").content == PAYLOAD
+    version = client.get(f"/documents/{doc_id}/versions").json()[0]
+    assert (version["checksum"], version["size_bytes"], version["mime_type"]) == (CHECKSUM, len(PAYLOAD), "application/pdf")
+
+
+def test_finalize_as_version_without_rereading(client):
+    client, store = client
+    with SessionLocal() as db:
+        doc = models.Document(title="Lote 8", category_id=1, date_ref=datetime(2024, 3, 2).date(), status="vigente")
+        db.add(doc)
+        db.commit()
+        doc_id = str(doc.id)
+
+    upload_id = start(client)
+    assert put(client, upload_id, 0, PAYLOAD[:150_000]).status_code == 200
+    # la parte siguiente cae en otro worker (sin estado de hash en memoria)
+    resumable._hashers.clear()
+    assert put(client, upload_id, 150_000, PAYLOAD[150_000:]).status_code == 200
+
+    # si finalizar releyera el archivo, el checksum sería el de estos bytes
+    with open(resumable.data_path(store, upload_id), "r+b") as fh:
+        fh.write(b"\0" * 16)
+    r = client.post(f"/documents/uploads/{upload_id}/version", data={"document_id": doc_id, "note": "escaneo"})
+    assert r.json() == {"ok": True, "version": 2}
+    assert client.get(f"/documents/{doc_id}/versions").json()[0]["checksum"] == CHECKSUM
+
+
+def test_limits_and_expired_sessions_are_collected(client):
+    client, store = client
+    upload_id = start(client, checksum="a" * 64)
+    assert put(client, upload_id, 0, PAYLOAD + b"x").status_code == 413
+    assert put(client, upload_id, 0, PAYLOAD).status_code == 200
+    # SHA-256 declarado distinto: la sesión se descarta
+    assert client.post(f"/documents/uploads/{upload_id}/document", data=DOC).status_code == 422
+    assert client.get(f"/documents/uploads/{upload_id}").status_code == 404
+
+    abandoned = start(client)
+    put(client, abandoned, 0, PAYLOAD[:1000])
+    with SessionLocal() as db:
+        db.get(models.UploadSession, UUID(abandoned)).expires_at = datetime.utcnow() - timedelta(seconds=1)
+        db.commit()
+        assert client.get(f"/documents/uploads/{abandoned}").status_code == 404
+        assert resumable.collect_expired(db, store) == 1
+        assert db.query(models.UploadSession).count() == 0
+    assert not os.path.exists(resumable.data_path(store, abandoned))
+
+    assert client.delete(f"/documents/uploads/{start(client)}").status_code == 204
+    assert os.listdir(store.spool_dir) == []
+
+
+def test_failed_finalize_keeps_session_and_published_file(client, monkeypatch):
+    client, store = client
+    upload_id = start(client, checksum=CHECKSUM)
+    put(client, upload_id, 0, PAYLOAD)
+
+    # documento inexistente: 404 antes de publicar, la sesión sigue completa
+    missing = "00000000-0000-0000-0000-000000000000"
+    r = client.post(f"/documents/uploads/{upload_id}/version", data={"document_id": missing})
+    assert r.status_code == 404
+    assert client.get(f"/documents/uploads/{upload_id}").json()["complete"] is True
+    assert not store.exists(CHECKSUM)
+
+    # falla al persistir con el archivo ya publicado (rename): se reintenta sin resubir
+    def broken(*args):
+        raise RuntimeError("base caída")
+
+    with monkeypatch.context() as m:
+        m.setattr(documents, "_version_row", broken)
+        with pytest.raises(RuntimeError):
+            client.post(f"/documents/uploads/{upload_id}/document", data=DOC)
+    assert client.get(f"/documents/uploads/{upload_id}").status_code == 200
+    assert store.exists(CHECKSUM) and not os.path.exists(resumable.data_path(store, upload_id))
+
+    r = client.post(f"/documents/uploads/{upload_id}/document", data=DOC)
+    assert r.status_code == 201, r.text
+    assert client.get(f"/documents/{r.json()['id']}/file").content == PAYLOAD
+    assert client.post(f"/documents/uploads/{upload_id}/document", data=DOC).status_code == 404
+
+    # cancelar una sesión publicada pero no finalizada libera su archivo
+    other = os.urandom(2048)
+    upload_id = client.post("/documents/uploads", json={"filename": "x.pdf", "size_bytes": len(other)}).json()["id"]
+    put(client, upload_id, 0, other)
+    with monkeypatch.context() as m:
+        m.setattr(documents, "_version_row", broken)
+        with pytest.raises(RuntimeError):
+            client.post(f"/documents/uploads/{upload_id}/document", data=DOC)
+    assert store.exists(hashlib.sha256(other).hexdigest())
+    assert client.delete(f"/documents/uploads/{upload_id}").status_code == 204
+    assert not store.exists(hashlib.sha256(other).hexdigest()) and store.exists(CHECKSUM)
+
+
+def test_background_gc_collects_without_new_uploads(client, monkeypatch):
+    client, store = client
+    abandoned = start(client)
+    put(client, abandoned, 0, PAYLOAD[:1000])
+    with SessionLocal() as db:
+        db.get(models.UploadSession, UUID(abandoned)).expires_at = datetime.utcnow() - timedelta(seconds=1)
+        db.commit()
+
+    monkeypatch.setattr(storage, "_storage", store)
+    monkeypatch.setattr(settings, "RESUMABLE_GC_INTERVAL", 0.01)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(asyncio.wait_for(resumable.collect_forever(), 0.2))
+    with SessionLocal() as db:
+        assert db.query(models.UploadSession).count() == 0
+    assert not os.path.exists(resumable.data_path(store, abandoned))
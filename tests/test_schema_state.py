@@ -0,0 +1,38 @@
+import os
+
+os.environ.setdefault("SUPABASE_ENABLED", "false")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
+
+from app import schema_state
+from app.config import settings
+from app.database import Base, make_engine
+
+
+def test_sync_runs_only_when_fingerprint_changes(tmp_path, monkeypatch):
+    engine = make_engine(f"sqlite:///{tmp_path / 'boot.db'}")
+    calls = []
+
+    def sync():
+        calls.append(1)
+        Base.metadata.create_all(bind=engine)
+        return True
+
+    try:
+        first = schema_state.ensure(engine, sync)
+        second = schema_state.ensure(engine, sync)
+        assert (first["applied"], second["applied"]) == (True, False)
+        assert len(calls) == 1
+        assert schema_state.stored(engine) == schema_state.fingerprint(engine)
+
+        # cambiar la configuración que afecta al DDL fuerza una nueva sincronización
+        monkeypatch.setattr(settings, "PROMOTED_EXTRA_KEYS", "linea")
+        assert schema_state.ensure(engine, sync)["applied"]
+        assert schema_state.ensure(engine, sync, force=True)["applied"]
+        assert len(calls) == 3
+
+        # una sincronización fallida no deja la huella guardada
+        monkeypatch.setattr(settings, "PROMOTED_EXTRA_KEYS", "turno")
+        assert schema_state.ensure(engine, lambda: False)["applied"]
+        assert schema_state.stored(engine) != schema_state.fingerprint(engine)
+    finally:
+        engine.dispose()
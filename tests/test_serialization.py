@@ -0,0 +1,62 @@
+import os
+from datetime import date
+
+os.environ.setdefault("SUPABASE_ENABLED", "false")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import models, schemas
+from app.database import Base, SessionLocal, engine
+from app.routers import batches, documents, materials
+
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def test_fast_list_paths_match_response_model_output():
+    with SessionLocal() as db:
+        cat = models.Category(name="POES")
+        mat = models.Material(name="PET", description=None)
+        db.add_all([cat, mat])
+        db.flush()
+        db.add_all([
+            models.Batch(material_id=mat.id, batch_code=f"L{i}", quantity=i, production_date=date(2024, 1, i + 1))
+            for i in range(3)
+        ])
+        db.add(models.Document(
+            title="POES ñandú", category_id=cat.id, date_ref=date(2024, 1, 1),
+            tags=["qa"], extra={"linea": 2, "nested": {"x": [1.5, None]}}, note=None,
+        ))
+        db.commit()
+        expected = {
+            "/materials/": [schemas.MaterialRead.model_validate(o).model_dump(mode="json")
+                            for o in db.query(models.Material).order_by(models.Material.name)],
+            "/batches/": [schemas.BatchRead.model_validate(o).model_dump(mode="json")
+                          for o in db.query(models.Batch).order_by(
+                              models.Batch.production_date.desc(), models.Batch.id.desc())],
+            "/documents": [schemas.DocumentOut.model_validate(o).model_dump(mode="json")
+                           for o in db.query(models.Document)],
+        }
+
+    app = FastAPI()
+    app.include_router(materials.router, prefix="/materials")
+    app.include_router(batches.router, prefix="/batches")
+    app.include_router(documents.router)
+    client = TestClient(app)
+    for path, rows in expected.items():
+        r = client.get(path)
+        assert r.status_code == 200 and r.headers["content-type"] == "application/json"
+        assert r.json() == rows
+
+    page = client.get("/batches/", params={"limit": 2})
+    assert [b["batch_code"] for b in page.json()] == ["L2", "L1"]
+    rest = client.get("/batches/", params={"limit": 2, "after": page.headers["X-Next-Cursor"]})
+    assert [b["batch_code"] for b in rest.json()] == ["L0"] and "X-Next-Cursor" not in rest.headers
@@ -0,0 +1,50 @@
+import json
+import logging
+import os
+
+os.environ.setdefault("SUPABASE_ENABLED", "false")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import models
+from app.database import Base, SessionLocal, engine
+from app.routers import documents
+from app.storage import LocalStorage, get_storage
+
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def test_create_document_reports_stage_timings(caplog, tmp_path):
+    with SessionLocal() as db:
+        cat = models.Category(name="POES")
+        db.add(cat)
+        db.commit()
+        cat_id = cat.id
+
+    app = FastAPI()
+    app.include_router(documents.router)
+    app.dependency_overrides[get_storage] = lambda: LocalStorage(str(tmp_path))
+    with caplog.at_level(logging.INFO, logger="app.timing"), TestClient(app) as client:
+        r = client.post(
+            "/documents",
+            data={"title": "POES 1", "category_id": cat_id, "date_ref": "2024-01-01"},
+            files={"file": ("poes.pdf", b"%PDF-1.4 contenido", "application/pdf")},
+        )
+    assert r.status_code == 201, r.text
+
+    stages = [part.split(";")[0] for part in r.headers["Server-Timing"].split(", ")]
+    assert stages == ["read", "sha256", "spool", "upload", "documents", "total"]
+
+    record = json.loads(caplog.records[-1].getMessage())
+    assert record["event"] == "create_document"
+    assert record["doc_id"] == r.json()["id"]
+    assert set(record["stages_ms"]) == {"read", "sha256", "spool", "upload", "documents"}
@@ -0,0 +1,54 @@
+import os
+
+os.environ.setdefault("SUPABASE_ENABLED", "false")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
+
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import Base, engine
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+client = TestClient(app)
+
+
+def _codes(params):
+    resp = client.get("/batches/", params=params)
+    assert resp.status_code == 200, resp.text
+    return sorted(b["batch_code"] for b in resp.json())
+
+
+def test_substring_and_prefix_search_on_batches_and_materials():
+    pet = client.post("/materials/", json={"name": "Envase PET 500", "description": "botella"}).json()
+    client.post("/materials/", json={"name": "Tapa 28mm", "description": "rosca para envase"})
+    for code in ("LOTE-2024-0001", "LOTE-2024-0102", "X-LOTE-9"):
+        resp = client.post("/batches/", json={
+            "material_id": pet["id"], "batch_code": code, "quantity": 1, "production_date": "2024-01-01",
+        })
+        assert resp.status_code == 201
+
+    # substring por trigramas, sin distinguir mayúsculas; cortos caen al LIKE
+    assert _codes({"batch_code": "2024-01"}) == ["LOTE-2024-0102"]
+    assert _codes({"batch_code": "lote"}) == ["LOTE-2024-0001", "LOTE-2024-0102", "X-LOTE-9"]
+    assert _codes({"batch_code": "-9"}) == ["X-LOTE-9"]
+    # prefijo (lector de código)
+    assert _codes({"batch_code": "lote-2024-0", "prefix": True}) == ["LOTE-2024-0001", "LOTE-2024-0102"]
+
+    # el índice sigue los updates
+    batch_id = client.get("/batches/", params={"batch_code": "X-LOTE"}).json()[0]["id"]
+    client.put(f"/batches/{batch_id}", json={"batch_code": "Y-9"})
+    assert _codes({"batch_code": "x-lote"}) == []
+
+    names = lambda p: [m["name"] for m in client.get("/materials/", params=p).json()]
+    assert names({"search": "envase"}) == ["Envase PET 500", "Tapa 28mm"]
+    assert names({"search": "pet 5"}) == ["Envase PET 500"]
+    assert names({"search": "enva", "prefix": True}) == ["Envase PET 500"]
@@ -0,0 +1,430 @@
+import asyncio
+import os
+import types
+import uuid
+
+os.environ.setdefault("SUPABASE_ENABLED", "false")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import main
+from app.config import settings
+from app.pagination import encode_cursor
+
+
+class FakeQuery:
+    """Builder de PostgREST mínimo sobre listas en memoria."""
+
+    def __init__(self, sb, table):
+        self.sb, self.table = sb, table
+        self.http_method, self.path = "GET", f"/{table}"
+        self.filters, self.counting, self.limit_n, self.sort = [], None, None, []
+        self.start = 0
+        self.payload, self.upserting = None, False
+
+    def insert(self, payload):
+        self.http_method, self.payload = "POST", payload
+        return self
+
+    def upsert(self, payload):
+        self.http_method, self.payload, self.upserting = "POST", payload, True
+        return self
+
+    def delete(self):
+        self.http_method = "DELETE"
+        return self
+
+    def select(self, columns, count=None):
+        self.counting = count
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: str(row.get(column)) == str(value))
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda row: row.get(column) < value)
+        return self
+
+    def in_(self, column, values):
+        values = {str(v) for v in values}
+        self.filters.append(lambda row: str(row.get(column)) in values)
+        return self
+
+    def or_(self, expression):
+        self.sb.or_filters.append(expression)
+        return self
+
+    def order(self, column, desc=False):
+        self.sort.append((column, desc))
+        return self
+
+    def limit(self, n):
+        self.limit_n = n
+        return self
+
+    def range(self, start, end):
+        self.start, self.limit_n = start, end - start + 1
+        return self
+
+    def execute(self):
+        self.sb.queries.append(self.table)
+        table = self.sb.tables.setdefault(self.table, [])
+        if self.payload is not None:
+            if self.upserting:  # por la primera columna, la clave en storage_orphans
+                key = next(iter(self.payload))
+                table[:] = [r for r in table if r[key] != self.payload[key]]
+            table.append(dict(self.payload))
+            return types.SimpleNamespace(data=[self.payload], count=None)
+        rows = [r for r in table if all(f(r) for f in self.filters)]
+        if self.http_method == "DELETE":
+            table[:] = [r for r in table if r not in rows]
+            return types.SimpleNamespace(data=rows, count=None)
+        for column, desc in reversed(self.sort):
+            rows.sort(key=lambda r: r[column], reverse=desc)
+        count = len(rows) if self.counting else None
+        rows = rows[self.start:]
+        # como PostgREST: ninguna respuesta trae más de max-rows filas
+        rows = rows[: min(self.limit_n or self.sb.max_rows, self.sb.max_rows)]
+        return types.SimpleNamespace(data=rows, count=count)
+
+
+class FakeSupabase:
+    def __init__(self):
+        self.tables = {}
+        self.objects = {}
+        self.queries = []
+        self.or_filters = []
+        self.uploads = 0
+        self.max_rows = 1000
+        self.sign_calls = []
+        self.storage = types.SimpleNamespace(from_=lambda bucket: types.SimpleNamespace(
+            upload=self.upload, remove=self.remove,
+            create_signed_url=self.create_signed_url, create_signed_urls=self.create_signed_urls,
+        ))
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def upload(self, path, file, file_options=None):
+        self.uploads += 1
+        self.objects[path] = file.read()
+        return {"Key": path}
+
+    def remove(self, paths):
+        for path in paths:
+            self.objects.pop(path, None)
+
+    def create_signed_url(self, path, expires_in):
+        self.sign_calls.append(path)
+        if path not in self.objects:
+            raise RuntimeError("Object not found")
+        return {"signedURL": f"https://sb/{path}?exp={expires_in}"}
+
+    def create_signed_urls(self, paths, expires_in):
+        self.sign_calls.append(list(paths))
+        # storage3 0.7.7 hace item["signedURL"].lstrip("/"): un null rompe el lote
+        data = [{"path": p, "signedURL": f"/{p}?exp={expires_in}" if p in self.objects else None} for p in paths]
+        return [{**item, "signedURL": "https://sb/" + item["signedURL"].lstrip("/")} for item in data]
+
+
+@pytest.fixture
+def sb(monkeypatch):
+    fake = FakeSupabase()
+    monkeypatch.setattr(main, "sb", fake)
+    main.signed_urls.clear()
+    main.version_paths.clear()
+    main.latest_paths.local.clear()
+    return fake
+
+
+@pytest.fixture
+def client(sb):
+    app = FastAPI()
+    app.include_router(main.supabase_documents)
+    return TestClient(app)
+
+
+def test_list_cursor_values_are_parsed_before_filtering(client, sb):
+    doc_id = uuid.uuid4()
+    cursor = encode_cursor("2024-03-01 10:00:00+00:00", doc_id)
+    r = client.get("/documents", params={"after": cursor, "count": "none"})
+    assert r.status_code == 200, r.text
+    assert sb.or_filters == [
+        f'created_at.lt."2024-03-01T10:00:00+00:00",'
+        f'and(created_at.eq."2024-03-01T10:00:00+00:00",id.lt."{doc_id}")'
+    ]
+
+    # un cursor armado a mano no llega a PostgREST
+    injected = encode_cursor('2024-03-01",status.eq."borrador', doc_id)
+    bad_id = encode_cursor("2024-03-01T10:00:00", 'x"),title.neq.("')
+    for after in (injected, bad_id, "no-es-un-cursor"):
+        assert client.get("/documents", params={"after": after}).status_code == 400
+    assert len(sb.or_filters) == 1
+
+
+def create(client, payload, title="POES"):
+    r = client.post("/documents", data={"title": title}, files={"file": ("poes.pdf", payload, "application/pdf")})
+    assert r.status_code == 200, r.text
+    return r.json()["id"]
+
+
+def test_dedup_reuses_objects_and_release_counts_references(client, sb, monkeypatch):
+    monkeypatch.setattr(settings, "DEDUP_UPLOADS", True)
+    first, second = create(client, b"%PDF mismo"), create(client, b"%PDF mismo", "POES copia")
+    other = create(client, b"%PDF de otro largo")
+    versions = {v["document_id"]: v["storage_path"] for v in sb.tables["document_versions"]}
+
+    # mismo SHA-256 y tamaño: una sola subida, las dos versiones comparten ruta
+    assert sb.uploads == 2 and len(sb.objects) == 2
+    shared = versions[first]
+    assert versions[second] == shared and versions[other] != shared
+
+    # mismo checksum pero otro tamaño no cuenta como copia
+    checksum = sb.tables["document_versions"][0]["checksum"]
+    spool = main.SpooledUpload(path="-", checksum=checksum, size_bytes=1, mime_type="text/plain")
+    assert asyncio.run(main._find_stored_copy(spool)) is None
+
+    # liberar solo marca la ruta; el barrido la borra pasado el margen y si
+    # sigue sin versiones
+    monkeypatch.setattr(settings, "STORAGE_ORPHAN_GRACE", 3600)
+    sb.tables["document_versions"] = [v for v in sb.tables["document_versions"] if v["document_id"] != first]
+    asyncio.run(main._release_storage_object(shared))
+    assert [o["storage_path"] for o in sb.tables["storage_orphans"]] == [shared]
+    assert asyncio.run(main.sweep_storage_orphans()) == 0 and shared in sb.objects
+
+    monkeypatch.setattr(settings, "STORAGE_ORPHAN_GRACE", -1)
+    assert asyncio.run(main.sweep_storage_orphans()) == 0
+    assert shared in sb.objects and sb.tables["storage_orphans"] == []
+
+    sb.tables["document_versions"] = [v for v in sb.tables["document_versions"] if v["document_id"] != second]
+    asyncio.run(main._release_storage_object(shared))
+    assert shared in sb.objects
+    assert asyncio.run(main.sweep_storage_orphans()) == 1
+    assert shared not in sb.objects and len(sb.objects) == 1 and sb.tables["storage_orphans"] == []
+
+
+def test_release_leaves_objects_a_version_publishes_before_the_sweep(client, sb, monkeypatch):
+    monkeypatch.setattr(settings, "DEDUP_UPLOADS", True)
+    monkeypatch.setattr(settings, "STORAGE_ORPHAN_GRACE", -1)
+    doc_id = create(client, b"%PDF compartido")
+    path = sb.tables["document_versions"][0]["storage_path"]
+    sb.tables["document_versions"].clear()
+
+    # un alta con dedup eligió la ruta antes de la marca y publica después
+    asyncio.run(main._release_storage_object(path))
+    sb.tables["document_versions"].append({"document_id": doc_id, "version": 2, "storage_path": path})
+    assert asyncio.run(main.sweep_storage_orphans()) == 0
+    assert path in sb.objects
+
+
+def add_versions(sb, doc_id, count):
+    for version in range(1, count + 1):
+        path = f"{doc_id}/v{version}/poes.pdf"
+        sb.tables.setdefault("document_versions", []).append(
+            {"document_id": doc_id, "version": version, "storage_path": path}
+        )
+        sb.objects[path] = b"%PDF"
+
+
+def test_download_urls_mixed_items_truncated_pages_and_cache(client, sb):
+    sb.max_rows = 3
+    doc_a, doc_b, unknown = (str(uuid.uuid4()) for _ in range(3))
+    add_versions(sb, doc_a, 4)
+    add_versions(sb, doc_b, 2)
+    del sb.objects[f"{doc_b}/v1/poes.pdf"]  # fila sin objeto en Storage
+
+    refs = [
+        {"doc_id": doc_a},
+        {"doc_id": doc_a, "version": 1},
+        {"doc_id": doc_b, "version": 2},
+        {"doc_id": doc_b, "version": 1},
+        {"doc_id": doc_a, "version": 9},
+        {"doc_id": unknown},
+    ]
+    r = client.post("/documents/download-urls", json={"items": refs, "expire_seconds": 600})
+    assert r.status_code == 200, r.text
+    items = r.json()["items"]
+    # las 6 filas llegan en páginas de 3: ninguna queda como "no encontrada"
+    assert items[0]["url"] == f"https://sb/{doc_a}/v4/poes.pdf?exp=600" and items[0]["expires_in"] == 600
+    assert items[1]["url"].endswith(f"{doc_a}/v1/poes.pdf?exp=600")
+    assert items[2]["url"].endswith(f"{doc_b}/v2/poes.pdf?exp=600") and items[2]["error"] is None
+    # un objeto faltante no tira abajo el lote: error solo en su ítem
+    assert items[3]["url"] is None and items[3]["error"].startswith("No se pudo firmar URL")
+    assert [i["error"] for i in items[4:]] == ["Versión no encontrada"] * 2
+
+    # segunda vez: rutas y firmas salen de caché (solo se reintenta lo fallido)
+    sb.queries.clear()
+    sb.sign_calls.clear()
+    again = client.post("/documents/download-urls", json={"items": refs[:3], "expire_seconds": 600}).json()
+    assert [i["url"] for i in again["items"]] == [i["url"] for i in items[:3]]
+    assert sb.queries == [] and sb.sign_calls == []
+
+    too_many = [{"doc_id": doc_a}] * 501
+    assert client.post("/documents/download-urls", json={"items": too_many}).status_code == 422
+
+
+def test_cached_urls_near_expiry_are_signed_again(client, sb):
+    import time
+
+    doc_id = str(uuid.uuid4())
+    add_versions(sb, doc_id, 1)
+    path = f"{doc_id}/v1/poes.pdf"
+    stale = {"url": "https://sb/vieja"}
+    # entrada que llega de otro worker con la URL casi (o ya) vencida
+    for signed_ago in (590, 700):
+        main.signed_urls.set(f"600:{path}", {**stale, "signed_at": time.time() - signed_ago})
+        r = client.post("/documents/download-urls", json={"items": [{"doc_id": doc_id}], "expire_seconds": 600})
+        item = r.json()["items"][0]
+        assert item["url"] == f"https://sb/{path}?exp=600" and item["expires_in"] == 600
+
+        main.signed_urls.set(f"600:{path}", {**stale, "signed_at": time.time() - signed_ago})
+        r = client.get(f"/documents/{doc_id}/download", params={"expire_seconds": 600})
+        assert r.json()["url"] == f"https://sb/{path}?exp=600" and r.json()["expires_in"] == 600
+    assert len(sb.sign_calls) == 4
+
+
+class CounterRedis(dict):
+    """Redis compartido mínimo: get/set/delete/incr sobre un dict."""
+
+    def set(self, key, value, px=None):
+        self[key] = value
+
+    def delete(self, *keys):
+        for key in keys:
+            self.pop(key, None)
+
+    def incr(self, key):
+        self[key] = int(self.get(key, 0)) + 1
+
+
+def test_latest_path_is_invalidated_in_every_worker(client, sb, monkeypatch):
+    from app.cache import EntityCache, RedisCache
+
+    shared = CounterRedis()
+    monkeypatch.setattr(main.latest_paths, "shared", RedisCache(shared, "entity:latest_paths"))
+    other_worker = EntityCache("latest_paths")
+    other_worker.shared = RedisCache(shared, "entity:latest_paths")
+
+    doc_id = str(uuid.uuid4())
+    add_versions(sb, doc_id, 1)
+    first = client.get(f"/documents/{doc_id}/download").json()["url"]
+    assert first.startswith(f"https://sb/{doc_id}/v1/")
+
+    # otro worker publica la v2: su invalidación llega a la copia local de este
+    sb.tables["document_versions"].insert(0, {"document_id": doc_id, "version": 2, "storage_path": f"{doc_id}/v2/p"})
+    sb.objects[f"{doc_id}/v2/p"] = b"%PDF"
+    other_worker.invalidate(doc_id)
+    assert client.get(f"/documents/{doc_id}/download").json()["url"].startswith(f"https://sb/{doc_id}/v2/")
+    items = client.post("/documents/download-urls", json={"items": [{"doc_id": doc_id}]}).json()["items"]
+    assert items[0]["url"].startswith(f"https://sb/{doc_id}/v2/")
+
+    sb.tables["document_versions"].insert(0, {"document_id": doc_id, "version": 3, "storage_path": f"{doc_id}/v3/p"})
+    sb.objects[f"{doc_id}/v3/p"] = b"%PDF"
+    other_worker.invalidate(doc_id)
+    items = client.post("/documents/download-urls", json={"items": [{"doc_id": doc_id}]}).json()["items"]
+    assert items[0]["url"].startswith(f"https://sb/{doc_id}/v3/")
+
+
+def test_search_total_comes_from_the_rpc_count(monkeypatch):
+    import httpx
+    from postgrest import SyncPostgrestClient
+    from postgrest.utils import SyncClient
+
+    main.document_counts.clear()
+    requests = []
+
+    def handler(request):
+        # PostgREST: el total va en Content-Range solo si el Prefer pide count
+        requests.append(request)
+        rows = [] if request.url.params.get("limit") == "1" else [{"id": str(uuid.uuid4())}]
+        counted = "count=exact" in request.headers.get("prefer", "")
+        return httpx.Response(200, json=rows, headers={"Content-Range": "0-0/7" if counted else "0-0/*"})
+
+    postgrest = SyncPostgrestClient("https://sb/rest/v1")
+    postgrest.session = SyncClient(base_url="https://sb/rest/v1", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(main, "sb", types.SimpleNamespace(postgrest=postgrest))
+    app = FastAPI()
+    app.include_router(main.supabase_documents)
+
+    r = TestClient(app).get("/documents", params={"search": "bombas"})
+    assert r.status_code == 200, r.text
+    assert r.json()["total"] == 7
+    assert {req.url.path for req in requests} == {"/rest/v1/rpc/search_documents"}
+
+
+@pytest.fixture
+def uploads_client(sb, tmp_path):
+    from app.database import Base, engine
+    from app.routers import documents
+    from app.storage import LocalStorage, get_storage
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    store = LocalStorage(str(tmp_path / "spool"))
+    app = FastAPI()
+    app.include_router(documents.uploads, prefix="/documents")
+    app.include_router(main.supabase_documents)
+    app.dependency_overrides[get_storage] = lambda: store
+    yield TestClient(app), store
+    Base.metadata.drop_all(bind=engine)
+
+
+def test_resumable_uploads_finalize_into_supabase(uploads_client, sb, monkeypatch):
+    import hashlib
+
+    from app import resumable
+
+    monkeypatch.setattr(settings, "DEDUP_UPLOADS", False)
+    client, store = uploads_client
+    payload = os.urandom(50_000)
+
+    def upload_all():
+        r = client.post("/documents/uploads", json={"filename": "lote 7.pdf", "size_bytes": len(payload)})
+        upload_id = r.json()["id"]
+        for offset in (0, 20_000):
+            end = offset + 30_000 if offset else 20_000
+            r = client.put(f"/documents/uploads/{upload_id}", params={"offset": offset}, content=payload[offset:end])
+            assert r.status_code == 200, r.text
+        assert r.json()["complete"] is True
+        return upload_id
+
+    # Storage caído al finalizar: la sesión y sus partes quedan para reintentar
+    upload_id = upload_all()
+    upload = sb.upload
+    monkeypatch.setattr(sb, "upload", lambda *a, **kw: {"error": "timeout"})
+    r = client.post(f"/documents/uploads/{upload_id}/document", data={"title": "Registro de lote"})
+    assert r.status_code == 500
+    assert sb.tables["documents"] == [] and sb.objects == {}
+    assert client.get(f"/documents/uploads/{upload_id}").json()["offset"] == len(payload)
+
+    monkeypatch.setattr(sb, "upload", upload)
+    r = client.post(f"/documents/uploads/{upload_id}/document", data={"title": "Registro de lote"})
+    assert r.status_code == 200, r.text
+    doc_id = r.json()["id"]
+    (path, stored), = sb.objects.items()
+    assert stored == payload and path == f"{doc_id}/v1/lote_7.pdf"
+    assert sb.tables["document_versions"][0]["checksum"] == hashlib.sha256(payload).hexdigest()
+    assert client.get(f"/documents/uploads/{upload_id}").status_code == 404
+    assert not os.path.exists(resumable.data_path(store, upload_id))
+
+    # como versión: con un documento inexistente la sesión sigue intacta
+    def rpc(name, params):
+        sb.tables["document_versions"].append(
+            {"document_id": params["p_document_id"], "version": 2, "storage_path": params["p_storage_path"]}
+        )
+        return types.SimpleNamespace(
+            http_method="POST", path=f"/rpc/{name}",
+            execute=lambda: types.SimpleNamespace(data=[{"version": 2}]),
+        )
+
+    sb.postgrest = types.SimpleNamespace(rpc=rpc)
+    upload_id = upload_all()
+    missing = client.post(f"/documents/uploads/{upload_id}/version", data={"document_id": str(uuid.uuid4())})
+    assert missing.status_code == 404 and len(sb.objects) == 1
+    r = client.post(f"/documents/uploads/{upload_id}/version", data={"document_id": doc_id})
+    assert r.json() == {"ok": True, "version": 2}
+    assert len(sb.objects) == 2 and client.get(f"/documents/uploads/{upload_id}").status_code == 404
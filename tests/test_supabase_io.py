@@ -0,0 +1,23 @@
+import asyncio
+import threading
+import time
+
+from app import supabase_io
+
+
+def test_run_offloads_and_overlaps_blocking_calls():
+    loop_thread = threading.get_ident()
+
+    def slow_call():
+        time.sleep(0.2)
+        return threading.get_ident()
+
+    async def main():
+        start = time.perf_counter()
+        idents = await asyncio.gather(*(supabase_io.run(slow_call) for _ in range(4)))
+        return idents, time.perf_counter() - start
+
+    idents, elapsed = asyncio.run(main())
+    assert loop_thread not in idents
+    # 4 llamadas de 0.2s en paralelo, no en serie
+    assert elapsed < 0.6
@@ -0,0 +1,21 @@
+import asyncio
+import hashlib
+import io
+import os
+
+from starlette.datastructures import UploadFile
+
+from app.uploads import spool_upload
+
+
+def test_spool_upload_hashes_in_chunks():
+    payload = os.urandom(10_000)
+    upload = UploadFile(file=io.BytesIO(payload), filename="scan.pdf")
+
+    spool = asyncio.run(spool_upload(upload, chunk_size=1024))
+    with spool:
+        assert spool.size_bytes == len(payload)
+        assert spool.checksum == hashlib.sha256(payload).hexdigest()
+        with spool.open() as fh:
+            assert fh.read() == payload
+    assert not os.path.exists(spool.path)